@@ -0,0 +1,60 @@
+"""
+Aho–Corasick法による複数語の一括検索
+登録した語をすべて1つのオートマトンにまとめ、テキストを1回走査するだけで含まれる語を見つける
+走査の時間はテキストの長さ（と見つかった語の数）だけで決まり、登録する語が増えても変わらない
+"""
+from collections import deque
+from typing import Dict, List, Set
+
+
+class AhoCorasick:
+    """複数の語を1回の走査で探すオートマトン"""
+
+    def __init__(self, patterns: List[str]):
+        """
+        Args:
+            patterns: 探す語のリスト（search はこのリストの添字を返す）
+        """
+        # ノードごとの遷移・失敗時の戻り先・そのノードで見つかる語
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                raise ValueError("空の語は登録できません")
+            node = 0
+            for char in pattern:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][char] = child
+                node = child
+            self._output[node].append(index)
+
+        # 幅優先で失敗時の戻り先を作る（戻り先で見つかる語も、そのノードで見つかる語に含める）
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text: str) -> Set[int]:
+        """テキストに含まれる語（patterns の添字）"""
+        found: Set[int] = set()
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found.update(self._output[node])
+        return found
@@ -0,0 +1,79 @@
+"""
+事前計算した回答の表
+部署 × よくある質問の回答を、生成に使ったインデックスのバージョンと一緒にJSONで保存する
+アプリはインデックスのバージョンが一致するときだけ使う（ドキュメントを入れ替えた後の古い回答は使わない）
+
+作成は precompute_answers.py で行う
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+
+FORMAT_VERSION = 1
+
+
+class AnswerTable:
+    """(部署, 質問) をキーとする事前計算済みの回答"""
+
+    def __init__(self, index_version: str, generator: str = "", created_at: Optional[str] = None):
+        """
+        Args:
+            index_version: 回答の生成に使ったインデックスのバージョン（VectorStore.index_version）
+            generator: 回答を生成したLLMの説明（表示用）
+            created_at: 作成日時（省略時は現在時刻）
+        """
+        self.index_version = index_version
+        self.generator = generator
+        self.created_at = created_at or time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._answers: Dict[tuple, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def put(self, department: str, question: str, answer: str, sources: List[str]):
+        """回答を登録（sources は参照したファイル名のリスト）"""
+        self._answers[(department, question)] = {
+            'department': department,
+            'question': question,
+            'answer': answer,
+            'sources': list(dict.fromkeys(sources)),
+        }
+
+    def get(self, department: str, question: str) -> Optional[Dict]:
+        """回答を取得（なければNone）"""
+        return self._answers.get((department, question))
+
+    def save(self, path: str):
+        """JSONで保存（書き込み途中のファイルをアプリが読まないよう一時ファイルから置き換える）"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        data = {
+            'format': FORMAT_VERSION,
+            'index_version': self.index_version,
+            'generator': self.generator,
+            'created_at': self.created_at,
+            'answers': list(self._answers.values()),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['AnswerTable']:
+        """保存済みの表を読み込み（ファイルがない・形式が違う場合はNone）"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"回答表の読み込みエラー: {e}")
+            return None
+        if data.get('format') != FORMAT_VERSION:
+            print(f"回答表の形式が異なります: {data.get('format')}")
+            return None
+
+        table = cls(data['index_version'], data.get('generator', ''), data.get('created_at'))
+        for entry in data['answers']:
+            table.put(entry['department'], entry['question'], entry['answer'], entry['sources'])
+        return table
@@ -6,14 +6,20 @@ import os
 import hashlib
 import json
 import time
+from pathlib import Path
 import streamlit as st
 from dotenv import load_dotenv
-import google.generativeai as genai
-from groq import Groq
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from google.api_core.exceptions import ResourceExhausted
-from document_processor import DocumentProcessor
-from vector_store import VectorStore
+from concurrent.futures import Future, ThreadPoolExecutor
+from tracing import tracer
+from profiling import profile_query
+from startup import startup_phase, startup_timings, timed_import
+from prefetch import Prefetcher
+from article_index import format_articles, parse_reference
+from context_packer import get_token_counter
+from intent_router import IntentRouter
+import metrics
+# vector_store（torch）・document_processor・llm_client（google.generativeai / groq）は重いため、
+# ログイン画面の表示を待たせないよう最初に使う時点、またはバックグラウンドの読み込みでimportする
 
 # 環境変数の読み込み
 load_dotenv()
@@ -124,6 +130,10 @@ def init_session_state():
         st.session_state.admin_authenticated = False
     if 'show_admin' not in st.session_state:
         st.session_state.show_admin = False
+    if 'profile_armed' not in st.session_state:
+        st.session_state.profile_armed = False
+    if 'last_query_profile' not in st.session_state:
+        st.session_state.last_query_profile = None
 
 
 def render_admin_page():
@@ -235,6 +245,51 @@ def render_admin_page():
             st.success("デフォルトAPIキーに戻しました")
             st.rerun()
 
+    # === パフォーマンス計測 ===
+    st.markdown("---")
+    st.markdown("### ⏱️ パフォーマンス計測")
+    st.markdown("質問応答の各段階の所要時間を集計します（直近の計測のp50/p95/p99）。")
+
+    tracer.enabled = st.toggle("計測を有効にする", value=tracer.enabled, key="tracing_enabled")
+    summary = tracer.summary()
+    if summary:
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "スパンをダウンロード（JSON Lines）",
+                data=tracer.export_jsonl(),
+                file_name="trace_spans.jsonl",
+                mime="application/x-ndjson",
+                use_container_width=True
+            )
+        with col2:
+            if st.button("計測結果をリセット", use_container_width=True, key="reset_tracing"):
+                tracer.reset()
+                st.rerun()
+    else:
+        st.info("まだ計測結果がありません")
+
+    st.markdown("#### 事前計算した回答")
+    if not os.path.exists(ANSWER_TABLE_PATH):
+        st.info("回答表がありません（`python precompute_answers.py` で作成）")
+    else:
+        answer_table = load_answer_table(os.path.getmtime(ANSWER_TABLE_PATH))
+        if answer_table is None:
+            st.warning("回答表を読み込めませんでした")
+        elif get_answer_table() is None:
+            st.warning(f"回答表（{answer_table.created_at}）は現在のドキュメントと一致しないため使われていません")
+        else:
+            st.success(f"{len(answer_table)} 件の回答を使用中（{answer_table.created_at}, {answer_table.generator}）")
+
+    st.markdown("#### 起動時間")
+    timings = startup_timings()
+    if timings:
+        st.dataframe(timings, use_container_width=True, hide_index=True)
+    vector_store = st.session_state.get('vector_store')
+    if vector_store is not None and not vector_store.models_loaded:
+        st.caption("モデルをバックグラウンドで読み込み中です")
+
     st.markdown("---")
     st.markdown("### 注意事項")
     st.markdown("""
@@ -288,15 +343,97 @@ def render_department_selector():
         with cols[col_idx]:
             if st.button(f"{dept['icon']} {dept['name']}", key=f"dept_{i}", use_container_width=True):
                 st.session_state.selected_department = dept['name']
+                # よくある質問ボタンが押される前にモデルのウォームアップと検索の先読みを始める
+                start_department_prefetch(dept['name'])
                 st.rerun()
 
     st.divider()
 
 
+def build_shared_vector_store():
+    """
+    全セッションで共有するベクトルストアを作成（バックグラウンドスレッドで実行）
+    ChromaDBとBM25インデックスを開いた時点で返し、モデルの読み込みはそのまま裏で続ける
+    """
+    vector_store = timed_import('vector_store')
+    with startup_phase("VectorStore init"):
+        store = vector_store.VectorStore(
+            micro_batching=os.getenv("INFERENCE_MICRO_BATCHING", "1") == "1",
+            max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "64")),
+            max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "5")),
+            merge_adjacent_chunks=os.getenv("MERGE_ADJACENT_CHUNKS", "1") == "1",
+            hierarchical_search=os.getenv("HIERARCHICAL_SEARCH", "0") == "1",
+            route_documents=int(os.getenv("HIERARCHICAL_DOCUMENTS", "3")),
+            route_sections=int(os.getenv("HIERARCHICAL_SECTIONS", "8")),
+            search_concurrency=int(os.getenv("SEARCH_CONCURRENCY", "8")),
+        )
+    metrics.INDEX_CHUNKS.set_function(store.get_collection_count)
+    store.start_background_loading()
+
+    # 回答生成・ドキュメント読み込みで使うモジュールも先にimportしておく
+    timed_import('llm_client')
+    timed_import('document_processor')
+    return store
+
+
+@st.cache_resource
+def start_background_loading() -> Future:
+    """
+    重いモジュールとモデルの読み込みをバックグラウンドで開始（プロセスで1回だけ）
+    ログイン・部署選択の間に読み込みを進め、最初の質問の待ち時間を減らす
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="startup-loader")
+    future = executor.submit(build_shared_vector_store)
+    executor.shutdown(wait=False)
+    return future
+
+
+def get_shared_vector_store():
+    """
+    全セッションで共有するベクトルストア
+    モデルを1回だけ読み込み、クエリ埋め込み・リランキングはセッションを横断してマイクロバッチ推論する
+    """
+    future = start_background_loading()
+    try:
+        if not future.done():
+            with st.spinner("ベクトルストアを読み込み中..."):
+                return future.result()
+        return future.result()
+    except Exception:
+        # 失敗した読み込みを使い回さないよう、次回の実行で読み込み直す
+        start_background_loading.clear()
+        raise
+
+
+@st.cache_resource
+def get_prefetcher() -> Prefetcher:
+    """全セッションで共有する先読みキャッシュ"""
+    return Prefetcher(ttl_seconds=float(os.getenv("PREFETCH_TTL_SECONDS", "1800")))
+
+
+@st.cache_resource
+def start_metrics_exporter():
+    """
+    メトリクスのHTTPエンドポイントをバックグラウンドで起動（プロセスで1回だけ）
+    デフォルトは http://127.0.0.1:9464/metrics
+    """
+    if os.getenv("METRICS_ENABLED", "1") != "1":
+        return None
+    host = os.getenv("METRICS_HOST", "127.0.0.1")
+    port = int(os.getenv("METRICS_PORT", "9464"))
+    try:
+        server = metrics.start_metrics_server(port, host)
+    except OSError as e:
+        print(f"メトリクスサーバーを起動できませんでした（{host}:{port}）: {e}")
+        return None
+    print(f"✓ メトリクスを公開中: http://{host}:{port}/metrics")
+    return server
+
+
 def initialize_vector_store():
     """ベクトルストアの初期化"""
     if st.session_state.vector_store is None:
-        st.session_state.vector_store = VectorStore()
+        st.session_state.vector_store = get_shared_vector_store()
         # 既存データがあれば自動的に初期化済みとする
         if st.session_state.vector_store.get_collection_count() > 0:
             st.session_state.initialized = True
@@ -330,6 +467,8 @@ def auto_load_documents():
 
 def load_documents():
     """ドキュメントの読み込みとベクトル化"""
+    from document_processor import DocumentProcessor
+
     with st.spinner("ドキュメントを読み込み中..."):
         processor = DocumentProcessor(documents_dir="documents")
         documents = processor.process_all_documents()
@@ -344,11 +483,30 @@ def load_documents():
         with st.spinner("ドキュメントをベクトル化中..."):
             st.session_state.vector_store.add_documents(documents)
 
+        # 勤務時間表・条文インデックス（構造化データ）を更新
+        get_shift_store().replace_all([row for doc in documents for row in doc['shift_rows']])
+        from article_index import ArticleIndex
+        ArticleIndex.build(documents).save(ARTICLE_INDEX_PATH)
+
         st.success("ドキュメントの読み込みが完了しました！")
         st.session_state.initialized = True
+        if os.path.exists(ANSWER_TABLE_PATH) and get_answer_table() is None:
+            st.info("ドキュメントが変わったため、事前計算した回答は使われません。"
+                    "`python precompute_answers.py` で作り直してください。")
         return True
 
 
+# 同義語辞書（見出し語 → 検索に追加する語）
+SYNONYMS_PATH = Path(__file__).parent / "resources" / "synonyms.json"
+
+
+@st.cache_resource
+def get_query_expander():
+    """全セッションで共有するクエリ拡張（同義語辞書の見出し語を1つのオートマトンにまとめる）"""
+    from query_expander import QueryExpander
+    return QueryExpander.from_file(str(SYNONYMS_PATH))
+
+
 def expand_query(query: str) -> str:
     """
     クエリを拡張して同義語を含める
@@ -357,50 +515,92 @@ def expand_query(query: str) -> str:
         query: 元のクエリ
 
     Returns:
-        拡張されたクエリ
+        拡張されたクエリ（元のクエリ + 同義語）
     """
-    # 同義語マッピング（社内規定で使われる用語を網羅）
-    synonyms = {
-        "休暇": ["休暇", "休業", "年休", "有給", "特別休暇", "付与日数", "勤続年数"],
-        "休業": ["休暇", "休業", "欠勤"],
-        "有給": ["有給", "年休", "休暇", "年次有給休暇", "付与日数", "勤続年数", "10日", "11日", "12日", "14日", "16日", "18日", "20日"],
-        "特別休暇": ["特別休暇", "慶弔", "結婚", "忌引", "付与日数", "3日", "2日", "1日"],
-        "付与": ["付与", "日数", "付与日数", "勤続年数"],
-        "付与日数": ["付与日数", "年次有給休暇", "勤続年数", "10日", "20日"],
-        "勤務時間": ["勤務時間", "始業", "終業", "労働時間", "就業時間"],
-        "始業": ["始業", "勤務時間", "出勤", "開始"],
-        "終業": ["終業", "勤務時間", "退勤", "終了"],
-        "給与": ["給与", "給料", "賃金", "報酬"],
-        "手当": ["手当", "手当て", "支給"],
-        "夜勤": ["夜勤", "夜間", "当直", "深夜"],
-        "シフト": ["シフト", "勤務", "番", "交代"],
-        "育児": ["育児", "育休", "子育て"],
-        "介護": ["介護", "介休", "看護"],
-        "出張": ["出張", "旅費", "交通費"],
-        "届出": ["届出", "届け出", "申請", "手続き"],
-        # 忌引き・慶弔関連
-        "亡くなった": ["死亡", "忌引", "忌引き", "慶弔", "慶弔休暇", "特別休暇", "葬儀"],
-        "亡くなる": ["死亡", "忌引", "忌引き", "慶弔", "慶弔休暇", "特別休暇", "葬儀"],
-        "死亡": ["死亡", "忌引", "忌引き", "慶弔", "慶弔休暇", "特別休暇", "葬儀"],
-        "忌引": ["忌引", "忌引き", "死亡", "慶弔", "慶弔休暇", "特別休暇", "葬儀"],
-        "忌引き": ["忌引", "忌引き", "死亡", "慶弔", "慶弔休暇", "特別休暇", "葬儀"],
-        "葬儀": ["葬儀", "忌引", "忌引き", "死亡", "慶弔", "慶弔休暇"],
-        "親": ["父母", "配偶者", "家族"],
-        "父": ["父母", "親", "家族"],
-        "母": ["父母", "親", "家族"],
-        # 結婚関連
-        "結婚": ["結婚", "慶弔", "慶弔休暇", "特別休暇", "婚姻"],
-    }
+    return get_query_expander().expand(query).keyword_query
+
+
+# 部署名のスペース対応（ドキュメント内で「薬　局」のようにスペースが入っている場合）
+DEPT_SEARCH_VARIANTS = {
+    "薬局": "薬　局",
+    "検査科": "検 査 科",
+    "事務部門": "事 務 部 門",
+    "診療部": "診 療 部",
+    "看護部門": "看 護 部 門",
+    "放射線科": "放 射 線 科",
+    "栄養科": "栄 養 科",
+}
+
+
+def build_search_query(prompt: str, dept: str) -> str:
+    """
+    検索用のクエリを作成（部署名を文書中の表記で先頭に付ける）
+
+    Args:
+        prompt: ユーザーの質問
+        dept: 選択中の部署（空なら付けない）
+    """
+    if not dept:
+        return prompt
+    return f"{DEPT_SEARCH_VARIANTS.get(dept, dept)} {prompt}"
+
+
+def make_search_query(prompt: str, dept: str):
+    """
+    構造化した検索クエリ（質問・部署名・同義語）を作成
+
+    埋め込み・リランキングには部署名 + 質問だけを、キーワード検索・BM25には同義語も使う
+    （build_search_query + expand_query の文字列をすべての段階に使うより推論が軽い）
+
+    Args:
+        prompt: ユーザーの質問
+        dept: 選択中の部署（空なら付けない）
+    """
+    return get_query_expander().search_query(prompt, DEPT_SEARCH_VARIANTS.get(dept, dept) if dept else "")
+
+
+# 質問応答の検索条件（先読みでも同じ条件で検索する）
+ANSWER_SEARCH_KWARGS = {
+    'n_results': 15,  # より多くの関連情報を取得
+    'use_reranking': True,
+    'distance_threshold': 3.0,  # 閾値を緩めて関連情報を拾いやすく
+}
+
 
-    expanded_query = query
-    for key, values in synonyms.items():
-        if key in query:
-            # 元のキーワードを含む全ての同義語を追加
-            for synonym in values:
-                if synonym not in expanded_query:
-                    expanded_query += f" {synonym}"
+def start_department_prefetch(department: str):
+    """
+    部署選択時の先読みを開始（モデルのウォームアップ、よくある質問の検索）
+    PREFETCH_ANSWERS=1 なら回答も生成しておく。固定の表で答える質問の分もAPIを呼ぶため、デフォルトは無効
+    """
+    if os.getenv("PREFETCH_ENABLED", "1") != "1" or st.session_state.vector_store is None:
+        return
+
+    # 事前キャッシュ・勤務時間表で答える質問は検索しないので先読みも不要
+    has_shift_table = bool(get_shift_store().get_department(department))
+    jobs = [
+        (q["question"], make_search_query(q["question"], department))
+        for q in QUICK_QUESTIONS
+        if get_precached_response(q["question"]) is None
+        and not (has_shift_table and is_work_hours_question(q["question"]))
+    ]
 
-    return expanded_query
+    answer_fn = None
+    if os.getenv("PREFETCH_ANSWERS", "0") == "1":
+        # APIキーはセッションの情報を使うため、ワーカースレッドに渡す前に取得しておく
+        groq_api_key, gemini_api_key = get_groq_api_key(), get_gemini_api_key()
+        store = st.session_state.vector_store
+
+        def answer_fn(question, context_chunks):
+            from llm_client import build_answer_prompt, generate_with_fallback, pack_answer_context
+            context_chunks = compress_context(store, make_search_query(question, department), context_chunks)
+            packed = pack_answer_context(context_chunks)
+            prompt = build_answer_prompt(question, packed.chunks, department)
+            result, _, _, _ = generate_with_fallback(prompt, groq_api_key, gemini_api_key)
+            return result
+
+    get_prefetcher().prefetch_department(
+        st.session_state.vector_store, department, jobs, ANSWER_SEARCH_KWARGS, answer_fn
+    )
 
 
 def get_cache_key(query: str, context_chunks: list) -> str:
@@ -554,115 +754,162 @@ PRECACHED_RESPONSES = {
 }
 
 
-def get_precached_response(query: str) -> str | None:
-    """
-    事前キャッシュされた回答を取得
+def prioritize_leave_chunks(prompt: str, search_results: list) -> list:
+    """休暇・付与日数の質問では、付与日数の表などを含むチャンクを上位に並べ替える"""
+    if get_intent_router().first(prompt, "prioritize_leave") is None:
+        return search_results
+
+    # 付与日数の表を含むチャンクを上位に
+    prioritized = []
+    others = []
+    for r in search_results:
+        content = r['content']
+        # 年次有給休暇の表
+        is_paid_leave = ('付与日数' in content and ('10日' in content or '11日' in content))
+        # 特別休暇（慶弔など）
+        is_special_leave = ('特別休暇' in content and ('結婚' in content or '死亡' in content))
+        # 新特別休暇（夏季休暇廃止後の制度）
+        is_new_special = ('夏季休暇' in content or ('４月～７月' in content or '4月～7月' in content))
+
+        if is_paid_leave or is_special_leave or is_new_special:
+            prioritized.append(r)
+        else:
+            others.append(r)
+    return prioritized + others
 
-    Args:
-        query: ユーザーの質問
 
-    Returns:
-        キャッシュされた回答、なければNone
+def compress_context(store, search_query, search_results: list) -> list:
     """
-    # 完全一致
-    if query in PRECACHED_RESPONSES:
-        return PRECACHED_RESPONSES[query]
+    回答の参照情報を、質問に関係の深い文・表・見出しだけに圧縮（CONTEXT_COMPRESSION=1 の場合）
+    検索結果の順序と勤務時間表のチャンクはそのまま。参考資料の表示には圧縮前の検索結果を使う
+    """
+    if os.getenv("CONTEXT_COMPRESSION", "0") != "1" or not search_results:
+        return search_results
+
+    from context_compressor import compress_chunks
+    with tracer.span('answer.compress'):
+        compressed = compress_chunks(
+            search_query.semantic_text, search_results, store.score_passages,
+            keep_ratio=float(os.getenv("CONTEXT_COMPRESSION_KEEP_RATIO", "0.5")),
+        )
+    metrics.COMPRESSED_CHARS.inc(sum(len(r['content']) for r in search_results)
+                                 - sum(len(r['content']) for r in compressed))
+    return compressed
 
-    # 部分一致で検索
-    query_lower = query.lower()
-    for key, response in PRECACHED_RESPONSES.items():
-        # キーワードベースのマッチング
-        if '有給' in query and '特別休暇' in query:
-            return PRECACHED_RESPONSES.get("有給休暇と特別休暇の付与日数を教えてください")
-        if '介護休業' in query or ('介護' in query and '休' in query):
-            return PRECACHED_RESPONSES.get("介護休業について教えてください")
-        if '育児休業' in query or '育休' in query or ('育児' in query and '休' in query):
-            return PRECACHED_RESPONSES.get("育児休業について教えてください")
-        if '時間外手当' in query or ('残業' in query and '手当' in query) or '割増賃金' in query:
-            return PRECACHED_RESPONSES.get("時間外手当について教えてください")
-        # 忌引き・慶弔休暇関連
-        if '亡くなった' in query or '亡くなり' in query or '死亡' in query or '忌引' in query or '葬儀' in query or '慶弔' in query:
-            return PRECACHED_RESPONSES.get("忌引き休暇について教えてください")
-        # 親が亡くなった場合も対応
-        if '親' in query and ('亡' in query or '死' in query):
-            return PRECACHED_RESPONSES.get("忌引き休暇について教えてください")
 
-    return None
+def is_work_hours_question(prompt: str) -> bool:
+    """勤務時間（始業・終業）を尋ねる質問か"""
+    return get_intent_router().first(prompt, "shift_table") is not None
 
 
-def call_groq_api(prompt: str, api_key: str, model_name: str = 'llama-3.3-70b-versatile'):
-    """
-    Groq APIを呼び出す
+# 質問の意図のルール（語の組み合わせ → 処理）
+INTENTS_PATH = Path(__file__).parent / "resources" / "intents.json"
 
-    Args:
-        prompt: プロンプト
-        api_key: APIキー
-        model_name: 使用するモデル名
 
-    Returns:
-        回答テキスト
-    """
-    client = Groq(api_key=api_key)
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.1,
-        max_tokens=8000,
-    )
-    return response.choices[0].message.content
+@st.cache_resource
+def get_intent_router() -> IntentRouter:
+    """全セッションで共有する意図の振り分け（全ルールの語を1つのオートマトンにまとめる）"""
+    return IntentRouter.from_file(str(INTENTS_PATH))
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=2, min=4, max=30),
-    reraise=True
-)
-def call_groq_with_retry(prompt: str, api_key: str, model_name: str = 'llama-3.3-70b-versatile'):
+# 勤務時間表の構造化ストア（ドキュメント読み込み時に埋め込みExcelから作成）
+SHIFT_DB_PATH = os.getenv("SHIFT_DB_PATH", "./data/shift_tables.db")
+
+
+@st.cache_resource
+def get_shift_store():
+    """全セッションで共有する勤務時間表のストア"""
+    from shift_store import ShiftTableStore
+    store = ShiftTableStore(SHIFT_DB_PATH)
+    if len(store) == 0 and Path("documents").exists():
+        # ストアの導入前に読み込んだドキュメントしかない場合は、勤務時間表だけ抽出して作成する
+        from document_processor import DocumentProcessor
+        documents = DocumentProcessor(documents_dir="documents").process_all_documents()
+        store.replace_all([row for doc in documents for row in doc['shift_rows']])
+    return store
+
+
+# 条文インデックス（ドキュメント読み込み時に本文の章・条・項から作成）
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", "./data/article_index.json")
+
+
+@st.cache_resource(max_entries=2)
+def load_article_index(mtime: float):
+    """条文インデックスを読み込み（ファイルの更新日時ごとにキャッシュ）"""
+    from article_index import ArticleIndex
+    return ArticleIndex.load(ARTICLE_INDEX_PATH)
+
+
+def get_article_index():
+    """現在の条文インデックス（作成できなければNone）"""
+    if os.path.exists(ARTICLE_INDEX_PATH):
+        index = load_article_index(os.path.getmtime(ARTICLE_INDEX_PATH))
+        if index is not None:
+            return index
+    if not Path("documents").exists():
+        return None
+    # インデックスの導入前に読み込んだドキュメントしかない場合や形式の古いインデックスは、条文だけ抽出して作り直す
+    from article_index import ArticleIndex
+    from document_processor import DocumentProcessor
+    documents = DocumentProcessor(documents_dir="documents").process_all_documents()
+    ArticleIndex.build(documents).save(ARTICLE_INDEX_PATH)
+    return load_article_index(os.path.getmtime(ARTICLE_INDEX_PATH))
+
+
+# 事前計算した回答の表（precompute_answers.py で作成）
+ANSWER_TABLE_PATH = os.getenv("ANSWER_TABLE_PATH", "./data/precomputed_answers.json")
+
+
+@st.cache_resource(max_entries=2)
+def load_answer_table(mtime: float):
+    """回答表を読み込み（ファイルの更新日時ごとにキャッシュ）"""
+    from answer_table import AnswerTable
+    return AnswerTable.load(ANSWER_TABLE_PATH)
+
+
+def current_index_version() -> str | None:
+    """このセッションのベクトルストアの登録内容のバージョン（ストアがなければNone）"""
+    store = st.session_state.get('vector_store')
+    return store.index_version if store is not None else None
+
+
+def get_answer_table(index_version: str | None = None):
     """
-    リトライ機能付きでGroq APIを呼び出す
-    エクスポネンシャルバックオフ: 4秒 → 8秒 → 16秒
+    インデックスと同じバージョンの回答表（なければ、または古ければNone）
+
+    Args:
+        index_version: 登録内容のバージョン（VectorStore.index_version）。省略時はこのセッションのベクトルストアのもの
     """
-    return call_groq_api(prompt, api_key, model_name)
+    if index_version is None:
+        index_version = current_index_version()
+    if not index_version or not os.path.exists(ANSWER_TABLE_PATH):
+        return None
+    table = load_answer_table(os.path.getmtime(ANSWER_TABLE_PATH))
+    if table is None or table.index_version != index_version:
+        return None
+    return table
 
 
-def call_gemini_api(prompt: str, api_key: str, model_name: str = 'gemini-2.0-flash'):
+def get_precached_response(query: str) -> str | None:
     """
-    Gemini APIを呼び出す
+    事前キャッシュされた回答を取得
 
     Args:
-        prompt: プロンプト
-        api_key: APIキー
-        model_name: 使用するモデル名
+        query: ユーザーの質問
 
     Returns:
-        APIレスポンス
+        キャッシュされた回答、なければNone
     """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(model_name)
-    response = model.generate_content(
-        prompt,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.1,
-            max_output_tokens=8000,
-        )
-    )
-    return response
+    # 完全一致
+    if query in PRECACHED_RESPONSES:
+        return PRECACHED_RESPONSES[query]
 
+    # 意図のルール（resources/intents.json）で振り分け
+    intent = get_intent_router().first(query, "precached")
+    if intent:
+        return PRECACHED_RESPONSES.get(intent['response'])
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=2, min=4, max=30),
-    retry=retry_if_exception_type((ResourceExhausted, Exception)),
-    reraise=True
-)
-def call_gemini_with_retry(prompt: str, api_key: str, model_name: str = 'gemini-2.0-flash'):
-    """
-    リトライ機能付きでGemini APIを呼び出す
-    エクスポネンシャルバックオフ: 4秒 → 8秒 → 16秒
-    """
-    return call_gemini_api(prompt, api_key, model_name)
+    return None
 
 
 def generate_answer(query: str, context_chunks: list) -> str:
@@ -681,148 +928,270 @@ def generate_answer(query: str, context_chunks: list) -> str:
     if 'response_cache' not in st.session_state:
         st.session_state.response_cache = {}
 
-    if cache_key in st.session_state.response_cache:
+    cache_hit = cache_key in st.session_state.response_cache
+    metrics.record_cache("answer", hit=cache_hit)
+    if cache_hit:
         return st.session_state.response_cache[cache_key] + "\n\n_(キャッシュから取得)_"
 
-    # コンテキストを結合
-    context = "\n\n---\n\n".join([
-        f"【{chunk['metadata']['filename']}】\n{chunk['content']}"
-        for chunk in context_chunks
-    ])
-
-    # 部署情報を取得
+    # 部署選択時に先読みした回答
     department = st.session_state.get('selected_department', '')
-    dept_context = f"\nユーザーの所属部署: {department}\n" if department else ""
+    prefetched = get_prefetcher().get_answer(
+        department, query, st.session_state.vector_store.index_version
+    )
+    metrics.record_cache("prefetch_answer", hit=prefetched is not None)
+    if prefetched is not None:
+        st.session_state.response_cache[cache_key] = prefetched
+        return prefetched
 
-    # プロンプトの作成
-    prompt = f"""あなたは社内規定に詳しいアシスタントです。以下の参照情報を基に、質問に回答してください。
+    from llm_client import build_answer_prompt, generate_with_fallback, pack_answer_context
 
-【ユーザーの所属部署】{department}
+    # 参照情報をトークン予算に収めてプロンプトを作成
+    packed = pack_answer_context(context_chunks)
+    st.session_state.last_packed_context = packed
+    prompt = build_answer_prompt(query, packed.chunks, department)
 
-【参照情報】
-{context}
+    result, provider, model_name, last_error = generate_with_fallback(
+        prompt, get_groq_api_key(), get_gemini_api_key()
+    )
+    if result is not None:
+        # キャッシュに保存
+        st.session_state.response_cache[cache_key] = result
 
-【質問】
-{query}
+        # フォールバック使用を表示
+        if provider == 'gemini':
+            result += f"\n\n_(フォールバック: Gemini {model_name}を使用)_"
 
-【回答ルール】
-1. 質問されたことだけに回答すること
-2. 参照情報にある表やデータは、そのままの形式で出力すること（まとめたり要約しない）
-3. 「【{department}の勤務時間】」というセクションがあれば、その表をそのまま出力すること
+        return result
 
-【勤務時間について聞かれた場合 - 必ずMarkdown表形式で出力】
-参照情報に「【{department}の勤務時間】」があれば、以下の形式で出力：
+    # 全てのプロバイダーで失敗した場合
+    return f"""⚠️ APIが一時的に利用できません。
 
-【{department}の勤務時間】
+**エラー詳細**: {str(last_error)}
 
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| （参照情報の各行をここに記載） |
+**対処方法**:
+1. 管理画面からGroq APIキーを設定してください（推奨）
+2. 数分待ってから再度お試しください
+3. よくある質問ボタンを使うと、キャッシュされた回答を利用できます
 
-★重要：必ず上記のMarkdown表形式（|で区切り、各行を改行）で出力すること
-★参照情報にある勤務種別（日勤、早番、遅番、夜勤、土曜など）を全て含めること
-★1行にまとめず、必ず改行して表形式にすること
+**Groq APIキーの取得方法**:
+https://console.groq.com/keys からアカウントを作成して無料でAPIキーを取得できます。
 
-【有給休暇について聞かれた場合】
-以下の表のみを出力すること：
+申し訳ございませんが、しばらくお待ちください。"""
 
-| 勤続年数 | 6か月 | 1年6か月 | 2年6か月 | 3年6か月 | 4年6か月 | 5年6か月 | 6年6か月以上 |
-|----------|-------|---------|---------|---------|---------|---------|-------------|
-| 付与日数 | 10日 | 11日 | 12日 | 14日 | 16日 | 18日 | 20日 |
 
-【特別休暇について聞かれた場合】
-慶弔休暇と新特別休暇（夏季休暇廃止後の制度）について回答すること。
-
-【回答】"""
-
-    last_error = None
-    used_provider = None
-
-    # 1. まずGroqを試す（メイン）
-    groq_api_key = get_groq_api_key()
-    if groq_api_key:
-        groq_models = [
-            'llama-3.3-70b-versatile',
-            'llama-3.1-8b-instant',  # フォールバック
-        ]
-        for model_name in groq_models:
-            try:
-                result = call_groq_with_retry(prompt, groq_api_key, model_name)
-
-                # キャッシュに保存
-                st.session_state.response_cache[cache_key] = result
-
-                return result
-
-            except Exception as e:
-                last_error = e
-                error_str = str(e).lower()
-                # レート制限エラーの場合、次のモデルを試す
-                if '429' in error_str or 'rate' in error_str or 'limit' in error_str:
-                    continue
-                # その他のエラーは次のプロバイダーへ
-                break
-
-    # 2. Groqが失敗したらGeminiを試す（フォールバック）
-    gemini_api_key = get_gemini_api_key()
-    gemini_models = [
-        'gemini-2.0-flash',
-        'gemini-1.5-flash',
-        'gemini-1.5-pro',
-    ]
+def render_query_profile():
+    """直前にプロファイルした質問の計測結果を表示"""
+    profile = st.session_state.last_query_profile
+    mode_label = "cProfile" if profile['mode'] == "cprofile" else "サンプリング"
+    with st.expander(f"⏱️ プロファイル結果（{mode_label}, 全体 {profile['wall_ms']:.0f}ms）", expanded=True):
+        st.write("**段階ごとの所要時間**")
+        if profile['stages']:
+            st.dataframe(profile['stages'], use_container_width=True, hide_index=True)
+        else:
+            st.info("段階の計測がありません（キャッシュから回答した場合など）")
 
-    for model_name in gemini_models:
-        try:
-            response = call_gemini_with_retry(prompt, gemini_api_key, model_name)
-
-            # レスポンスの完全性チェック
-            if response.candidates and len(response.candidates) > 0:
-                candidate = response.candidates[0]
-                if candidate.finish_reason.name == "SAFETY":
-                    result = "安全性フィルターにより回答がブロックされました。別の質問をお試しください。"
-                elif candidate.content and candidate.content.parts:
-                    result = candidate.content.parts[0].text
-                else:
-                    result = response.text
-            else:
-                result = response.text
+        st.write("**自己時間の多い関数**")
+        st.dataframe(profile['top_functions'], use_container_width=True, hide_index=True)
 
-            # キャッシュに保存
-            st.session_state.response_cache[cache_key] = result
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "プロファイルをダウンロード",
+                data=profile['raw'],
+                file_name=profile['raw_filename'],
+                mime="application/octet-stream",
+                use_container_width=True
+            )
+        with col2:
+            if st.button("プロファイル結果を閉じる", use_container_width=True, key="clear_profile"):
+                st.session_state.last_query_profile = None
+                st.rerun()
+        if profile['mode'] == "cprofile":
+            st.caption("cProfileは質問を処理するスレッドのみ計測します。.prof は snakeviz で確認できます。")
+        else:
+            st.caption("検索レッグ・推論バッチのスレッドも含みます。collapsed形式は speedscope などでフレームグラフにできます。")
 
-            # フォールバック使用を表示
-            result += f"\n\n_(フォールバック: Gemini {model_name}を使用)_"
 
-            return result
+def find_direct_answer(prompt: str, department: str, index_version: str | None) -> dict | None:
+    """
+    検索・LLMを使わずに答えられる質問の回答（条文 → 事前計算 → 事前キャッシュ → 勤務時間表の順）
 
-        except Exception as e:
-            last_error = e
-            error_str = str(e).lower()
-            # 429エラーまたはリソース枯渇の場合、次のモデルを試す
-            if '429' in error_str or 'resource' in error_str or 'exhausted' in error_str or 'quota' in error_str:
-                continue
-            # その他のエラーは即座に返す
-            break
+    Args:
+        prompt: 質問
+        department: 選択中の部署
+        index_version: 登録内容のバージョン（VectorStore.index_version。事前計算した回答表の照合に使う）
 
-    # 全てのプロバイダーで失敗した場合
-    return f"""⚠️ APIが一時的に利用できません。
+    Returns:
+        {'route': 回答の種類, 'content': 回答, 'sources': 参考資料}。該当しなければNone
+    """
+    # 「就業規則の第15条」のように条番号を明示した質問は、条文インデックスから直接回答
+    if parse_reference(prompt):
+        with tracer.span('answer.article'):
+            index = get_article_index()
+            articles = index.lookup(prompt) if index else []
+        if articles:
+            return {
+                'route': 'article',
+                'content': format_articles(articles),
+                'sources': [{"filename": filename} for filename in dict.fromkeys(a['filename'] for a in articles)],
+            }
+
+    # 現在のドキュメントから事前計算した回答（部署 × よくある質問）
+    table = get_answer_table(index_version) if index_version else None
+    precomputed = table.get(department, prompt) if table else None
+    metrics.record_cache("precomputed", hit=precomputed is not None)
+    if precomputed:
+        return {
+            'route': 'precomputed',
+            'content': precomputed['answer'],
+            'sources': [{"filename": filename} for filename in precomputed['sources']],
+        }
+
+    # 次に手作業で用意した事前キャッシュをチェック
+    with tracer.span('answer.precached'):
+        precached = get_precached_response(prompt)
+    metrics.record_cache("precached", hit=precached is not None)
+    if precached:
+        return {'route': 'precached', 'content': precached, 'sources': []}
+
+    # 事前の回答がない勤務時間の質問は、文書の勤務時間表から部署をキーに直接回答
+    if is_work_hours_question(prompt):
+        with tracer.span('answer.shift_table'):
+            work_hours_response = get_shift_store().format_markdown(department)
+        if work_hours_response:
+            return {'route': 'shift_table', 'content': work_hours_response, 'sources': []}
 
-**エラー詳細**: {str(last_error)}
+    return None
 
-**対処方法**:
-1. 管理画面からGroq APIキーを設定してください（推奨）
-2. 数分待ってから再度お試しください
-3. よくある質問ボタンを使うと、キャッシュされた回答を利用できます
 
-**Groq APIキーの取得方法**:
-https://console.groq.com/keys からアカウントを作成して無料でAPIキーを取得できます。
+def answer_question(prompt: str, debug_mode: bool = False):
+    """
+    質問に回答する（条文 → 事前計算・事前キャッシュ → 勤務時間表 → 検索 → 回答生成）
 
-申し訳ございませんが、しばらくお待ちください。"""
+    Args:
+        prompt: ユーザーの質問
+        debug_mode: 検索結果の詳細を表示するか
+    """
+    metrics.QUERIES.inc()
+
+    # ユーザーメッセージを表示
+    st.session_state.messages.append({"role": "user", "content": prompt})
+    with st.chat_message("user"):
+        st.markdown(prompt)
+
+    # アシスタントの回答を生成
+    with st.chat_message("assistant"):
+        # 条文・事前の回答・勤務時間表で答えられる質問は検索・LLMなしで回答
+        direct = find_direct_answer(prompt, st.session_state.get('selected_department', ''),
+                                    current_index_version())
+        if direct:
+            st.markdown(direct['content'])
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": direct['content'],
+                "sources": direct['sources']
+            })
+            st.rerun()
+
+        with st.spinner("検索中..."):
+            # 選択した部署をクエリに追加
+            dept = st.session_state.get('selected_department', '')
+            # クエリを拡張（同義語はキーワード検索だけに使う）
+            with tracer.span('answer.expand_query'):
+                search_query = make_search_query(prompt, dept)
+
+            # ハイブリッド検索（ベクトル + キーワード + リランキング）
+            # 選択部署のチャンクと全部署共通のチャンクだけに絞り込んで検索
+            with tracer.span('answer.search'):
+                # 部署選択時に先読みした結果があればそれを使う
+                search_results = get_prefetcher().get_search(
+                    dept, search_query, st.session_state.vector_store.index_version
+                )
+                metrics.record_cache("prefetch_search", hit=search_results is not None)
+                if search_results is None:
+                    search_results = st.session_state.vector_store.search(
+                        search_query, department=dept, **ANSWER_SEARCH_KWARGS
+                    )
+
+            # 休暇・付与日数の質問時は、表を含むチャンクを優先
+            search_results = prioritize_leave_chunks(prompt, search_results)
+
+            # デバッグモード：検索結果を表示
+            if debug_mode and search_results:
+                with st.expander("🔍 検索結果の詳細", expanded=True):
+                    st.write(f"**埋め込みクエリ:** {search_query.semantic_text}")
+                    st.write(f"**キーワードクエリ:** {search_query.keyword_text}")
+                    st.write(f"**検索結果数:** {len(search_results)}")
+                    timings = st.session_state.vector_store.last_search_timings
+                    if timings:
+                        st.write("**検索時間:** " + " / ".join(
+                            f"{stage} {ms:.0f}ms" for stage, ms in timings.items()
+                        ))
+                    routed = st.session_state.vector_store.last_routed_sections
+                    if routed:
+                        st.write("**検索対象のセクション:** " + " / ".join(routed[0]))
+                    for i, result in enumerate(search_results, 1):
+                        rerank_score = result.get('rerank_score', 0)
+                        st.markdown(f"**{i}. {result['metadata']['filename']}** (距離: {result['distance']:.3f}, リランクスコア: {rerank_score:.3f})")
+                        st.text(result['content'][:300] + "...")
+                        st.divider()
+
+            if not search_results:
+                response = "申し訳ございません。関連する情報が見つかりませんでした。"
+                st.markdown(response)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response
+                })
+            else:
+                # 回答を生成
+                # 質問に関係の深い文・表だけに圧縮（CONTEXT_COMPRESSION=1 の場合）
+                context_chunks = compress_context(st.session_state.vector_store, search_query, search_results)
+
+                st.session_state.last_packed_context = None
+                with st.spinner("回答を生成中..."), tracer.span('answer.llm'):
+                    response = generate_answer(prompt, context_chunks)
+                    st.markdown(response)
+
+                # デバッグモード：プロンプトに入れた参照情報の大きさ（キャッシュから回答した場合は表示しない）
+                packed = st.session_state.get('last_packed_context')
+                if debug_mode and packed is not None:
+                    st.caption(f"🧮 {packed.summary()}（{get_token_counter().method}）")
+                    if context_chunks is not search_results:
+                        st.caption("✂️ 圧縮: 本文 {:,} → {:,} 文字".format(
+                            sum(len(r['content']) for r in search_results),
+                            sum(len(r['content']) for r in context_chunks)))
+
+                # 参照資料を表示（ファイル名のみ、重複除外）
+                unique_files = list(set([r['metadata']['filename'] for r in search_results]))
+                if unique_files:
+                    st.caption("📚 参考資料: " + " / ".join(unique_files))
+
+                # メッセージを保存
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response,
+                    "sources": [
+                        {
+                            "filename": r['metadata']['filename'],
+                            "chunk_index": r['metadata']['chunk_index'],
+                            "total_chunks": r['metadata']['total_chunks'],
+                            "content": r['content']
+                        }
+                        for r in search_results
+                    ]
+                })
 
 
 def main():
     """メイン処理"""
 
+    # メトリクスのエンドポイント（ログイン前から公開）
+    start_metrics_exporter()
+
+    # モデル等の読み込みをログイン画面の表示と並行して開始
+    start_background_loading()
+
     # パスワード認証
     if not check_password():
         return
@@ -840,6 +1209,19 @@ def main():
 
         # デバッグモード
         debug_mode = st.checkbox("🔍 デバッグモード（検索結果を表示）", value=False)
+        if debug_mode:
+            profile_mode = st.radio(
+                "プロファイル方式",
+                ["cprofile", "sampling"],
+                format_func=lambda m: "cProfile（全呼び出し）" if m == "cprofile" else "サンプリング（全スレッド）",
+                horizontal=True,
+                key="profile_mode"
+            )
+            if st.session_state.profile_armed:
+                st.caption("⏱️ 次の質問をプロファイルします")
+            elif st.button("次の質問をプロファイル", use_container_width=True):
+                st.session_state.profile_armed = True
+                st.rerun()
 
         # ベクトルストアを初期化
         initialize_vector_store()
@@ -950,379 +1332,25 @@ def main():
     else:
         prompt = st.chat_input("質問を入力してください（例：有給休暇の申請方法は？）")
 
+    # 直前のプロファイル結果
+    if debug_mode and st.session_state.last_query_profile:
+        render_query_profile()
+
     # ユーザー入力を処理
     if prompt:
-        # ユーザーメッセージを表示
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
-
-        # アシスタントの回答を生成
-        with st.chat_message("assistant"):
-            # まず事前キャッシュをチェック（APIを使わない）
-            precached = get_precached_response(prompt)
-            if precached:
-                st.markdown(precached)
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": precached,
-                    "sources": []
-                })
-                st.rerun()
-
-            with st.spinner("検索中..."):
-                # 選択した部署をクエリに追加
-                dept = st.session_state.get('selected_department', '')
-                search_query = f"{dept} {prompt}" if dept else prompt
-
-                # 部署名のスペース対応（ドキュメント内で「薬　局」のようにスペースが入っている場合）
-                dept_variants = {
-                    "薬局": "薬　局",
-                    "検査科": "検 査 科",
-                    "事務部門": "事 務 部 門",
-                    "診療部": "診 療 部",
-                    "看護部門": "看 護 部 門",
-                    "放射線科": "放 射 線 科",
-                    "栄養科": "栄 養 科",
-                }
-                dept_search = dept
-                if dept in dept_variants:
-                    dept_search = dept_variants[dept]
-                    search_query = f"{dept_search} {prompt}" if dept else prompt
-
-                # クエリを拡張（同義語を含める）
-                expanded_prompt = expand_query(search_query)
-
-                # ハイブリッド検索（ベクトル + キーワード + リランキング）
-                search_results = st.session_state.vector_store.search(
-                    expanded_prompt,
-                    n_results=15,  # より多くの関連情報を取得
-                    use_reranking=True,
-                    distance_threshold=3.0  # 閾値を緩めて関連情報を拾いやすく
-                )
-
-                # 勤務時間の質問時は、固定の表を直接出力
-                if '勤務時間' in prompt or '始業' in prompt or '終業' in prompt or '何時' in prompt:
-                    # 部署ごとの勤務時間データ
-                    work_hours_data = {
-                        "診療部": """## 診療部の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 夜勤 | 16:30～9:00 | 16:30 | 1:54 | 14:36 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "看護部門": """## 看護部門の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 遅番 | 10:00～18:30 | 8:30 | 1:12 | 7:18 |
-| 夜勤 | 16:30～9:00 | 16:30 | 1:54 | 14:36 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "放射線科": """## 放射線科の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 遅番 | 10:30～19:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "リハビリテーション科": """## リハビリテーション科の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 遅番 | 10:30～19:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "栄養科": """## 栄養科の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 早番 | 6:15～14:45 | 8:30 | 1:12 | 7:18 |
-| 日１ | 7:30～16:00 | 8:30 | 1:12 | 7:18 |
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 遅番 | 10:30～19:00 | 8:30 | 1:12 | 7:18 |""",
-                        "検査科": """## 検査科の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "薬局": """## 薬局の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "地域連携室": """## 地域連携室の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "事務部門": """## 事務部門の勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 早番 | 8:00～16:30 | 8:30 | 1:12 | 7:18 |
-| 遅番 | 10:30～19:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                        "訪問看護ステーション": """## 訪問看護ステーションの勤務時間
-
-| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
-|----------|------------|----------|----------|----------|
-| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
-| 土曜 | 8:30～12:00 | 3:30 | － | 3:30 |""",
-                    }
-
-                    if dept in work_hours_data:
-                        work_hours_response = work_hours_data[dept]
-                        st.markdown(work_hours_response)
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": work_hours_response,
-                            "sources": []
-                        })
-                        st.rerun()
-
-                # 介護休業の質問時は、固定の表を直接出力
-                if '介護休業' in prompt or '介護休暇' in prompt or ('介護' in prompt and '休' in prompt):
-                    nursing_care_response = """## 介護休業制度
-
-### 基本情報
+        if debug_mode and st.session_state.profile_armed:
+            st.session_state.profile_armed = False
 
-| 項目 | 内容 |
-|:-----|:-----|
-| 取得日数 | 対象家族1人につき **のべ93日間まで** |
-| 取得回数 | **3回まで**分割取得可能 |
-| 申出期限 | 休業開始予定日の **2週間前まで** |
-| 申出方法 | 介護休業申出書を病院に提出 |
-
-### 対象となる家族
-
-| 対象家族 |
-|:---------|
-| 配偶者 |
-| 父母 |
-| 子 |
-| 配偶者の父母 |
-| 祖父母、兄弟姉妹又は孫 |
-| 上記以外で病院が認めた者 |
-
-### 対象者の条件
+            def save_profile(result):
+                st.session_state.last_query_profile = result
 
-| 区分 | 条件 |
-|:-----|:-----|
-| 正職員 | 要介護状態の家族を介護する職員（日雇職員を除く） |
-| 期間契約職員 | 入社1年以上、かつ休業開始から93日+6か月後まで契約継続見込み |
-
-### 取得できない場合
-
-| 除外される職員 |
-|:---------------|
-| 入社1年未満の職員 |
-| 申出日から93日以内に雇用終了が明らかな職員 |
-| 週の所定労働日数が2日以下の職員 |
-
-※要介護状態とは、2週間以上の期間にわたり常時介護を必要とする状態をいいます"""
-                    st.markdown(nursing_care_response)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": nursing_care_response,
-                        "sources": []
-                    })
-                    st.rerun()
-
-                # 育児休業の質問時は、固定の表を直接出力
-                if '育児休業' in prompt or '育児休暇' in prompt or '育休' in prompt or ('育児' in prompt and '休' in prompt):
-                    childcare_response = """## 育児休業制度
-
-### 基本情報
-
-| 項目 | 内容 |
-|:-----|:-----|
-| 対象 | 1歳に満たない子と同居し養育する職員（日雇職員を除く） |
-| 申出期限 | 休業開始予定日の **1か月前まで**（1歳超の延長は2週間前まで） |
-| 申出回数 | 一子につき **1回**（出生後8週間以内の最初の育児休業は回数に含めない） |
-| 申出方法 | 育児休業申出書を病院に提出 |
-
-### 取得可能期間
-
-| 区分 | 期間 | 条件 |
-|:-----|:-----|:-----|
-| 原則 | 子が **1歳に達するまで** | - |
-| 1歳2か月まで | 子が **1歳2か月に達するまで** | 配偶者が職員と同じ日から又は職員より先に育児休業をしている場合（産前産後休業期間と育児休業期間の合計が1年限度） |
-| 1歳6か月まで | 子が **1歳6か月に達するまで** | 子の1歳の誕生日前日に育児休業中で、保育所等に入所できない場合等 |
-| 2歳まで | 子が **2歳に達するまで** | 子の1歳6か月の誕生日応当日前日に育児休業中で、保育所等に入所できない場合等 |
-
-### 期間契約職員の条件
-
-| 条件 |
-|:-----|
-| 入社1年以上であること |
-| 子が1歳6か月（2歳までの延長申出の場合は2歳）に達する日までに労働契約期間が満了し、更新されないことが明らかでないこと |
-
-### 取得できない場合（労使協定により除外）
-
-| 除外される職員 |
-|:---------------|
-| 入社1年未満の職員 |
-| 申出の日から1年以内（1歳6か月・2歳までの申出は6か月以内）に雇用関係が終了することが明らかな職員 |
-| 1週間の所定労働日数が2日以下の職員 |
-
-### 期間の変更
-
-| 変更内容 | 申出期限 | 回数 |
-|:---------|:---------|:-----|
-| 開始予定日の繰り上げ | 育児休業開始予定日の **1週間前まで** | 原則1回 |
-| 終了予定日の繰り下げ | 育児休業終了予定日の **1か月前まで**（1歳6か月までの休業は2週間前まで） | 原則1回 |
-
-※1歳6か月までの休業の場合、1歳までの休業とは別に1回、終了予定日の繰り下げ変更が可能
-
-### 育児休業が終了する場合
-
-| 事由 | 終了日 |
-|:-----|:-------|
-| 子の死亡等により養育しないこととなった場合 | 当該事由が発生した日 |
-| 子が1歳に達した場合（1歳6か月までの延長の場合は1歳6か月に達した日） | 子が1歳（または1歳6か月）に達した日 |
-| 産前産後休業、介護休業又は新たな育児休業期間が始まった場合 | 当該休業の開始日の前日 |
-| 産前産後休業期間と育児休業期間との合計が1年に達した場合 | 1年に達した日 |"""
-                    st.markdown(childcare_response)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": childcare_response,
-                        "sources": []
-                    })
-                    st.rerun()
-
-                # 有給休暇・特別休暇の質問時は、固定の表を直接出力
-                if '有給' in prompt or '特別休暇' in prompt or ('休暇' in prompt and '付与' in prompt):
-                    leave_response = """## 年次有給休暇
-
-| 勤続年数 | 6か月 | 1年6か月 | 2年6か月 | 3年6か月 | 4年6か月 | 5年6か月 | 6年6か月以上 |
-|----------|-------|---------|---------|---------|---------|---------|-------------|
-| 付与日数 | 10日 | 11日 | 12日 | 14日 | 16日 | 18日 | 20日 |
-
-## 特別休暇
-
-### 慶弔休暇
-
-| 事由 | 日数 |
-|------|------|
-| 本人が結婚したとき | 5日 |
-| 配偶者・子・父母が死亡したとき | 3日 |
-| 兄弟姉妹・祖父母が死亡したとき | 1日 |
-
-### 新特別休暇（夏季休暇廃止後の制度）
-
-| 入職時期 | 付与日数 |
-|----------|----------|
-| 4月～7月 | 3日 |
-| 8月～11月 | 2日 |
-| 12月～3月 | 1日 |
-
-※半日単位から取得可能、有給扱い、年度内に取得（繰り越し不可）"""
-                    st.markdown(leave_response)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": leave_response,
-                        "sources": []
-                    })
-                    st.rerun()
-
-                # 時間外手当の質問時は、固定の表を直接出力（全部署共通）
-                if '時間外手当' in prompt or '時間外労働' in prompt or '割増賃金' in prompt or ('残業' in prompt and '手当' in prompt):
-                    overtime_response = """## 時間外手当・割増賃金（全部署共通）
-
-### 時間外労働の割増賃金
-
-| 区分 | 条件 | 割増率 |
-|:-----|:-----|:------:|
-| 時間外労働 | 月45時間以下 | **25%** |
-| 時間外労働 | 月45時間超〜60時間以下 | **35%** |
-| 時間外労働 | 月60時間超の部分 | **50%** |
-| 時間外労働 | 年360時間超の部分 | **40%** |
-
-### 休日労働・深夜労働の割増賃金
-
-| 区分 | 条件 | 割増率 |
-|:-----|:-----|:------:|
-| 休日労働 | 法定休日 | **35%** |
-| 深夜労働 | 22:00〜5:00 | **25%** |
-
-※時間外労働が深夜に及ぶ場合は、時間外割増＋深夜割増となります"""
-                    st.markdown(overtime_response)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": overtime_response,
-                        "sources": []
-                    })
-                    st.rerun()
-
-                # 有給休暇・特別休暇の質問時は、表を含むチャンクを優先（上記以外の休暇関連）
-                elif '休暇' in prompt or '付与' in prompt:
-                    # 付与日数の表を含むチャンクを上位に
-                    prioritized = []
-                    others = []
-                    for r in search_results:
-                        content = r['content']
-                        # 年次有給休暇の表
-                        is_paid_leave = ('付与日数' in content and ('10日' in content or '11日' in content))
-                        # 特別休暇（慶弔など）
-                        is_special_leave = ('特別休暇' in content and ('結婚' in content or '死亡' in content))
-                        # 新特別休暇（夏季休暇廃止後の制度）
-                        is_new_special = ('夏季休暇' in content or ('４月～７月' in content or '4月～7月' in content))
-
-                        if is_paid_leave or is_special_leave or is_new_special:
-                            prioritized.append(r)
-                        else:
-                            others.append(r)
-                    search_results = prioritized + others
-
-                # デバッグモード：検索結果を表示
-                if debug_mode and search_results:
-                    with st.expander("🔍 検索結果の詳細", expanded=True):
-                        st.write(f"**拡張クエリ:** {expanded_prompt}")
-                        st.write(f"**検索結果数:** {len(search_results)}")
-                        for i, result in enumerate(search_results, 1):
-                            rerank_score = result.get('rerank_score', 0)
-                            st.markdown(f"**{i}. {result['metadata']['filename']}** (距離: {result['distance']:.3f}, リランクスコア: {rerank_score:.3f})")
-                            st.text(result['content'][:300] + "...")
-                            st.divider()
-
-                if not search_results:
-                    response = "申し訳ございません。関連する情報が見つかりませんでした。"
-                    st.markdown(response)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response
-                    })
-                else:
-                    # 回答を生成
-                    with st.spinner("回答を生成中..."):
-                        response = generate_answer(prompt, search_results)
-                        st.markdown(response)
-
-                    # 参照資料を表示（ファイル名のみ、重複除外）
-                    unique_files = list(set([r['metadata']['filename'] for r in search_results]))
-                    if unique_files:
-                        st.caption("📚 参考資料: " + " / ".join(unique_files))
-
-                    # メッセージを保存
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response,
-                        "sources": [
-                            {
-                                "filename": r['metadata']['filename'],
-                                "chunk_index": r['metadata']['chunk_index'],
-                                "total_chunks": r['metadata']['total_chunks'],
-                                "content": r['content']
-                            }
-                            for r in search_results
-                        ]
-                    })
+            # answer_question は st.rerun() で抜けることがあるため、結果は save_profile で保存する
+            with profile_query(profile_mode, on_finish=save_profile), tracer.trace('answer.total'):
+                answer_question(prompt, debug_mode)
+            st.rerun()
+        else:
+            with tracer.trace('answer.total'):
+                answer_question(prompt, debug_mode)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+"""
+条文（第N条）の構造化インデックス
+規程の本文を章・条・項に分けて (文書, 条番号) をキーに保存し、「就業規則の第15条」のように
+条番号を明示した質問には検索もLLMも使わず、その条文をそのまま返す
+
+チャンク分割（800文字）では条の途中で切れるため、条単位の質問は検索より正確に答えられる
+ドキュメントを読み込むたびに全件を作り直すので、回答は常に元の文書と一致する
+"""
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+
+FORMAT_VERSION = 2  # 2: 本文が続く条の見出しを「第N条」の部分だけにした
+
+_KANJI_DIGITS = {'〇': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_KANJI_UNITS = {'十': 10, '百': 100}
+_NUMBER = r'[0-9０-９〇一二三四五六七八九十百]+'
+
+# 「第１条」「第 一 章」「第36条　（解　雇）」（先頭の空白・数字の間の空白も許容）
+# 見出しの後は空白か行末（「第10条から前条までに…」のような本文の行は除く）
+ARTICLE_PATTERN = re.compile(rf'^\s*第\s*({_NUMBER})\s*条(?:\s*の\s*({_NUMBER}))?(?:\s+(.*))?$')
+CHAPTER_PATTERN = re.compile(rf'^\s*第\s*((?:{_NUMBER}\s*)+)章(?:\s+(.*))?$')
+# 条の見出し「（目　的）」
+CAPTION_PATTERN = re.compile(r'^\s*[（(]([^（）()]{1,30})[）)]\s*$')
+# 項の書き出し「２　前項の場合…」「2. 前項の規定…」（「3.5時間」のような小数は除く）
+PARAGRAPH_PATTERN = re.compile(r'^\s*([0-9０-９]{1,2})(?:[\.．](?![0-9０-９])|[ 　])\s*(.*)$')
+# 埋め込みExcelの勤務時間表（本文の後に付く）で条文を打ち切る
+APPENDIX_PATTERN = re.compile(r'^【.+の勤務時間】$')
+# 質問中の条文の参照「第15条」「第１５条第２項」「第十五条の二」
+REFERENCE_PATTERN = re.compile(rf'第\s*({_NUMBER})\s*条(?:\s*の\s*({_NUMBER}))?(?:\s*第?\s*({_NUMBER})\s*項)?')
+
+
+def parse_number(text: str) -> int:
+    """条番号を整数に変換（「15」「１５」「十五」「百二」に対応）"""
+    text = unicodedata.normalize('NFKC', text).replace(' ', '')
+    if text.isdigit():
+        return int(text)
+    total, current = 0, 0
+    for char in text:
+        if char in _KANJI_DIGITS:
+            current = current * 10 + _KANJI_DIGITS[char]
+        elif char in _KANJI_UNITS:
+            total += (current or 1) * _KANJI_UNITS[char]
+            current = 0
+    return total + current
+
+
+def article_key(number: str, branch: Optional[str] = None) -> str:
+    """条番号のキー（「15」、枝番号付きは「15の2」）"""
+    key = str(parse_number(number))
+    return f"{key}の{parse_number(branch)}" if branch else key
+
+
+def document_title(filename: str) -> str:
+    """ファイル名から文書名を取り出す（「1-5就業規則_20251210最終版.docx」→「就業規則」）"""
+    title = os.path.splitext(filename)[0]
+    title = re.sub(r'^[0-9\-_\s]+', '', title)
+    title = re.sub(r'[_\s]\d{6,8}.*$', '', title)
+    return title or os.path.splitext(filename)[0]
+
+
+def parse_articles(text: str) -> List[Dict]:
+    """
+    本文を条ごとに分割
+
+    Returns:
+        文書内の順序の条文のリスト
+        {'article': 条番号のキー, 'caption': 見出し, 'chapter': 章,
+         'paragraphs': 項ごとの本文（号などの続きの行を含む）, 'text': 条文全体}
+    """
+    articles: List[Dict] = []
+    chapter = ""
+    current: Optional[Dict] = None
+    pending_caption, pending_line = "", ""
+
+    def finish():
+        if current is not None:
+            current['paragraphs'] = [p.strip() for p in current['paragraphs'] if p.strip()]
+            articles.append(current)
+
+    def add_line(line: str):
+        """条の本文に1行追加（「２　」で始まる行から次の項）"""
+        if current is None:
+            return
+        paragraph_match = PARAGRAPH_PATTERN.match(line)
+        if paragraph_match and (current['paragraphs'] or parse_number(paragraph_match.group(1)) == 1):
+            current['paragraphs'].append(line)
+        elif current['paragraphs']:
+            current['paragraphs'][-1] += "\n" + line
+        else:
+            current['paragraphs'].append(line)
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if APPENDIX_PATTERN.match(stripped):
+            break
+
+        chapter_match = CHAPTER_PATTERN.match(stripped)
+        if chapter_match:
+            finish()
+            current, pending_caption, pending_line = None, "", ""
+            chapter_title = re.sub(r'\s+', '', chapter_match.group(2) or '')
+            chapter = f"第{parse_number(chapter_match.group(1))}章 {chapter_title}".strip()
+            continue
+
+        article_match = ARTICLE_PATTERN.match(stripped)
+        if article_match:
+            finish()
+            rest = (article_match.group(3) or "").strip()
+            caption_match = CAPTION_PATTERN.match(rest)
+            if caption_match:
+                pending_caption, rest = caption_match.group(1), ""
+            current = {
+                'article': article_key(article_match.group(1), article_match.group(2)),
+                'caption': re.sub(r'\s+', '', pending_caption),
+                'chapter': chapter,
+                'paragraphs': [rest] if rest else [],
+                # 「第10条 賃金は…」のように本文が続く行は、本文を第1項に入れるので見出しは「第N条」の部分だけにする
+                'heading': stripped[:article_match.start(3)].strip() if rest else stripped,
+            }
+            pending_caption, pending_line = "", ""
+            continue
+
+        # 「（目的）」は次の行が条の見出しならその条の見出し。そうでなければ本文として扱う
+        caption_match = CAPTION_PATTERN.match(stripped)
+        if caption_match:
+            if pending_line:
+                add_line(pending_line)
+            pending_caption, pending_line = caption_match.group(1), stripped
+            continue
+        if pending_line:
+            add_line(pending_line)
+            pending_caption, pending_line = "", ""
+        add_line(stripped)
+    finish()
+
+    for article in articles:
+        article['text'] = "\n".join([article.pop('heading')] + article['paragraphs'])
+    return articles
+
+
+def parse_reference(query: str) -> Optional[Tuple[str, Optional[int]]]:
+    """質問中の条文の参照（条番号のキー, 項番号）。参照がなければNone"""
+    match = REFERENCE_PATTERN.search(query)
+    if not match:
+        return None
+    paragraph = parse_number(match.group(3)) if match.group(3) else None
+    return article_key(match.group(1), match.group(2)), paragraph
+
+
+def _bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class ArticleIndex:
+    """(文書名, 条番号) をキーとする条文のインデックス"""
+
+    def __init__(self, built_at: Optional[str] = None):
+        self.built_at = built_at or time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._articles: Dict[Tuple[str, str], Dict] = {}
+        self._documents: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    @classmethod
+    def build(cls, documents: List[Dict]) -> 'ArticleIndex':
+        """DocumentProcessor.process_document の結果（'articles'）から作成"""
+        index = cls()
+        for doc in documents:
+            for article in doc.get('articles', []):
+                index.add(doc['filename'], article)
+        print(f"✓ 条文インデックスを作成しました（{len(index._documents)} 文書, {len(index)} 条）")
+        return index
+
+    def add(self, filename: str, article: Dict):
+        """条文を登録（同じ文書に同じ条番号が複数ある場合は先に現れた条を使う）"""
+        title = document_title(filename)
+        self._documents.setdefault(title, filename)
+        self._articles.setdefault((title, article['article']), dict(article, document=title, filename=filename))
+
+    def get(self, document: str, article: str) -> Optional[Dict]:
+        """条文を取得（なければNone）"""
+        return self._articles.get((document, article))
+
+    def documents(self) -> List[str]:
+        """条文のある文書名"""
+        return list(self._documents)
+
+    def match_document(self, query: str) -> Optional[str]:
+        """
+        質問で名指しされた文書名（なければNone）
+
+        文書名の2文字ずつの組が質問に多く含まれるものを選び、同点なら短い文書名を優先する
+        （「就業規則の第3条」は「パートタイマー就業規則」ではなく「就業規則」）
+        """
+        query_bigrams = _bigrams(query)
+        best, best_score = None, 1
+        for title in sorted(self._documents, key=len):
+            score = len(_bigrams(title) & query_bigrams)
+            if score > best_score:
+                best, best_score = title, score
+        return best
+
+    def lookup(self, query: str) -> List[Dict]:
+        """
+        質問中の「第N条」に当たる条文
+
+        文書が名指しされていればその文書の条文だけ、なければその条番号を持つすべての文書の条文を返す
+        （規程はどの部署からも参照できるため部署では絞り込まない）
+        項番号があれば 'paragraphs' をその項だけにする。参照がない・該当する条がなければ空のリスト
+        """
+        reference = parse_reference(query)
+        if reference is None:
+            return []
+        key, paragraph = reference
+        document = self.match_document(query)
+        titles = [document] if document else list(self._documents)
+
+        results = []
+        for title in titles:
+            article = self._articles.get((title, key))
+            if article is None:
+                continue
+            if paragraph is not None:
+                if not 1 <= paragraph <= len(article['paragraphs']):
+                    continue
+                article = dict(article, paragraph=paragraph, paragraphs=[article['paragraphs'][paragraph - 1]])
+            results.append(article)
+        return results
+
+    def save(self, path: str):
+        """JSONで保存（書き込み途中のファイルをアプリが読まないよう一時ファイルから置き換える）"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        data = {
+            'format': FORMAT_VERSION,
+            'built_at': self.built_at,
+            'articles': list(self._articles.values()),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['ArticleIndex']:
+        """保存済みのインデックスを読み込み（ファイルがない・形式が違う場合はNone）"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"条文インデックスの読み込みエラー: {e}")
+            return None
+        if data.get('format') != FORMAT_VERSION:
+            print(f"条文インデックスの形式が異なります: {data.get('format')}")
+            return None
+
+        index = cls(data.get('built_at'))
+        for article in data['articles']:
+            index.add(article['filename'], article)
+        return index
+
+
+def format_articles(articles: List[Dict]) -> str:
+    """条文をMarkdownで表示"""
+    sections = []
+    for article in articles:
+        title = f"第{article['article']}条"
+        if article.get('paragraph'):
+            title += f"第{article['paragraph']}項"
+        if article['caption']:
+            title += f"（{article['caption']}）"
+        lines = [f"## {article['document']} {title}"]
+        if article['chapter']:
+            lines.append(f"*{article['chapter']}*")
+        lines.append("")
+        lines.append("\n\n".join(p.replace("\n", "  \n") for p in article['paragraphs']) or "（本文なし）")
+        sections.append("\n".join(lines))
+    return "\n\n---\n\n".join(sections)
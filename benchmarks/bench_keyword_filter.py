@@ -0,0 +1,145 @@
+"""
+キーワード検索の where_document 絞り込みベンチマーク
+
+合成した大規模コレクション（デフォルト50,000チャンク）に対して、
+全件取得（collection.get）と where_document による絞り込み取得を比較し、
+1クエリあたりにPython側へ転送されるチャンク数・バイト数・時間を表示する
+
+使い方:
+    python benchmarks/bench_keyword_filter.py --chunks 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import chromadb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_store import (DEPT_PATTERNS, extract_keywords, keyword_filter_terms,
+                          build_keyword_filter, get_in_batches)
+
+
+# 合成チャンクの材料（社内規定に出てくる言い回し）
+FILLER_SENTENCES = [
+    "職員は、この規則を遵守して、業務の正常なる遂行に努めなければならない。",
+    "前項の書類記載事項に変更を生じたときは、その都度速やかに届け出なければならない。",
+    "病院は、業務上必要がある場合に、職員に対して就業する場所の変更を命ずることがある。",
+    "旅費は、勤務地を起点とし最短の経路により計算する。",
+    "懲戒は、その情状に応じ、けん責、減給、出勤停止、懲戒解雇とする。",
+    "賞与は、病院の業績及び職員の勤務成績を考慮して支給する。",
+    "試用期間は2週間とし、勤続年数に通算する。",
+    "職員の健康診断は、毎年1回定期に行う。",
+]
+TOPIC_SENTENCES = [
+    "年次有給休暇の付与日数は勤続年数に応じて10日、11日、12日と増加する。",
+    "特別休暇として慶弔休暇を与える。",
+    "時間外労働に対しては時間外手当を支給する。",
+    "給与は毎月25日に支給する。",
+    "介護休業の申出は休業開始予定日の2週間前までに行う。",
+    "育児休業の手続きは所定の届出による。",
+]
+
+QUERIES = [
+    "診療部 勤務時間を教えてください",
+    "有給休暇と特別休暇の付与日数を教えてください",
+    "薬　局 シフト 始業 終業",
+    "時間外手当について教えてください",
+    "介護休業について教えてください",
+    "懲戒の種類は？",
+]
+
+
+def make_chunk(rng: random.Random, idx: int) -> str:
+    """合成チャンクを1つ生成（約1割は部署の勤務時間表、約2割はトピック文を含む）"""
+    roll = rng.random()
+    if roll < 0.1:
+        dept = rng.choice(DEPT_PATTERNS)
+        return (f"【{dept}の勤務時間】\n| | 始業時間～終業時間 | 拘束時間 | 休憩時間 | 勤務時間 |\n"
+                f"| 日勤 | 8:30 | ～ | 17:00 | 8:30 | 1:12 | 7:18 |\n")
+    sentences = rng.choices(FILLER_SENTENCES, k=rng.randint(8, 14))
+    if roll < 0.3:
+        sentences.insert(rng.randrange(len(sentences)), rng.choice(TOPIC_SENTENCES))
+    return f"（第{idx % 300 + 1}条）\n" + "".join(sentences)
+
+
+def build_collection(n_chunks: int, seed: int):
+    """ランダムな低次元ベクトルで合成コレクションを構築"""
+    rng = random.Random(seed)
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"bench_keyword_{seed}")
+
+    batch_size = 5000
+    for start in range(0, n_chunks, batch_size):
+        end = min(start + batch_size, n_chunks)
+        ids = [f"synthetic_{i}" for i in range(start, end)]
+        documents = [make_chunk(rng, i) for i in range(start, end)]
+        embeddings = [[rng.random() for _ in range(8)] for _ in ids]
+        metadatas = [{'filename': f"doc_{i // 40}.docx", 'chunk_index': i % 40} for i in range(start, end)]
+        collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+    return collection
+
+
+def payload_bytes(result: dict) -> int:
+    """取得結果の本文+メタデータのバイト数"""
+    doc_bytes = sum(len(d.encode('utf-8')) for d in result['documents'])
+    meta_bytes = sum(len(json.dumps(m, ensure_ascii=False).encode('utf-8')) for m in result['metadatas'])
+    return doc_bytes + meta_bytes
+
+
+def measure(fn, repeat: int):
+    """fnをrepeat回実行し、最小時間(ms)と最後の結果を返す"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=50000, help='合成チャンク数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='各測定の繰り返し回数（最小値を採用）')
+    args = parser.parse_args()
+
+    print(f"合成コレクションを構築中（{args.chunks} チャンク）...")
+    t0 = time.perf_counter()
+    collection = build_collection(args.chunks, args.seed)
+    print(f"構築完了: {time.perf_counter() - t0:.1f} 秒\n")
+
+    full_ms, full = measure(lambda: get_in_batches(collection, include=['documents', 'metadatas']), args.repeat)
+    full_count = len(full['ids'])
+    full_bytes = payload_bytes(full)
+
+    header = f"{'クエリ':<36} {'件数':>8} {'転送量(KB)':>12} {'時間(ms)':>10} {'削減率':>8}"
+    print(f"全件取得: {full_count} 件 / {full_bytes / 1024:,.0f} KB / {full_ms:.1f} ms\n")
+    print(header)
+    print("-" * len(header))
+
+    for query in QUERIES:
+        keywords, is_work_time_query, is_leave_query = extract_keywords(query)
+        document_filter = build_keyword_filter(
+            keyword_filter_terms(keywords, is_work_time_query, is_leave_query)
+        )
+        if document_filter is None:
+            print(f"{query:<36} {0:>8} {0:>12} {0:>10.1f} {'100.0%':>8}  (フィルタ語なし: 取得しない)")
+            continue
+
+        filtered_ms, filtered = measure(
+            lambda: get_in_batches(collection, where_document=document_filter,
+                                   include=['documents', 'metadatas']),
+            args.repeat
+        )
+        filtered_bytes = payload_bytes(filtered)
+        reduction = 1 - filtered_bytes / full_bytes if full_bytes else 0
+        print(f"{query:<36} {len(filtered['ids']):>8} {filtered_bytes / 1024:>12,.0f} "
+              f"{filtered_ms:>10.1f} {reduction:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+検索レッグ並列実行のベンチマーク
+
+同じクエリ群を parallel_search=False（逐次）と True（並列）で実行し、
+各レッグの時間の合計と、実際の待ち時間（legs）・全体時間（total）を比較する
+並列時の legs がレッグの最大値に近づいていれば効果が出ている
+
+使い方:
+    python benchmarks/bench_parallel_search.py
+    （data/chroma_db にドキュメントが登録済みであること）
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_store import VectorStore
+
+
+QUERIES = [
+    "診療部 勤務時間を教えてください",
+    "有給休暇と特別休暇の付与日数を教えてください",
+    "時間外手当について教えてください",
+    "介護休業について教えてください",
+    "育児休業について教えてください",
+    "忌引き休暇について教えてください",
+]
+LEGS = ('vector', 'keyword', 'bm25')
+
+
+def run(store: VectorStore, repeat: int):
+    """全クエリをrepeat回検索し、段階ごとの時間(ms)のリストを返す"""
+    samples = {key: [] for key in ('sum_of_legs', 'max_of_legs', 'legs', 'total')}
+    for _ in range(repeat):
+        for query in QUERIES:
+            store.search(query, n_results=15, distance_threshold=3.0)
+            t = store.last_search_timings
+            samples['sum_of_legs'].append(sum(t[leg] for leg in LEGS))
+            samples['max_of_legs'].append(max(t[leg] for leg in LEGS))
+            samples['legs'].append(t['legs'])
+            samples['total'].append(t['total'])
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # 推論そのものを計測するためクエリ埋め込みのキャッシュは無効にする
+    store = VectorStore(embedding_cache_size=0)
+    # 初回推論のウォームアップ
+    store.search(QUERIES[0])
+
+    print(f"\n{'モード':<10} {'レッグ合計':>10} {'レッグ最大':>10} {'レッグ待ち':>10} {'全体':>10}  (中央値 ms)")
+    for parallel in (False, True):
+        store.parallel_search = parallel
+        samples = run(store, args.repeat)
+        label = "並列" if parallel else "逐次"
+        print(f"{label:<10} " + " ".join(f"{statistics.median(samples[k]):>10.1f}"
+                                         for k in ('sum_of_legs', 'max_of_legs', 'legs', 'total')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+一括検索（search_many）のベンチマーク
+
+部署 × よくある質問のクエリ群を、search() のループと search_many() の1回呼び出しで実行し、
+スループット（queries/sec）と結果の一致を確認する
+
+使い方:
+    python benchmarks/bench_search_many.py
+    （data/chroma_db にドキュメントが登録済みであること）
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from document_processor import KNOWN_DEPARTMENTS
+from vector_store import VectorStore
+
+
+QUESTIONS = [
+    "勤務時間を教えてください",
+    "有給休暇と特別休暇の付与日数を教えてください",
+    "時間外手当について教えてください",
+    "介護休業について教えてください",
+    "育児休業について教えてください",
+    "忌引き休暇について教えてください",
+]
+
+
+def result_key(results):
+    """結果の比較用キー（チャンクIDとスコア）"""
+    return [(r['metadata']['filename'], r['metadata']['chunk_index'], round(r['rerank_score'], 4))
+            for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-results', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    queries = [f"{dept} {q}" for dept in KNOWN_DEPARTMENTS for q in QUESTIONS]
+    # 推論そのものを計測するためクエリ埋め込みのキャッシュは無効にする
+    store = VectorStore(embedding_cache_size=0)
+    # 初回推論のウォームアップ
+    store.search_many(queries[:4], n_results=args.n_results)
+
+    loop_best = batch_best = float('inf')
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        loop_results = [store.search(q, n_results=args.n_results, distance_threshold=3.0) for q in queries]
+        loop_best = min(loop_best, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        batch_results = store.search_many(queries, n_results=args.n_results, distance_threshold=3.0)
+        batch_best = min(batch_best, time.perf_counter() - t0)
+
+    mismatches = sum(result_key(a) != result_key(b) for a, b in zip(loop_results, batch_results))
+
+    print(f"\nクエリ数: {len(queries)}")
+    print(f"search() ループ : {len(queries) / loop_best:8.1f} queries/sec ({loop_best * 1000:.0f} ms)")
+    print(f"search_many()   : {len(queries) / batch_best:8.1f} queries/sec ({batch_best * 1000:.0f} ms)")
+    print(f"高速化倍率      : {loop_best / batch_best:8.1f} x")
+    print(f"結果の不一致    : {mismatches} / {len(queries)} クエリ")
+    print(f"段階別時間(ms)  : " + ", ".join(f"{k}={v:.0f}" for k, v in store.last_search_timings.items()))
+
+
+if __name__ == '__main__':
+    main()
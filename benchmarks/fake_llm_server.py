@@ -0,0 +1,245 @@
+"""
+疑似LLMサーバー（負荷試験用）
+
+Groq（OpenAI互換）と Gemini のリクエスト形式に応答するローカルHTTPサーバー
+応答までの待ち時間・生成速度（トークン/秒）・429エラーの発生を設定できるので、
+APIのクォータを消費せずに同時接続数あたりの性能を測れる
+
+- Groq:   POST /openai/v1/chat/completions
+- Gemini: POST /v1beta/models/<model>:generateContent
+- 統計:   GET  /stats
+
+使い方:
+    python benchmarks/fake_llm_server.py --port 8800 --latency-ms 300 --tokens-per-sec 250 --rpm 30
+    # アプリ側の接続先を差し替える
+    GROQ_BASE_URL=http://127.0.0.1:8800 GEMINI_BASE_URL=http://127.0.0.1:8800 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+# 応答本文の素材（Markdown表を含む典型的な回答）
+RESPONSE_TEMPLATE = """【看護部門の勤務時間】
+
+| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
+|----------|------------|----------|----------|----------|
+| 日勤 | 8:30～17:00 | 8:30 | 1:12 | 7:18 |
+| 遅番 | 10:00～18:30 | 8:30 | 1:12 | 7:18 |
+| 夜勤 | 16:30～9:00 | 16:30 | 1:54 | 14:36 |
+"""
+
+GEMINI_PATH_PATTERN = re.compile(r'^/v1(?:beta)?/models/([^/:]+):generateContent')
+
+
+@dataclass
+class FakeLLMConfig:
+    """疑似LLMの応答特性"""
+    latency_ms: float = 300.0        # 最初のトークンまでの待ち時間
+    tokens_per_sec: float = 250.0    # 生成速度（0なら生成時間なし）
+    output_tokens: int = 300         # 応答のトークン数（1文字=1トークンとみなす）
+    rate_limit_prob: float = 0.0     # 429を返す確率
+    rpm: int = 0                     # 1分あたりの受付上限（超えたら429、0なら無制限）
+    seed: Optional[int] = None
+
+
+class FakeLLMState:
+    """リクエストの受付状況と統計"""
+
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._random = random.Random(config.seed)
+        self._recent = deque()
+        self.stats = {'requests': 0, 'ok': 0, 'error': 0, 'rate_limited': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    def admit(self) -> bool:
+        """リクエストを受け付けるか（Falseなら429）"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats['requests'] += 1
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            limited = (self.config.rpm and len(self._recent) >= self.config.rpm) or \
+                self._random.random() < self.config.rate_limit_prob
+            if limited:
+                self.stats['rate_limited'] += 1
+                return False
+            self._recent.append(now)
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+            return True
+
+    def finish(self, ok: bool = True):
+        """受け付けたリクエストの完了を記録（ok=False は応答の途中で失敗したもの）"""
+        with self._lock:
+            self.stats['in_flight'] -= 1
+            self.stats['ok' if ok else 'error'] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+def generate_text(n_tokens: int) -> str:
+    """指定トークン数（文字数）の応答本文"""
+    repeats = n_tokens // len(RESPONSE_TEMPLATE) + 1
+    return (RESPONSE_TEMPLATE * repeats)[:n_tokens]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Groq/Geminiのリクエスト形式に応答するハンドラ"""
+
+    state: FakeLLMState = None
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.state.snapshot())
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        path = self.path.split('?')[0]
+
+        if path.endswith('/chat/completions'):
+            self._handle(body, provider='groq', model=body.get('model', ''))
+            return
+        match = GEMINI_PATH_PATTERN.match(path)
+        if match:
+            self._handle(body, provider='gemini', model=match.group(1))
+            return
+        self.send_error(404)
+
+    def _handle(self, body: Dict, provider: str, model: str):
+        config = self.state.config
+        if not self.state.admit():
+            if provider == 'groq':
+                self._send_json(429, {'error': {
+                    'message': f'Rate limit reached for model `{model}` (fake server)',
+                    'type': 'requests', 'code': 'rate_limit_exceeded'}}, retry_after=1)
+            else:
+                self._send_json(429, {'error': {
+                    'code': 429, 'message': 'Resource has been exhausted (e.g. check quota).',
+                    'status': 'RESOURCE_EXHAUSTED'}})
+            return
+
+        ok = False
+        try:
+            prompt = self._prompt_text(body, provider)
+            generation_time = config.output_tokens / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+            time.sleep(config.latency_ms / 1000 + generation_time)
+            text = generate_text(config.output_tokens)
+            prompt_tokens = len(prompt)
+
+            if provider == 'groq':
+                self._send_json(200, {
+                    'id': f'chatcmpl-{uuid.uuid4().hex}',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': text},
+                        'finish_reason': 'stop',
+                    }],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': config.output_tokens,
+                        'total_tokens': prompt_tokens + config.output_tokens,
+                    },
+                })
+            else:
+                self._send_json(200, {
+                    'candidates': [{
+                        'content': {'parts': [{'text': text}], 'role': 'model'},
+                        'finishReason': 'STOP',
+                        'index': 0,
+                    }],
+                    'usageMetadata': {
+                        'promptTokenCount': prompt_tokens,
+                        'candidatesTokenCount': config.output_tokens,
+                        'totalTokenCount': prompt_tokens + config.output_tokens,
+                    },
+                })
+            ok = True
+        finally:
+            # 例外（接続の切断など）はハンドラの外に伝え、統計だけ失敗として数える
+            self.state.finish(ok)
+
+    @staticmethod
+    def _prompt_text(body: Dict, provider: str) -> str:
+        """リクエストからプロンプト本文を取り出す"""
+        if provider == 'groq':
+            return "".join(m.get('content', '') for m in body.get('messages', []))
+        return "".join(part.get('text', '')
+                       for content in body.get('contents', [])
+                       for part in content.get('parts', []))
+
+    def _send_json(self, status: int, payload: Dict, retry_after: Optional[int] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_llm_server(config: FakeLLMConfig, port: int = 8800, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    疑似LLMサーバーをバックグラウンドスレッドで起動
+
+    Returns:
+        起動したサーバー（server.state で統計を参照できる）
+    """
+    state = FakeLLMState(config)
+    handler = type('BoundFakeLLMHandler', (FakeLLMHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, name="fake-llm-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency-ms', type=float, default=300.0, help='最初のトークンまでの待ち時間')
+    parser.add_argument('--tokens-per-sec', type=float, default=250.0, help='生成速度')
+    parser.add_argument('--output-tokens', type=int, default=300, help='応答のトークン数')
+    parser.add_argument('--rate-limit-prob', type=float, default=0.0, help='429を返す確率（0〜1）')
+    parser.add_argument('--rpm', type=int, default=0, help='1分あたりの受付上限（0なら無制限）')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec, output_tokens=args.output_tokens,
+        rate_limit_prob=args.rate_limit_prob, rpm=args.rpm, seed=args.seed,
+    )
+    server = start_fake_llm_server(config, args.port, args.host)
+    print(f"疑似LLMサーバーを起動しました: http://{args.host}:{args.port}  （Ctrl+Cで終了）")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n統計: {server.state.snapshot()}")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
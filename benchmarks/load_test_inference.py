@@ -0,0 +1,110 @@
+"""
+推論マイクロバッチングの負荷試験
+
+N人（デフォルト32人）の同時ユーザーを模したスレッドから search() を繰り返し呼び出し、
+直接推論とマイクロバッチング（待ち時間・バッチ上限を変えて複数設定）で
+スループットと p50/p99 レイテンシを比較する
+
+使い方:
+    python benchmarks/load_test_inference.py --users 32 --requests 10
+    （data/chroma_db にドキュメントが登録済みであること）
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from document_processor import KNOWN_DEPARTMENTS
+from inference_scheduler import InferenceScheduler
+from vector_store import VectorStore
+
+
+QUESTIONS = [
+    "勤務時間を教えてください",
+    "有給休暇と特別休暇の付与日数を教えてください",
+    "時間外手当について教えてください",
+    "介護休業について教えてください",
+    "育児休業について教えてください",
+    "忌引き休暇について教えてください",
+    "出張旅費の日当はいくらですか",
+    "試用期間は何日ですか",
+]
+
+
+def percentile(values, p):
+    """p パーセンタイル（最近傍法）"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_load(store: VectorStore, users: int, requests: int, seed: int):
+    """usersスレッドがそれぞれrequests回検索し、(全体時間, レイテンシのリスト, エラー数)を返す"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(users)
+
+    def user(user_id: int):
+        rng = random.Random(seed + user_id)
+        dept = rng.choice(KNOWN_DEPARTMENTS)
+        start_barrier.wait()
+        for _ in range(requests):
+            query = f"{dept} {rng.choice(QUESTIONS)}"
+            t0 = time.perf_counter()
+            try:
+                store.search(query, n_results=15, distance_threshold=3.0, department=dept)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, latencies, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=32, help='同時ユーザー数')
+    parser.add_argument('--requests', type=int, default=10, help='ユーザーあたりのリクエスト数')
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--max-wait-ms', type=float, nargs='+', default=[2.0, 5.0, 10.0])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # 推論そのものを計測するためクエリ埋め込みのキャッシュは無効にする
+    store = VectorStore(embedding_cache_size=0)
+    # 初回推論のウォームアップ
+    store.search(QUESTIONS[0])
+
+    configs = [('直接推論', None)] + [
+        (f"batch={b} wait={w:g}ms", (b, w)) for b in args.max_batch for w in args.max_wait_ms
+    ]
+
+    print(f"\n同時ユーザー {args.users} 人 × {args.requests} リクエスト")
+    print(f"{'設定':<24} {'req/s':>8} {'p50(ms)':>9} {'p99(ms)':>9} {'平均バッチ':>10} {'エラー':>6}")
+    for label, config in configs:
+        if config is None:
+            store.scheduler = None
+        else:
+            store.scheduler = InferenceScheduler(store.encode_texts, store.rerank_pairs,
+                                                 max_batch_size=config[0], max_wait_ms=config[1])
+        elapsed, latencies, n_errors = run_load(store, args.users, args.requests, args.seed)
+        avg_batch = store.scheduler.encoder.stats['avg_batch_size'] if store.scheduler else 1.0
+        print(f"{label:<24} {len(latencies) / elapsed:>8.1f} {statistics.median(latencies):>9.0f} "
+              f"{percentile(latencies, 99):>9.0f} {avg_batch:>10.1f} {n_errors:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+回答生成の負荷試験（疑似LLMサーバー使用）
+
+ゴールデンセットの質問をランダムに混ぜ、N人の同時セッションから generate_answer と同じ経路
+（参照情報のトークン予算 → build_answer_prompt → generate_with_fallback: Groq → Geminiフォールバック、リトライ付き）で回答を生成する
+同時接続数ごとにスループット・レイテンシ（p50/p95/p99）・エラー率・フォールバック率・429の件数を表示する
+
+使い方:
+    # 疑似LLMサーバーをプロセス内で起動して計測
+    python benchmarks/load_test_llm.py --spawn-server --users 1 4 16 32 --rpm 120
+    # 別途起動した疑似LLMサーバー（fake_llm_server.py）に接続
+    python benchmarks/load_test_llm.py --base-url http://127.0.0.1:8800
+    # 検索もアプリと同じく実行してコンテキストを作る（data/chroma_db が必要）
+    python benchmarks/load_test_llm.py --spawn-server --with-retrieval
+
+※ 429が返るとアプリと同じバックオフ（4秒〜）で待つため、レート制限を入れると所要時間が大きく伸びる
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metrics
+from llm_client import GEMINI_MODELS, GROQ_MODELS, build_answer_prompt, generate_with_fallback, pack_answer_context
+from fake_llm_server import FakeLLMConfig, start_fake_llm_server
+
+
+DEFAULT_GOLDEN = os.path.join(ROOT_DIR, 'benchmarks', 'golden_queries.json')
+
+
+def rate_limited_count() -> float:
+    """これまでに記録された429の件数（全プロバイダー・全モデル）"""
+    return sum(metrics.LLM_REQUESTS.get(provider=provider, model=model, status="rate_limited")
+               for provider, models in (('groq', GROQ_MODELS), ('gemini', GEMINI_MODELS))
+               for model in models)
+
+
+def load_static_context() -> list:
+    """検索なしで使う固定のコンテキスト（勤務時間表）"""
+    path = os.path.join(ROOT_DIR, 'documents', '勤務時間.txt')
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    return [{'metadata': {'filename': '勤務時間.txt'}, 'content': content}]
+
+
+def run_session(questions: list, n_requests: int, seed: int, context_fn) -> list:
+    """
+    1セッション分のリクエストを順に実行
+
+    Returns:
+        [{'latency': 秒, 'ok': bool, 'provider': str}] のリスト
+    """
+    rng = random.Random(seed)
+    records = []
+    for _ in range(n_requests):
+        question = rng.choice(questions)
+        start = time.perf_counter()
+        context_chunks = context_fn(question)
+        packed = pack_answer_context(context_chunks)
+        prompt = build_answer_prompt(question['question'], packed.chunks, question['department'])
+        result, provider, _, _ = generate_with_fallback(prompt, "fake-groq-key", "fake-gemini-key")
+        records.append({'latency': time.perf_counter() - start, 'ok': result is not None, 'provider': provider})
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 16, 32], help='同時セッション数')
+    parser.add_argument('--requests', type=int, default=5, help='セッションあたりのリクエスト数')
+    parser.add_argument('--golden', default=DEFAULT_GOLDEN, help='質問の出典（ゴールデンセット）')
+    parser.add_argument('--with-retrieval', action='store_true', help='VectorStore.search でコンテキストを作る')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8800', help='疑似LLMサーバーのURL')
+    parser.add_argument('--spawn-server', action='store_true', help='疑似LLMサーバーをプロセス内で起動する')
+    parser.add_argument('--latency-ms', type=float, default=300.0, help='（--spawn-server時）応答までの待ち時間')
+    parser.add_argument('--tokens-per-sec', type=float, default=250.0, help='（--spawn-server時）生成速度')
+    parser.add_argument('--output-tokens', type=int, default=300, help='（--spawn-server時）応答のトークン数')
+    parser.add_argument('--rate-limit-prob', type=float, default=0.0, help='（--spawn-server時）429の確率')
+    parser.add_argument('--rpm', type=int, default=0, help='（--spawn-server時）1分あたりの受付上限')
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if args.spawn_server:
+        config = FakeLLMConfig(
+            latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec, output_tokens=args.output_tokens,
+            rate_limit_prob=args.rate_limit_prob, rpm=args.rpm, seed=args.seed,
+        )
+        server = start_fake_llm_server(config, port=0)
+        base_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ["GEMINI_BASE_URL"] = base_url
+
+    with open(args.golden, encoding='utf-8') as f:
+        questions = json.load(f)['queries']
+
+    if args.with_retrieval:
+        from app import make_search_query
+        from vector_store import VectorStore
+        store = VectorStore()
+
+        def context_fn(question):
+            query = make_search_query(question['question'], question['department'])
+            return store.search(query, n_results=15, use_reranking=True, distance_threshold=3.0,
+                                department=question['department'])
+    else:
+        static_context = load_static_context()
+
+        def context_fn(question):
+            return static_context
+
+    print(f"\n接続先: {base_url}  セッションあたり {args.requests} リクエスト")
+    print(f"{'同時数':>6} {'req/s':>8} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} "
+          f"{'エラー率':>8} {'Gemini率':>8} {'429':>6}")
+
+    for n_users in args.users:
+        limited_before = rate_limited_count()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n_users) as pool:
+            futures = [pool.submit(run_session, questions, args.requests, args.seed + i, context_fn)
+                       for i in range(n_users)]
+            records = [record for future in futures for record in future.result()]
+        elapsed = time.perf_counter() - start
+
+        latencies = np.array([r['latency'] for r in records])
+        errors = sum(1 for r in records if not r['ok'])
+        fallbacks = sum(1 for r in records if r['provider'] == 'gemini')
+        print(f"{n_users:>6} {len(records) / elapsed:8.2f} "
+              f"{np.percentile(latencies, 50):8.2f} {np.percentile(latencies, 95):8.2f} "
+              f"{np.percentile(latencies, 99):8.2f} {errors / len(records):8.1%} "
+              f"{fallbacks / len(records):8.1%} {rate_limited_count() - limited_before:6.0f}")
+
+    if args.spawn_server:
+        print(f"\n疑似LLMサーバーの統計: {server.state.snapshot()}")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
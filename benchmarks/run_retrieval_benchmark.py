@@ -0,0 +1,317 @@
+"""
+検索の速度・精度ベンチマーク（ゴールデンセット）
+
+benchmarks/golden_queries.json の質問を、アプリと同じ前処理（部署名の付与・クエリ拡張）で
+VectorStore.search に流し、次の項目を計測する。LLMは呼び出さないのでオフラインで実行できる
+--query-mode expanded では拡張した1つの文字列をすべての段階に使う従来の方法で検索する（構造化クエリとの比較用）
+
+- 段階ごとの所要時間（クエリ拡張・階層検索の対象選択・ベクトル・キーワード・BM25・リランキング・全体）のp50/p95/p99
+- 正解チャンクに対する recall@k と MRR
+- 回答のプロンプトの参照情報のトークン数（トークン予算に収める前後）と、収めた後も正解が残る割合（packed_recall）
+  --compress-ratio を指定すると、トークン予算の前に抽出型圧縮（context_compressor）をかけて比較できる
+- メモリ使用量（モデル読み込み前後・計測後のRSS、最大RSS）
+
+結果はJSONで benchmarks/results/ に保存するので、変更前後の結果を --compare で比較できる
+
+使い方:
+    python benchmarks/run_retrieval_benchmark.py
+    python benchmarks/run_retrieval_benchmark.py --compare benchmarks/results/retrieval_20261019_120000.json
+    python benchmarks/run_retrieval_benchmark.py --query-mode expanded --output /tmp/expanded.json
+    python benchmarks/run_retrieval_benchmark.py --compare /tmp/expanded.json
+    python benchmarks/run_retrieval_benchmark.py --hierarchical --compare benchmarks/results/retrieval_<日時>.json
+    python benchmarks/run_retrieval_benchmark.py --context-budget 0   # トークン予算なし（比較用）
+    python benchmarks/run_retrieval_benchmark.py --compress-ratio 0.5 --compare benchmarks/results/retrieval_<日時>.json
+    （data/chroma_db にドキュメントが登録済みであること）
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from bm25_index import normalize_text
+import metrics
+from context_compressor import compress_chunks
+from context_packer import context_token_budget, get_token_counter, pack_context
+from metrics import resident_memory_bytes
+from vector_store import VectorStore
+from app import build_search_query, expand_query, make_search_query
+from query_expander import SearchQuery
+
+
+DEFAULT_GOLDEN = os.path.join(ROOT_DIR, 'benchmarks', 'golden_queries.json')
+DEFAULT_RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+STAGES = ['expand', 'route', 'vector', 'keyword', 'bm25', 'legs', 'rerank', 'total', 'compress']
+
+
+def is_target(result: Dict, target: Dict) -> bool:
+    """検索結果のチャンクが正解の指定に一致するか（本文は空白・全角半角を正規化して比較）"""
+    if target['filename'] not in result['metadata'].get('filename', ''):
+        return False
+    content = normalize_text(result['content'])
+    return all(normalize_text(text) in content for text in target['contains'])
+
+
+def evaluate(results: List[Dict], targets: List[Dict], ks: List[int]) -> Dict:
+    """
+    1クエリ分の検索結果を評価
+
+    Returns:
+        各正解の順位（見つからなければNone）、recall@k、逆順位
+    """
+    target_ranks = []
+    for target in targets:
+        rank = next((i + 1 for i, result in enumerate(results) if is_target(result, target)), None)
+        target_ranks.append(rank)
+
+    found = [rank for rank in target_ranks if rank is not None]
+    first_rank = min(found) if found else None
+    return {
+        'target_ranks': target_ranks,
+        'first_rank': first_rank,
+        'recall': {k: sum(1 for rank in found if rank <= k) / len(targets) for k in ks},
+        'reciprocal_rank': 1.0 / first_rank if first_rank else 0.0,
+    }
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """所要時間（ミリ秒）の平均とパーセンタイル"""
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        'mean': round(float(arr.mean()), 2),
+        'p50': round(float(np.percentile(arr, 50)), 2),
+        'p95': round(float(np.percentile(arr, 95)), 2),
+        'p99': round(float(np.percentile(arr, 99)), 2),
+    }
+
+
+def git_revision() -> str:
+    """計測したコードのコミット（取得できなければ空文字）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def print_comparison(current: Dict, baseline: Dict):
+    """前回の結果との差分を表示"""
+    print(f"\n=== 比較: {baseline.get('git_revision') or '-'} ({baseline['timestamp']}) → 今回 ===")
+    if baseline['golden_version'] != current['golden_version']:
+        print(f"※ ゴールデンセットのバージョンが異なります（{baseline['golden_version']} → {current['golden_version']}）")
+
+    before_mode = baseline['config'].get('query_mode', 'expanded')
+    if before_mode != current['config']['query_mode']:
+        print(f"クエリの渡し方: {before_mode} → {current['config']['query_mode']}")
+    if 'query_chars' in baseline:
+        print(f"埋め込み・リランキングのクエリ文字数: {baseline['query_chars']['embedding']:.1f}"
+              f" → {current['query_chars']['embedding']:.1f}")
+
+    if 'result_sizes' in baseline:
+        for name, label in (('rerank_pairs', 'リランキングのペア数'), ('result_chars', '結果の本文の文字数')):
+            print(f"{label}: {baseline['result_sizes'][name]:.1f} → {current['result_sizes'][name]:.1f}")
+
+    if 'context_tokens' in baseline:
+        print(f"参照情報のトークン数: {baseline['context_tokens']['packed']:.1f} → {current['context_tokens']['packed']:.1f}")
+
+    for name in list(current['quality']):
+        before, after = baseline['quality'].get(name), current['quality'][name]
+        if before is not None:
+            print(f"{name:<12} {before:7.3f} → {after:7.3f} ({after - before:+.3f})")
+
+    for stage, stats in current['latency_ms'].items():
+        before = baseline['latency_ms'].get(stage)
+        if before:
+            print(f"{stage:<12} p50 {before['p50']:8.1f} → {stats['p50']:8.1f} ms   "
+                  f"p95 {before['p95']:8.1f} → {stats['p95']:8.1f} ms")
+
+    baseline_queries = {q['id']: q for q in baseline.get('queries', [])}
+    for query in current['queries']:
+        before = baseline_queries.get(query['id'])
+        if before and before['first_rank'] != query['first_rank']:
+            print(f"  順位変化 {query['id']}: {before['first_rank']} → {query['first_rank']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--golden', default=DEFAULT_GOLDEN, help='ゴールデンセットのJSON')
+    parser.add_argument('--n-results', type=int, default=15, help='検索結果の件数（アプリと同じ15）')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5, 10], help='recall@k のk')
+    parser.add_argument('--repeat', type=int, default=3, help='所要時間を計測する繰り返し回数')
+    parser.add_argument('--no-expand', action='store_true', help='クエリ拡張を行わない')
+    parser.add_argument('--no-rerank', action='store_true', help='リランキングを行わない')
+    parser.add_argument('--no-merge', action='store_true', help='連続したチャンクを結合しない（結合前との比較用）')
+    parser.add_argument('--hierarchical', action='store_true',
+                        help='文書・セクションの要約ベクトルで検索対象を選んでからチャンクを検索する（階層検索）')
+    parser.add_argument('--route-documents', type=int, default=3, help='階層検索で選ぶ文書の数')
+    parser.add_argument('--route-sections', type=int, default=8, help='階層検索で選ぶセクションの数')
+    parser.add_argument('--query-mode', choices=['structured', 'expanded'], default='structured',
+                        help='structured: 埋め込み・リランキングは部署名 + 質問、キーワード検索・BM25は同義語も使う（アプリと同じ）。'
+                             'expanded: 拡張した1つの文字列をすべての段階に使う（従来）')
+    parser.add_argument('--context-budget', type=int, default=context_token_budget(),
+                        help='回答のプロンプトの参照情報のトークン予算（既定は CONTEXT_TOKEN_BUDGET、0で予算なし）')
+    parser.add_argument('--compress-ratio', type=float,
+                        help='抽出型圧縮で各チャンクに残す本文の割合（省略時は圧縮しない）')
+    parser.add_argument('--output', help='結果の保存先（省略時は benchmarks/results/retrieval_<日時>.json）')
+    parser.add_argument('--compare', help='比較する過去の結果JSON')
+    args = parser.parse_args()
+
+    with open(args.golden, encoding='utf-8') as f:
+        golden = json.load(f)
+    queries = golden['queries']
+
+    rss_start = resident_memory_bytes()
+    # 繰り返し計測で推論を省かないようクエリ埋め込みのキャッシュは無効にする
+    store = VectorStore(embedding_cache_size=0, merge_adjacent_chunks=not args.no_merge,
+                        hierarchical_search=args.hierarchical, route_documents=args.route_documents,
+                        route_sections=args.route_sections)
+    rss_loaded = resident_memory_bytes()
+    if store.get_collection_count() == 0:
+        print("ドキュメントが登録されていません。アプリで読み込んでから実行してください。")
+        sys.exit(1)
+
+    # 初回推論のウォームアップ
+    store.search(queries[0]['question'], n_results=args.n_results)
+
+    stage_times = {stage: [] for stage in STAGES}
+    per_query = []
+    query_chars = {'embedding': [], 'keyword': []}
+    result_sizes = {'rerank_pairs': [], 'result_chars': []}
+    context_tokens = {'original': [], 'packed': []}
+    context_chars = {'original': [], 'compressed': []}
+    counter = get_token_counter()
+    for query in queries:
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            if args.query_mode == 'structured':
+                search_query = make_search_query(query['question'], query['department'])
+                if args.no_expand:
+                    search_query = SearchQuery(search_query.text, search_query.department)
+            else:
+                search_query = build_search_query(query['question'], query['department'])
+                if not args.no_expand:
+                    search_query = expand_query(search_query)
+                search_query = SearchQuery(search_query)
+            stage_times['expand'].append((time.perf_counter() - t0) * 1000)
+
+            pairs_before = metrics.RERANK_PAIRS.get()
+            results = store.search(
+                search_query,
+                n_results=args.n_results,
+                use_reranking=not args.no_rerank,
+                distance_threshold=3.0,
+                department=query['department'],
+            )
+            result_sizes['rerank_pairs'].append(metrics.RERANK_PAIRS.get() - pairs_before)
+            result_sizes['result_chars'].append(sum(len(r['content']) for r in results))
+            for stage, elapsed in store.last_search_timings.items():
+                if stage in stage_times:
+                    stage_times[stage].append(elapsed)
+
+        # 埋め込み・リランキングに渡す文字数（Cross-Encoderはこの文字列を候補チャンクの数だけ推論する）
+        query_chars['embedding'].append(len(search_query.semantic_text))
+        query_chars['keyword'].append(len(search_query.keyword_text))
+        evaluation = evaluate(results, query['targets'], args.k)
+
+        # アプリと同じく（圧縮して）トークン予算に収めた参照情報に、正解が（切り詰められずに）残っているか
+        context_chunks = results
+        if args.compress_ratio is not None:
+            t0 = time.perf_counter()
+            context_chunks = compress_chunks(search_query.semantic_text, results, store.score_passages,
+                                             keep_ratio=args.compress_ratio)
+            stage_times['compress'].append((time.perf_counter() - t0) * 1000)
+        context_chars['original'].append(sum(len(r['content']) for r in results))
+        context_chars['compressed'].append(sum(len(r['content']) for r in context_chunks))
+        packed = pack_context(context_chunks, args.context_budget, counter)
+        context_tokens['original'].append(packed.original_tokens)
+        context_tokens['packed'].append(packed.tokens)
+        evaluation['packed_recall'] = sum(
+            any(is_target(result, target) for result in packed.chunks) for target in query['targets']
+        ) / len(query['targets'])
+        per_query.append({'id': query['id'], 'department': query['department'], **evaluation})
+    rss_end = resident_memory_bytes()
+
+    quality = {f"recall@{k}": round(float(np.mean([q['recall'][k] for q in per_query])), 4) for k in args.k}
+    quality['mrr'] = round(float(np.mean([q['reciprocal_rank'] for q in per_query])), 4)
+    quality['packed_recall'] = round(float(np.mean([q['packed_recall'] for q in per_query])), 4)
+    latency = {stage: latency_summary(values) for stage, values in stage_times.items() if values}
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'golden_version': golden['version'],
+        'config': {
+            'n_results': args.n_results,
+            'repeat': args.repeat,
+            'expand_query': not args.no_expand,
+            'query_mode': args.query_mode,
+            'merge_adjacent_chunks': not args.no_merge,
+            'hierarchical_search': args.hierarchical,
+            'reranking': not args.no_rerank,
+            'context_budget': args.context_budget,
+            'compress_ratio': args.compress_ratio,
+            'tokenizer': counter.method,
+            'parallel_search': store.parallel_search,
+            'collection_count': store.get_collection_count(),
+        },
+        'quality': quality,
+        'latency_ms': latency,
+        'query_chars': {name: round(float(np.mean(values)), 1) for name, values in query_chars.items()},
+        # 1検索あたりのリランキングのペア数と、返した結果の本文の合計文字数（回答のプロンプトの大きさの目安）
+        'result_sizes': {name: round(float(np.mean(values)), 1) for name, values in result_sizes.items()},
+        # 回答のプロンプトの参照情報のトークン数（1質問の平均）
+        'context_tokens': {name: round(float(np.mean(values)), 1) for name, values in context_tokens.items()},
+        'context_chars': {name: round(float(np.mean(values)), 1) for name, values in context_chars.items()},
+        'memory_mb': {
+            'rss_start': round(rss_start / 1024 ** 2, 1),
+            'rss_after_load': round(rss_loaded / 1024 ** 2, 1),
+            'rss_end': round(rss_end / 1024 ** 2, 1),
+        },
+        'queries': per_query,
+    }
+
+    print(f"\nゴールデンセット v{golden['version']}: {len(queries)} クエリ × {args.repeat} 回")
+    print("\n=== 精度 ===")
+    for name, value in quality.items():
+        print(f"{name:<12} {value:.3f}")
+    print(f"\nクエリの平均文字数（{args.query_mode}）: 埋め込み・リランキング {report['query_chars']['embedding']:.1f}"
+          f" / キーワード検索 {report['query_chars']['keyword']:.1f}")
+    print(f"リランキングのペア数 {report['result_sizes']['rerank_pairs']:.1f} / 結果の本文 {report['result_sizes']['result_chars']:.0f} 文字（1検索の平均）")
+    print(f"参照情報 {report['context_tokens']['original']:.0f} → {report['context_tokens']['packed']:.0f} トークン"
+          f"（予算 {args.context_budget}, {counter.method}）")
+    if args.compress_ratio is not None:
+        print(f"圧縮（残す割合 {args.compress_ratio}）: 本文 {report['context_chars']['original']:.0f}"
+              f" → {report['context_chars']['compressed']:.0f} 文字")
+    print("\n=== 所要時間（ms） ===")
+    print(f"{'段階':<10} {'平均':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage, stats in latency.items():
+        print(f"{stage:<10} {stats['mean']:8.1f} {stats['p50']:8.1f} {stats['p95']:8.1f} {stats['p99']:8.1f}")
+    print("\n=== メモリ（RSS, MB） ===")
+    for name, value in report['memory_mb'].items():
+        print(f"{name:<16} {value:8.1f}")
+
+    missed = [q['id'] for q in per_query if q['first_rank'] is None]
+    if missed:
+        print(f"\n正解が{args.n_results}件以内に入らなかったクエリ: {', '.join(missed)}")
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"retrieval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
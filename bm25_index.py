@@ -0,0 +1,233 @@
+"""
+BM25スパース検索モジュール
+文字n-gram（2-gram/3-gram）でトークン化するため、形態素解析器なしで日本語に対応
+転置インデックスはCSR形式のnumpy配列で保持し、クエリ語のポスティングをまとめてベクトル演算でスコアリング
+"""
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    n-gram化の前処理（全角英数の半角化、空白の除去）
+
+    「薬　局」「第１条」のような表記ゆれを「薬局」「第1条」に揃える
+    """
+    text = unicodedata.normalize('NFKC', text)
+    return _WHITESPACE_PATTERN.sub('', text)
+
+
+def char_ngrams(text: str, ngram_sizes: Sequence[int] = (2, 3)) -> List[str]:
+    """
+    テキストを文字n-gramのリストに分割
+
+    Args:
+        text: 分割するテキスト
+        ngram_sizes: 生成するn-gramの長さ
+
+    Returns:
+        n-gramのリスト（重複あり）
+    """
+    text = normalize_text(text)
+    grams = []
+    for n in ngram_sizes:
+        if len(text) < n:
+            continue
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class BM25Index:
+    """文字n-gramによるBM25転置インデックス（CSR形式）"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, ngram_sizes: Sequence[int] = (2, 3)):
+        """
+        Args:
+            k1: 語頻度の飽和パラメータ
+            b: 文書長による正規化の強さ
+            ngram_sizes: トークン化に使う文字n-gramの長さ
+        """
+        self.k1 = k1
+        self.b = b
+        self.ngram_sizes = tuple(ngram_sizes)
+
+        self.ids: List[str] = []
+        # チャンクごとの区分（部署名など）。絞り込み検索のマスク作成に使用
+        self.partitions: Optional[np.ndarray] = None
+        self.vocab: Dict[str, int] = {}
+        # CSR: term_id の postings は doc_indices[indptr[t]:indptr[t+1]]
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_indices = np.zeros(0, dtype=np.int32)
+        self.term_freqs = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.avg_doc_length = 0.0
+        # 構築元の登録内容のバージョン（VectorStore.index_version。保存済みのインデックスが古くないかの確認用）
+        self.index_version = ""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build(self, ids: List[str], documents: List[str], partitions: Optional[List[str]] = None):
+        """
+        チャンク全体からインデックスを構築
+
+        Args:
+            ids: チャンクID（ChromaDBのIDと同じもの）
+            documents: チャンクのテキスト
+            partitions: チャンクごとの区分（部署名など、Noneなら区分なし）
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for doc_idx, doc in enumerate(documents):
+            grams = char_ngrams(doc, self.ngram_sizes)
+            doc_lengths[doc_idx] = len(grams)
+            for term, tf in Counter(grams).items():
+                postings.setdefault(term, []).append((doc_idx, tf))
+
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        for term_id, term in enumerate(terms):
+            indptr[term_id + 1] = indptr[term_id] + len(postings[term])
+
+        doc_indices = np.empty(indptr[-1], dtype=np.int32)
+        term_freqs = np.empty(indptr[-1], dtype=np.float32)
+        for term_id, term in enumerate(terms):
+            start, end = indptr[term_id], indptr[term_id + 1]
+            entries = postings[term]
+            doc_indices[start:end] = [d for d, _ in entries]
+            term_freqs[start:end] = [tf for _, tf in entries]
+
+        self.ids = list(ids)
+        self.partitions = np.array(partitions, dtype=str) if partitions is not None else None
+        self.vocab = {term: term_id for term_id, term in enumerate(terms)}
+        self.indptr = indptr
+        self.doc_indices = doc_indices
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        self._compute_idf()
+
+    def _compute_idf(self):
+        """各語のIDF（Lucene方式の非負IDF）を計算"""
+        n_docs = len(self.ids)
+        doc_freqs = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log1p((n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    def partition_mask(self, values: List[str]) -> Optional[np.ndarray]:
+        """
+        指定した区分に属するチャンクのブールマスクを返す
+
+        Returns:
+            マスク配列。区分情報がないインデックスではNone（絞り込みなし）
+        """
+        if self.partitions is None:
+            return None
+        return np.isin(self.partitions, values)
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        クエリに対する全チャンクのBM25スコアを計算
+
+        Returns:
+            チャンク数と同じ長さのスコア配列
+        """
+        n_docs = len(self.ids)
+        if n_docs == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        query_terms = Counter(char_ngrams(query, self.ngram_sizes))
+        term_ids = [self.vocab[t] for t in query_terms if t in self.vocab]
+        if not term_ids:
+            return np.zeros(n_docs, dtype=np.float32)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        starts = self.indptr[term_ids]
+        lengths = self.indptr[term_ids + 1] - starts
+
+        # 対象語のポスティングを1本の配列に連結（ループなしでスライス位置を計算）
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        positions = np.arange(lengths.sum()) + offsets
+        docs = self.doc_indices[positions]
+        tf = self.term_freqs[positions]
+        idf = np.repeat(self.idf[term_ids], lengths)
+
+        avg_doc_length = self.avg_doc_length or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / avg_doc_length)
+        weights = idf * tf * (self.k1 + 1) / (tf + norm)
+        return np.bincount(docs, weights=weights, minlength=n_docs).astype(np.float32)
+
+    def search(self, query: str, top_k: int, mask: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        BM25スコア上位のチャンクを返す
+
+        Args:
+            query: 検索クエリ
+            top_k: 返す件数
+            mask: 検索対象とするチャンクのブールマスク（Noneなら全件）
+
+        Returns:
+            [{'id': str, 'index': int, 'score': float}] のリスト（スコア降順）
+        """
+        scores = self.score(query)
+        if len(scores) == 0:
+            return []
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        return [
+            {'id': self.ids[i], 'index': int(i), 'score': float(scores[i])}
+            for i in candidates if scores[i] > 0
+        ]
+
+    def save(self, path: str):
+        """インデックスを.npzファイルに保存"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez_compressed(
+            path,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+            ngram_sizes=np.array(self.ngram_sizes, dtype=np.int32),
+            ids=np.array(self.ids, dtype=str),
+            partitions=self.partitions if self.partitions is not None else np.zeros(0, dtype=str),
+            has_partitions=np.array(self.partitions is not None),
+            terms=np.array(terms, dtype=str),
+            indptr=self.indptr,
+            doc_indices=self.doc_indices,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            index_version=np.array(self.index_version, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        """保存済みのインデックスを読み込み"""
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = data['params'].tolist()
+            index = cls(k1=k1, b=b, ngram_sizes=data['ngram_sizes'].tolist())
+            index.ids = data['ids'].tolist()
+            if 'has_partitions' in data.files and bool(data['has_partitions']):
+                index.partitions = data['partitions']
+            index.vocab = {term: term_id for term_id, term in enumerate(data['terms'].tolist())}
+            index.indptr = data['indptr']
+            index.doc_indices = data['doc_indices']
+            index.term_freqs = data['term_freqs']
+            index.doc_lengths = data['doc_lengths']
+            if 'index_version' in data.files:
+                index.index_version = str(data['index_version'])
+        index.avg_doc_length = float(index.doc_lengths.mean()) if len(index.doc_lengths) else 0.0
+        index._compute_idf()
+        return index
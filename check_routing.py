@@ -0,0 +1,47 @@
+"""
+質問の振り分けを確認するスクリプト
+
+answer_question と同じ振り分け（find_direct_answer: 条文 → 事前計算 → 事前キャッシュ → 勤務時間表、
+どれにも当てはまらなければ検索）に代表的な質問を流し、想定した回答の種類になるかを表示する
+「何時間」を含む質問が勤務時間表に振り分けられないことなど、resources/intents.json を変えたときに実行する
+（勤務時間表・条文インデックスはドキュメント読み込み時に作成されるため、アプリで読み込んでから実行すること。
+事前計算した回答表があれば、アプリと同じく登録内容のバージョンが一致する場合だけ使う）
+
+使い方:
+    python check_routing.py
+"""
+import sys
+
+from app import find_direct_answer
+from vector_store import VectorStore
+
+# (質問, 部署, 想定する回答の種類。None は検索 → LLM)
+CASES = [
+    ("時間外手当は月何時間から？", "看護部門", {"precached"}),
+    ("介護休業は何時間単位で取れますか", "看護部門", {"precached"}),
+    ("看護部門の残業は月何時間までですか", "看護部門", {None}),
+    ("始業は何時ですか", "看護部門", {"shift_table"}),
+    ("勤務時間を教えてください", "看護部門", {"precomputed", "shift_table"}),
+    ("有給休暇と特別休暇の付与日数を教えてください", "看護部門", {"precomputed", "precached"}),
+    ("就業規則の第36条", "看護部門", {"article"}),
+]
+
+
+def main():
+    # アプリと同じ登録内容のバージョン（モデルは読み込まない）
+    index_version = VectorStore().index_version
+    failed = 0
+    for question, department, expected in CASES:
+        direct = find_direct_answer(question, department, index_version)
+        route = direct['route'] if direct else None
+        ok = route in expected
+        failed += not ok
+        expected_label = " / ".join(e or "search" for e in sorted(expected, key=str))
+        print(f"{'✓' if ok else '✗'} {question}（{department}）: {route or 'search'}（想定: {expected_label}）")
+
+    print(f"\n{len(CASES) - failed}/{len(CASES)} 件が想定どおり")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+検索結果の隣接チャンクの結合
+chunk_text はチャンク間に150文字のオーバーラップを持たせるため、同じファイルの連続したチャンクが
+一緒にヒットすると、回答のプロンプトに同じ文章が繰り返し入る
+
+リランキングの前に、同じファイルで chunk_index が連続する結果を1つの範囲にまとめ、
+重なった部分を取り除く。勤務時間表のチャンクは本文の続きではないので結合しない
+リランキングモデル（入力は質問と合わせて512トークン、日本語は1文字 ≒ 1トークン）は結合した本文の
+先頭しか読まないため、結合した範囲は元のチャンクごとに採点して最大値を使う（member_contents に元の本文を残す）
+"""
+from typing import Dict, List
+
+from document_processor import TIME_TABLE_HEADER_PATTERN
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int = 400, min_overlap: int = 10) -> str:
+    """
+    following の先頭のうち previous の末尾と重なっている部分を除いた残り
+
+    チャンクは前後の空白を除いて保存しているため、重なりの長さは一定ではない。
+    previous の末尾 max_overlap 文字の中で following の書き出しと一致する位置を探す
+    """
+    probe = following[:min_overlap]
+    if len(probe) < min_overlap:
+        return following
+    window_start = max(0, len(previous) - max_overlap)
+    position = previous.find(probe, window_start)
+    while position != -1:
+        overlap = len(previous) - position
+        if following.startswith(previous[position:]):
+            return following[overlap:]
+        position = previous.find(probe, position + 1)
+    return following
+
+
+def _is_mergeable(result: Dict) -> bool:
+    metadata = result.get('metadata') or {}
+    return ('chunk_index' in metadata and 'filename' in metadata
+            and not TIME_TABLE_HEADER_PATTERN.match(result['content']))
+
+
+def merge_adjacent_results(results: Dict[str, Dict], max_chars: int = 2400) -> Dict[str, Dict]:
+    """
+    同じファイルの連続したチャンクを結合
+
+    Args:
+        results: チャンクID → 検索結果（_fuse_results の形式）
+        max_chars: 結合後の本文の上限文字数（回答のプロンプトに入れる1件の長さの上限）
+
+    Returns:
+        チャンクID → 検索結果。結合した結果は先頭チャンクのIDで、元の順序の先頭チャンクの位置に置く。
+        distance は最小値、keyword_score / bm25_score は最大値を使い、
+        metadata の merged_chunks に結合したチャンク数、chunk_index_end に最後のチャンク番号を入れる。
+        結合した結果の member_contents は結合前の各チャンクの本文（リランキング用）
+    """
+    by_file: Dict[str, List[tuple]] = {}
+    for doc_id, result in results.items():
+        if _is_mergeable(result):
+            by_file.setdefault(result['metadata']['filename'], []).append((doc_id, result))
+
+    # 結合先（先頭チャンク）のID → 結合したチャンクのIDのリスト
+    groups: Dict[str, List[str]] = {}
+    merged: Dict[str, Dict] = {}
+    for hits in by_file.values():
+        hits.sort(key=lambda hit: hit[1]['metadata']['chunk_index'])
+        head_id, head = None, None
+        for doc_id, result in hits:
+            index = result['metadata']['chunk_index']
+            if (head is not None and index == head['metadata']['chunk_index_end'] + 1):
+                addition = strip_overlap(head['content'], result['content'])
+                if len(head['content']) + len(addition) <= max_chars:
+                    head['content'] += addition
+                    head['member_contents'].append(result['content'])
+                    head['metadata']['chunk_index_end'] = index
+                    head['metadata']['merged_chunks'] += 1
+                    head['distance'] = min(head['distance'], result['distance'])
+                    head['keyword_score'] = max(head['keyword_score'], result['keyword_score'])
+                    head['bm25_score'] = max(head['bm25_score'], result['bm25_score'])
+                    groups[head_id].append(doc_id)
+                    continue
+            head_id = doc_id
+            head = dict(result, metadata=dict(result['metadata'], chunk_index_end=index, merged_chunks=1),
+                        member_contents=[result['content']])
+            merged[doc_id] = head
+            groups[doc_id] = [doc_id]
+
+    consumed = {doc_id for head_id, ids in groups.items() for doc_id in ids if doc_id != head_id}
+    return {
+        doc_id: merged.get(doc_id, result)
+        for doc_id, result in results.items()
+        if doc_id not in consumed
+    }
@@ -0,0 +1,168 @@
+"""
+回答プロンプトの参照情報の抽出型圧縮
+上位のチャンクでも、質問と関係のない規程の文章が長く続くことが多い。チャンクを文・表・見出しに分け、
+質問との類似度（検索で読み込み済みの埋め込みモデル、全チャンクの文を1回のバッチで推論）で採点し、
+チャンクごとに類似度の高い文・表から元の文字数の keep_ratio まで残す。見出し（章・条・（見出し））は
+その下の文を1つでも残した場合だけ残す
+
+勤務時間表（【…の勤務時間】）を含むチャンクは表が崩れないよう圧縮しない。短いチャンクもそのまま残す
+"""
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from article_index import CAPTION_PATTERN
+from document_processor import TIME_TABLE_HEADER_PATTERN
+
+# 文の区切り（句点・感嘆符・疑問符の直後）
+SENTENCE_PATTERN = re.compile(r'[^。！？]*[。！？]|[^。！？]+$')
+
+# 章・条の見出し（「第20条（年次有給休暇）」のように見出しが続く行も含む）
+HEADING_PATTERN = re.compile(r'^第\s*[0-9０-９一二三四五六七八九十百]+\s*(章|条)')
+
+# 見出しとして扱う行の長さの上限（これより長い行と句点で終わる行は、章・条で始まっても文として扱う）
+MAX_HEADER_CHARS = 40
+
+
+@dataclass
+class Unit:
+    """採点・取捨選択の単位"""
+    text: str
+    line: int           # 元の行番号（同じ行の文は改行せずにつなぐ）
+    kind: str           # 'sentence' / 'table' / 'header'
+    level: int = 1      # 見出しの階層（章は0、それ以外は1）
+
+
+def _header_level(line: str):
+    """見出しの階層（見出しでなければNone）"""
+    stripped = line.strip()
+    if not stripped or len(stripped) > MAX_HEADER_CHARS or stripped.endswith('。'):
+        return None
+    heading = HEADING_PATTERN.match(stripped)
+    if heading:
+        return 0 if heading.group(1) == '章' else 1
+    if stripped.startswith('#'):
+        return max(len(stripped) - len(stripped.lstrip('#')) - 1, 0)
+    if CAPTION_PATTERN.match(stripped):
+        return 1
+    return None
+
+
+def split_units(content: str) -> List[Unit]:
+    """チャンクの本文を文・表（連続した | で始まる行）・見出しに分ける"""
+    units: List[Unit] = []
+    table_lines: List[str] = []
+    table_start = 0
+
+    def flush_table():
+        if table_lines:
+            units.append(Unit("\n".join(table_lines), table_start, 'table'))
+            table_lines.clear()
+
+    for line_number, line in enumerate(content.split("\n")):
+        if line.lstrip().startswith('|'):
+            if not table_lines:
+                table_start = line_number
+            table_lines.append(line)
+            continue
+        flush_table()
+        if not line.strip():
+            continue
+        level = _header_level(line)
+        if level is not None:
+            units.append(Unit(line, line_number, 'header', level))
+            continue
+        for sentence in SENTENCE_PATTERN.findall(line):
+            if sentence.strip():
+                units.append(Unit(sentence, line_number, 'sentence'))
+    flush_table()
+    return units
+
+
+def _select(units: List[Unit], scores: Sequence[float], keep_ratio: float) -> List[bool]:
+    """類似度の高い文・表から、本文の文字数の keep_ratio まで残す（最低1つ）"""
+    body = [i for i, unit in enumerate(units) if unit.kind != 'header']
+    keep = [False] * len(units)
+    limit = keep_ratio * sum(len(units[i].text) for i in body)
+    kept_chars = 0
+    for position in np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable'):
+        index = body[position]
+        if kept_chars and kept_chars + len(units[index].text) > limit:
+            continue
+        keep[index] = True
+        kept_chars += len(units[index].text)
+
+    # 見出しは、次の同じ階層以上の見出しまでに残した文・表がある場合だけ残す
+    for i, unit in enumerate(units):
+        if unit.kind != 'header':
+            continue
+        for j in range(i + 1, len(units)):
+            if units[j].kind == 'header' and units[j].level <= unit.level:
+                break
+            if units[j].kind != 'header' and keep[j]:
+                keep[i] = True
+                break
+    return keep
+
+
+def _join(units: List[Unit], keep: List[bool]) -> str:
+    """残した単位を元の順につなぐ（同じ行の文は続けて、行が変われば改行）"""
+    lines: List[str] = []
+    last_line = None
+    for unit, kept in zip(units, keep):
+        if not kept:
+            continue
+        if unit.line == last_line:
+            lines[-1] += unit.text
+        else:
+            lines.append(unit.text.strip() if unit.kind == 'sentence' else unit.text)
+        last_line = unit.line
+    return "\n".join(lines)
+
+
+def compress_chunks(query: str, chunks: List[Dict],
+                    score_fn: Callable[[str, List[str]], Sequence[float]],
+                    keep_ratio: float = 0.5, min_chars: int = 300) -> List[Dict]:
+    """
+    検索結果のチャンクを、質問に関係の深い文・表・見出しだけに圧縮
+
+    Args:
+        query: 質問（検索の埋め込みに使った semantic_text を渡すとクエリ埋め込みのキャッシュが効く）
+        chunks: 検索結果（順序は変えない）
+        score_fn: (質問, 文のリスト) → 類似度の配列（VectorStore.score_passages）
+        keep_ratio: チャンクごとに残す本文の文字数の割合
+        min_chars: これより短いチャンクは圧縮しない
+
+    Returns:
+        検索結果（圧縮したものは content を置き換え、metadata の compressed_from に元の文字数を入れる）
+    """
+    targets = []
+    for index, chunk in enumerate(chunks):
+        content = chunk['content']
+        if len(content) < min_chars or TIME_TABLE_HEADER_PATTERN.search(content):
+            continue
+        units = split_units(content)
+        if sum(1 for unit in units if unit.kind != 'header') > 1:
+            targets.append((index, units))
+    if not targets:
+        return list(chunks)
+
+    # 全チャンクの文・表をまとめて1回で採点
+    passages = [unit.text for _, units in targets for unit in units if unit.kind != 'header']
+    scores = np.asarray(score_fn(query, passages))
+
+    compressed = list(chunks)
+    offset = 0
+    for index, units in targets:
+        count = sum(1 for unit in units if unit.kind != 'header')
+        keep = _select(units, scores[offset:offset + count], keep_ratio)
+        offset += count
+        chunk = chunks[index]
+        compressed[index] = dict(
+            chunk,
+            content=_join(units, keep),
+            metadata=dict(chunk['metadata'], compressed_from=len(chunk['content'])),
+        )
+    return compressed
@@ -0,0 +1,163 @@
+"""
+回答プロンプトの参照情報のトークン予算
+検索結果（最大15チャンク × 約800文字）をそのまま並べるとプロンプトが大きくなり、LLMの応答時間と
+APIのレート制限（1分あたりのトークン数）を圧迫する。検索結果の順（リランクスコア順・休暇の表を優先）に
+予算の範囲で参照情報に入れ、予算に収まらないチャンクは文の区切りで末尾を切り詰め、残りは入れない
+
+トークン数はローカルのトークナイザー（CONTEXT_TOKENIZER、既定は埋め込みモデルと同じ
+intfloat/multilingual-e5-base）で数える。transformers やモデルのファイルがなければ文字数から見積もる
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+DEFAULT_TOKENIZER = "intfloat/multilingual-e5-base"
+DEFAULT_CONTEXT_TOKEN_BUDGET = 4000
+
+# 文の区切り（句点・感嘆符・疑問符・改行の直後）。表は行単位で切る
+SENTENCE_PATTERN = re.compile(r'[^。！？\n]*(?:[。！？]\n?|\n)|[^。！？\n]+$')
+
+
+def format_context_chunk(chunk: Dict) -> str:
+    """参照情報の1件（llm_client.build_answer_prompt と同じ形式）"""
+    return f"【{chunk['metadata']['filename']}】\n{chunk['content']}"
+
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+
+class TokenCounter:
+    """ローカルのトークナイザーでトークン数を数える（最初に数える時点で読み込む）"""
+
+    def __init__(self, tokenizer_name: Optional[str]):
+        """
+        Args:
+            tokenizer_name: Hugging Face のトークナイザー名。Noneなら常に文字数から見積もる
+        """
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._loaded = tokenizer_name is None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                print(f"✓ トークナイザーを読み込みました: {self.tokenizer_name}")
+            except Exception as e:
+                print(f"トークナイザーを読み込めないため文字数から見積もります（{self.tokenizer_name}）: {e}")
+            self._loaded = True
+
+    @property
+    def method(self) -> str:
+        """数え方（表示用）"""
+        self._load()
+        return self.tokenizer_name if self._tokenizer is not None else "文字数からの見積もり"
+
+    def count(self, text: str) -> int:
+        """トークン数"""
+        if not text:
+            return 0
+        self._load()
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False))
+        # 日本語は1文字 ≒ 1トークン、英数字は4文字 ≒ 1トークンとして多めに見積もる
+        ascii_chars = sum(1 for char in text if ord(char) < 128)
+        return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+@dataclass
+class PackedContext:
+    """予算に収めた参照情報"""
+    chunks: List[Dict] = field(default_factory=list)  # プロンプトに入れるチャンク（切り詰めたものは content を置き換え）
+    tokens: int = 0             # 参照情報のトークン数
+    original_tokens: int = 0    # 全チャンクを入れた場合のトークン数
+    budget: int = 0
+    trimmed: int = 0            # 末尾を切り詰めたチャンク数
+    dropped: int = 0            # 入れなかったチャンク数
+
+    def summary(self) -> str:
+        """表示用の要約"""
+        return (f"参照情報 {self.tokens:,} / {self.original_tokens:,} トークン（予算 {self.budget:,}）, "
+                f"{len(self.chunks)} 件（切り詰め {self.trimmed} 件, 除外 {self.dropped} 件）")
+
+
+def trim_to_sentences(text: str, max_tokens: int, counter: TokenCounter) -> str:
+    """max_tokens に収まるよう、文の区切りで末尾を切り詰める（1文も収まらなければ空文字）"""
+    kept = []
+    used = 0
+    for sentence in SENTENCE_PATTERN.findall(text):
+        tokens = counter.count(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return "".join(kept).rstrip()
+
+
+def pack_context(chunks: List[Dict], budget: int, counter: TokenCounter,
+                 min_chunk_tokens: int = 80) -> PackedContext:
+    """
+    参照情報を予算内に収める
+
+    Args:
+        chunks: 検索結果（優先する順。アプリではリランクスコア順に休暇の表を先頭へ並べ替えたもの）
+        budget: 参照情報のトークン予算（0以下なら切り詰めない）
+        counter: トークンを数える TokenCounter
+        min_chunk_tokens: 切り詰めた結果がこれより短くなるチャンクは入れない
+
+    Returns:
+        PackedContext（chunks は入力と同じ順）
+    """
+    separator_tokens = counter.count(CHUNK_SEPARATOR)
+    sizes = [counter.count(format_context_chunk(chunk)) for chunk in chunks]
+    original = sum(sizes) + separator_tokens * max(len(chunks) - 1, 0)
+    if budget <= 0 or original <= budget:
+        return PackedContext(list(chunks), original, original, budget)
+
+    packed = PackedContext(original_tokens=original, budget=budget)
+    for chunk, size in zip(chunks, sizes):
+        cost = size + (separator_tokens if packed.chunks else 0)
+        remaining = budget - packed.tokens
+        if cost <= remaining:
+            packed.chunks.append(chunk)
+            packed.tokens += cost
+            continue
+
+        # 予算に収まらない最初のチャンクは文の区切りで切り詰め、以降のチャンクは入れない
+        header_tokens = cost - counter.count(chunk['content'])
+        allowance = remaining - header_tokens
+        if allowance >= min_chunk_tokens:
+            content = trim_to_sentences(chunk['content'], allowance, counter)
+            if counter.count(content) >= min_chunk_tokens:
+                packed.chunks.append(dict(chunk, content=content))
+                packed.tokens += header_tokens + counter.count(content)
+                packed.trimmed += 1
+        break
+
+    packed.dropped = len(chunks) - len(packed.chunks)
+    return packed
+
+
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """プロセスで共有する TokenCounter（CONTEXT_TOKENIZER が空なら文字数から見積もる）"""
+    global _token_counter
+    with _token_counter_lock:
+        if _token_counter is None:
+            _token_counter = TokenCounter(os.getenv("CONTEXT_TOKENIZER", DEFAULT_TOKENIZER) or None)
+        return _token_counter
+
+
+def context_token_budget() -> int:
+    """参照情報のトークン予算（CONTEXT_TOKEN_BUDGET、0なら切り詰めない）"""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", str(DEFAULT_CONTEXT_TOKEN_BUDGET)))
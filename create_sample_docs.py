@@ -1,9 +1,32 @@
 """
-テスト用のサンプル社内規定ファイルを作成
+テスト用の社内規定ファイルを作成
+
+引数なしで実行すると、従来どおり documents/ に小さなサンプル3件を作成する
+--docs を指定すると、規模試験用のコーパス（第N条構成の規定文書、部署別勤務時間表の埋め込みExcel、
+PDF・テキスト・Excel）を同じシードなら同じ内容で生成する
+
+使い方:
+    python create_sample_docs.py
+    python create_sample_docs.py --docs 1000 --departments 20 --output data/corpus_1k --seed 42
+    python create_sample_docs.py --docs 100000 --workers 8 --output data/corpus_100k
 """
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
 from docx import Document
 import openpyxl
 
+from document_processor import KNOWN_DEPARTMENTS
+
 # Word文書を作成（就業規則サンプル）
 def create_employment_rules():
     doc = Document()
@@ -146,10 +169,480 @@ def create_expense_rules():
     doc.save('documents/経費精算ルール.docx')
     print('✓ 経費精算ルール.docx を作成しました')
 
-if __name__ == '__main__':
+
+# ============================================================
+# 規模試験用コーパスの生成
+# ============================================================
+
+# 規定の種類ごとの章立て（章名と条の見出し）
+REGULATION_TOPICS = {
+    '就業規則': [
+        ('総則', ['目的', '適用範囲', '規則の遵守']),
+        ('採用及び異動', ['採用手続', '試用期間', '人事異動']),
+        ('勤務', ['労働時間及び休憩', '休日', '時間外及び休日労働', '出退勤']),
+        ('休暇', ['年次有給休暇', '特別休暇', '産前産後の休業', '育児時間']),
+        ('退職及び解雇', ['退職', '定年', '解雇']),
+    ],
+    '給与規定': [
+        ('総則', ['目的', '給与の支払']),
+        ('基本給及び手当', ['賃金の体系', '基本給', '資格手当', '夜勤手当', '通勤手当']),
+        ('割増賃金', ['時間外労働手当', '休日労働手当', '深夜労働手当']),
+        ('賞与', ['賞与の支給', '支給対象者']),
+    ],
+    '出張旅費規程': [
+        ('総則', ['目的', '旅費の種類', '旅費の計算']),
+        ('支給基準', ['交通費', '宿泊費', '日当']),
+        ('精算', ['旅費の精算', '仮払']),
+    ],
+    '育児介護休業規則': [
+        ('目的', ['目的']),
+        ('育児休業制度', ['育児休業の対象者', '育児休業の申出の手続等', '育児休業の期間等']),
+        ('介護休業制度', ['介護休業の対象者', '介護休業の申出の手続等', '介護休業の期間等']),
+        ('子の看護休暇', ['子の看護休暇']),
+    ],
+    '安全衛生規程': [
+        ('総則', ['目的', '安全衛生管理体制']),
+        ('健康管理', ['健康診断', 'ストレスチェック', '就業制限']),
+        ('災害補償', ['業務上の災害', '通勤災害']),
+    ],
+    '慶弔見舞金規程': [
+        ('総則', ['目的', '適用範囲']),
+        ('支給基準', ['結婚祝金', '出産祝金', '弔慰金', '傷病見舞金']),
+    ],
+}
+
+# 条文の本文テンプレート（{subject}などはランダムな値で置き換える）
+CLAUSE_TEMPLATES = [
+    'この規程は、{subject}に関する事項を定めることを目的とする。',
+    '{subject}は、所属長の承認を得て、{days}日前までに所定の届出をしなければならない。',
+    '前項の規定にかかわらず、業務の都合によりやむを得ない場合は、{subject}を変更することがある。',
+    '{subject}の期間は、原則として{days}日以内とする。ただし、病院が認めた場合はこの限りでない。',
+    '{subject}として、月額{amount:,}円を支給する。',
+    '{subject}に係る割増賃金率は{percent}％とする。',
+    '職員は、{subject}について、{hours}時間を超えない範囲で申請することができる。',
+    '{subject}を受けようとする職員は、所定の様式により{dept}に申し出るものとする。',
+    '採用日から{months}か月間継続勤務し、所定労働日の8割以上出勤した職員に対しては、{days}日の休暇を与える。',
+    '{subject}の取扱いについては、別に定める細則によるものとする。',
+]
+
+SUBJECTS = ['年次有給休暇', '特別休暇', '時間外労働', '夜勤手当', '通勤手当', '出張旅費', '育児休業',
+            '介護休業', '健康診断', '宿直勤務', '資格手当', '休日振替', '慶弔休暇', '研修参加']
+
+# 勤務種別（始業, 終業, 休憩）。休憩がNoneの勤務は半日勤務
+SHIFT_KINDS = [
+    ('日勤', (8, 30), (17, 0), (1, 12)),
+    ('早番', (6, 15), (14, 45), (1, 12)),
+    ('遅番', (10, 30), (19, 0), (1, 12)),
+    ('夜勤', (16, 30), (9, 0), (1, 54)),
+    ('土曜', (8, 30), (12, 0), None),
+]
+
+# KNOWN_DEPARTMENTS より多くの部署が必要なときの部署名の素材（抽出側が部署見出しと判定できる語尾）
+EXTRA_DEPARTMENT_STEMS = ['内科', '外科', '透析室', '手術部', '健診科', '臨床工学科', '医療安全室',
+                          '情報システム室', '総務部', '経理部', '人事部', '施設管理室', '医療相談室', '病棟看護部門']
+
+FULLWIDTH_DIGITS = str.maketrans('0123456789', '０１２３４５６７８９')
+
+# ファイル形式の既定の比率
+DEFAULT_FORMAT_MIX = {'docx': 6, 'pdf': 2, 'txt': 1, 'xlsx': 1}
+
+
+def to_fullwidth(number: int) -> str:
+    """数字を全角にする（第１条のような表記用）"""
+    return str(number).translate(FULLWIDTH_DIGITS)
+
+
+def spaced(text: str, gap: str = ' ') -> str:
+    """「看 護 部 門」のように1文字ずつ空白を入れる（実際の勤務表の表記）"""
+    return gap.join(text)
+
+
+def corpus_departments(n_departments: int) -> List[str]:
+    """コーパスに含める部署名（既存の部署から順に、足りなければ番号付きの部署を追加）"""
+    departments = [d for d in KNOWN_DEPARTMENTS if d != 'パートタイマー']
+    i = 0
+    while len(departments) < n_departments:
+        stem = EXTRA_DEPARTMENT_STEMS[i % len(EXTRA_DEPARTMENT_STEMS)]
+        departments.append(f"第{i // len(EXTRA_DEPARTMENT_STEMS) + 1}{stem}")
+        i += 1
+    return departments[:n_departments]
+
+
+def build_regulation(rng: random.Random, index: int) -> Dict:
+    """
+    第N章・第N条構成の規定文書を1件生成
+
+    Returns:
+        {'title': str, 'lines': [str], 'n_articles': int}
+    """
+    topic = rng.choice(sorted(REGULATION_TOPICS))
+    title = f"{topic}（{index + 1:06d}）"
+    lines = [title, '医療法人 サンプル病院']
+    article_no = 0
+    for chapter_no, (chapter, captions) in enumerate(REGULATION_TOPICS[topic], 1):
+        lines.append(f"第{to_fullwidth(chapter_no)}章　{chapter}")
+        # 条の数を変えて文書の長さにばらつきを持たせる
+        for caption in captions * rng.randint(1, 3):
+            article_no += 1
+            lines.append(f"（{caption}）")
+            clauses = rng.sample(CLAUSE_TEMPLATES, rng.randint(1, 4))
+            for clause_no, template in enumerate(clauses, 1):
+                text = template.format(
+                    subject=rng.choice(SUBJECTS), days=rng.choice([3, 5, 7, 10, 14, 30]),
+                    amount=rng.randrange(1000, 50000, 500), percent=rng.choice([25, 35, 40, 50]),
+                    hours=rng.choice([1, 2, 4, 8, 45, 360]), months=rng.choice([3, 6, 12]),
+                    dept=rng.choice(['所属長', '事務部門', '人事担当', '院長']),
+                )
+                prefix = f"第{to_fullwidth(article_no)}条　" if clause_no == 1 else f"{to_fullwidth(clause_no)}　"
+                lines.append(prefix + text)
+    lines.append('附　則')
+    lines.append(f"この規程は、20{rng.randint(10, 25)}年{rng.randint(1, 12)}月1日から施行する。")
+    return {'title': title, 'lines': lines, 'n_articles': article_no}
+
+
+def build_shift_rows(rng: random.Random) -> List[Tuple[str, datetime.time, datetime.time, datetime.time,
+                                                       Optional[datetime.time], datetime.time]]:
+    """
+    1部署分の勤務表の行を生成
+
+    Returns:
+        [(勤務種別, 始業, 終業, 拘束時間, 休憩時間, 勤務時間)]
+    """
+    kinds = [SHIFT_KINDS[0]] + [k for k in SHIFT_KINDS[1:] if rng.random() < 0.5]
+    rows = []
+    for name, start, end, rest in kinds:
+        offset = rng.choice([-30, 0, 0, 30])
+        start_min = start[0] * 60 + start[1] + offset
+        end_min = end[0] * 60 + end[1] + offset
+        bound_min = (end_min - start_min) % (24 * 60)
+        rest_min = rest[0] * 60 + rest[1] if rest else 0
+        rows.append((
+            name,
+            datetime.time(start_min // 60 % 24, start_min % 60),
+            datetime.time(end_min // 60 % 24, end_min % 60),
+            datetime.time(bound_min // 60, bound_min % 60),
+            datetime.time(rest_min // 60, rest_min % 60) if rest else None,
+            datetime.time((bound_min - rest_min) // 60, (bound_min - rest_min) % 60),
+        ))
+    return rows
+
+
+def format_hm(value: datetime.time) -> str:
+    """時刻を 8:30 の形式にする"""
+    return f"{value.hour}:{value.minute:02d}"
+
+
+def build_shift_workbook(shift_tables: Dict[str, list]) -> bytes:
+    """勤務時間表のExcel（実際の就業規則に埋め込まれているものと同じレイアウト）"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Sheet1'
+    for dept, rows in shift_tables.items():
+        sheet.append([spaced(dept)])
+        sheet.append([None, None, '始業時間～終業時間', None, None, '拘束時間', '休憩時間', '勤務時間'])
+        for name, start, end, bound, rest, work in rows:
+            sheet.append([None, spaced(name, '     '), start, '～', end, bound, rest or '－', work])
+        sheet.append([])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def shift_tables_text(shift_tables: Dict[str, list]) -> List[str]:
+    """勤務時間表のテキスト（勤務時間.txt と同じMarkdown表形式）"""
+    lines = []
+    for dept, rows in shift_tables.items():
+        lines.append(f"【{dept}の勤務時間】")
+        lines.append('| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |')
+        lines.append('|----------|------------|----------|----------|----------|')
+        for name, start, end, bound, rest, work in rows:
+            rest_text = format_hm(rest) if rest else '－'
+            lines.append(f"| {name} | {format_hm(start)}～{format_hm(end)} | {format_hm(bound)} | "
+                         f"{rest_text} | {format_hm(work)} |")
+        lines.append('')
+    return lines
+
+
+def write_docx(path: str, lines: List[str], embedded_workbooks: List[bytes]):
+    """Word文書を書き出し、勤務時間表のExcelを word/embeddings/ に埋め込む"""
+    doc = Document()
+    doc.add_heading(lines[0], 0)
+    for line in lines[1:]:
+        doc.add_paragraph(line)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+
+    if not embedded_workbooks:
+        with open(path, 'wb') as f:
+            f.write(buffer.getvalue())
+        return
+
+    # python-docxはOLE埋め込みを作れないため、パッケージに直接Excelのパートを追加する
+    buffer.seek(0)
+    with zipfile.ZipFile(buffer) as src, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == '[Content_Types].xml' and b'Extension="xlsx"' not in data:
+                data = data.replace(
+                    b'<Default Extension="xml"',
+                    b'<Default Extension="xlsx" ContentType="application/vnd.openxmlformats-'
+                    b'officedocument.spreadsheetml.sheet"/><Default Extension="xml"', 1)
+            dst.writestr(item, data)
+        for i, workbook in enumerate(embedded_workbooks):
+            suffix = str(i) if i else ''
+            dst.writestr(f"word/embeddings/Microsoft_Excel_Worksheet{suffix}.xlsx", workbook)
+
+
+def _to_unicode_cmap() -> bytes:
+    """CID（=Unicodeのコードポイント）から文字への対応表（テキスト抽出用）"""
+    lines = ['/CIDInit /ProcSet findresource begin', '12 dict begin', 'begincmap',
+             '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+             '/CMapName /Adobe-Identity-UCS def', '/CMapType 2 def',
+             '1 begincodespacerange', '<0000> <FFFF>', 'endcodespacerange']
+    # bfrange は下位1バイトだけが変わる範囲しか書けないため上位バイトごとに分ける（1ブロック100件まで）
+    for block in range(0, 256, 100):
+        count = min(100, 256 - block)
+        lines.append(f"{count} beginbfrange")
+        lines.extend(f"<{hi:02X}00> <{hi:02X}FF> <{hi:02X}00>" for hi in range(block, block + count))
+        lines.append('endbfrange')
+    lines += ['endcmap', 'CMapName currentdict /CMap defineresource pop', 'end', 'end']
+    return '\n'.join(lines).encode('ascii')
+
+
+TO_UNICODE_CMAP = _to_unicode_cmap()
+
+
+def write_pdf(path: str, lines: List[str], chars_per_line: int = 40, lines_per_page: int = 50):
+    """
+    日本語テキストのPDFを書き出す（外部ライブラリなし）
+
+    文字コードをそのままCIDとして書き、ToUnicodeで文字に戻せるようにしている
+    テキスト抽出（PyPDF2）の負荷試験用で、ビューアでの表示は想定していない
+    """
+    wrapped = []
+    for line in lines:
+        wrapped.extend(line[i:i + chars_per_line] for i in range(0, max(len(line), 1), chars_per_line))
+    pages = [wrapped[i:i + lines_per_page] for i in range(0, len(wrapped), lines_per_page)] or [[]]
+
+    objects: List[Optional[bytes]] = [None, None]  # 1: Catalog, 2: Pages（最後に埋める）
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    def stream(data: bytes, extra: bytes = b'') -> bytes:
+        return b'<< /Length %d%s >>\nstream\n' % (len(data), extra) + data + b'\nendstream'
+
+    to_unicode = add(stream(TO_UNICODE_CMAP))
+    descriptor = add(b'<< /Type /FontDescriptor /FontName /HeiseiKakuGo-W5 /Flags 4 '
+                     b'/FontBBox [-92 -250 1010 922] /ItalicAngle 0 /Ascent 880 /Descent -120 '
+                     b'/CapHeight 700 /StemV 80 >>')
+    cid_font = add(b'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /HeiseiKakuGo-W5 '
+                   b'/CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >> '
+                   b'/FontDescriptor %d 0 R /DW 1000 >>' % descriptor)
+    font = add(b'<< /Type /Font /Subtype /Type0 /BaseFont /HeiseiKakuGo-W5 /Encoding /Identity-H '
+               b'/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>' % (cid_font, to_unicode))
+
+    page_ids = []
+    for page_lines in pages:
+        ops = ['BT', '/F1 10.5 Tf', '14 TL', '56 780 Td']
+        ops += [f"<{line.encode('utf-16-be').hex().upper()}> Tj T*" for line in page_lines]
+        ops.append('ET')
+        content = add(stream(zlib.compress('\n'.join(ops).encode('ascii')), b' /Filter /FlateDecode'))
+        page_ids.append(add(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                            b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>' % (font, content)))
+
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        ' '.join(f"{pid} 0 R" for pid in page_ids).encode('ascii'), len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % number + obj + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.writelines(b'%010d 00000 n \n' % offset for offset in offsets)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    with open(path, 'wb') as f:
+        f.write(out.getvalue())
+
+
+def write_xlsx(path: str, lines: List[str], shift_tables: Dict[str, list]):
+    """Excel形式の規定（条文を1行ずつ、勤務時間表は別シート）"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = '規定'
+    for line in lines:
+        sheet.append([line])
+    if shift_tables:
+        table_sheet = workbook.create_sheet('勤務時間')
+        table_sheet.append(['部署', '勤務種別', '始業', '終業', '拘束時間', '休憩時間', '勤務時間'])
+        for dept, rows in shift_tables.items():
+            for name, start, end, bound, rest, work in rows:
+                table_sheet.append([dept, name, format_hm(start), format_hm(end), format_hm(bound),
+                                    format_hm(rest) if rest else '－', format_hm(work)])
+    workbook.save(path)
+
+
+def generate_document(task: Tuple[int, str, int, str, List[str], str]) -> Dict:
+    """
+    コーパスの1文書を生成（ProcessPoolExecutorから呼ぶため引数は1つのタプル）
+
+    Args:
+        task: (文書番号, 出力ディレクトリ, シード, ファイル形式, 勤務時間表を載せる部署, 相対パスの接頭辞)
+
+    Returns:
+        マニフェストの1件分
+    """
+    index, output_dir, seed, file_format, shift_departments, shard = task
+    # 文書ごとに独立した乱数列にして、並列数に関係なく同じ内容を生成する
+    rng = random.Random(f"{seed}:{index}")
+    regulation = build_regulation(rng, index)
+    shift_tables = {dept: build_shift_rows(rng) for dept in shift_departments}
+
+    filename = os.path.join(shard, f"{regulation['title']}.{file_format}")
+    path = os.path.join(output_dir, filename)
+    lines = regulation['lines']
+
+    if file_format == 'docx':
+        # 実際の就業規則と同じく、部署が多ければ勤務表を2つのExcelに分けて埋め込む
+        depts = list(shift_tables)
+        halves = [depts[:(len(depts) + 1) // 2], depts[(len(depts) + 1) // 2:]] if len(depts) > 6 else [depts]
+        workbooks = [build_shift_workbook({d: shift_tables[d] for d in half}) for half in halves if half]
+        write_docx(path, lines, workbooks)
+    elif file_format == 'pdf':
+        write_pdf(path, lines + shift_tables_text(shift_tables))
+    elif file_format == 'txt':
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines + shift_tables_text(shift_tables)) + '\n')
+    elif file_format == 'xlsx':
+        write_xlsx(path, lines, shift_tables)
+    else:
+        raise ValueError(f"未対応のファイル形式: {file_format}")
+
+    return {
+        'filename': filename,
+        'format': file_format,
+        'title': regulation['title'],
+        'n_articles': regulation['n_articles'],
+        'shift_departments': shift_departments,
+        'bytes': os.path.getsize(path),
+    }
+
+
+def parse_format_mix(text: str) -> Dict[str, int]:
+    """「docx=6,pdf=2」形式のファイル形式の比率"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def generate_corpus(output_dir: str, n_docs: int, n_departments: int = 11, seed: int = 42,
+                    format_mix: Optional[Dict[str, int]] = None, shift_ratio: float = 0.05,
+                    workers: int = 1, shard_size: int = 1000) -> Dict:
+    """
+    規模試験用のコーパスを生成
+
+    Args:
+        output_dir: 出力ディレクトリ
+        n_docs: 文書数
+        n_departments: 勤務時間表を持つ部署数
+        seed: 乱数シード（同じ値なら同じ内容を生成）
+        format_mix: ファイル形式ごとの比率
+        shift_ratio: 勤務時間表を含む文書の割合（最初の文書には必ず含める）
+        workers: 並列に生成するプロセス数
+        shard_size: 1ディレクトリあたりの文書数
+
+    Returns:
+        マニフェスト（output_dir/manifest.json にも保存）
+    """
+    format_mix = format_mix or DEFAULT_FORMAT_MIX
+    departments = corpus_departments(n_departments)
+    rng = random.Random(seed)
+    formats = sorted(format_mix)
+    weights = [format_mix[f] for f in formats]
+
+    tasks = []
+    for index in range(n_docs):
+        file_format = rng.choices(formats, weights)[0]
+        has_shift_table = index == 0 or rng.random() < shift_ratio
+        shard = f"{index // shard_size:04d}"
+        tasks.append((index, output_dir, seed, file_format, departments if has_shift_table else [], shard))
+        os.makedirs(os.path.join(output_dir, shard), exist_ok=True)
+
+    start = time.perf_counter()
+    entries = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for i, entry in enumerate(pool.map(generate_document, tasks, chunksize=64), 1):
+                entries.append(entry)
+                if i % 1000 == 0:
+                    print(f"  {i} / {n_docs} 件")
+    else:
+        for i, task in enumerate(tasks, 1):
+            entries.append(generate_document(task))
+            if i % 1000 == 0:
+                print(f"  {i} / {n_docs} 件")
+    elapsed = time.perf_counter() - start
+
+    manifest = {
+        'seed': seed,
+        'n_docs': n_docs,
+        'departments': departments,
+        'format_mix': format_mix,
+        'shift_ratio': shift_ratio,
+        'generated_seconds': round(elapsed, 1),
+        'total_bytes': sum(e['bytes'] for e in entries),
+        'formats': {f: sum(1 for e in entries if e['format'] == f) for f in formats},
+        'documents': entries,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+def create_sample_documents():
+    """従来のサンプル文書3件を documents/ に作成"""
     print('サンプル文書を作成中...\n')
     create_employment_rules()
     create_travel_expenses()
     create_expense_rules()
     print('\n✓ すべてのサンプル文書を作成しました！')
     print('documentsフォルダを確認してください。')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, help='生成する文書数（省略時はサンプル3件を作成）')
+    parser.add_argument('--output', default='data/corpus', help='コーパスの出力ディレクトリ')
+    parser.add_argument('--departments', type=int, default=11, help='勤務時間表を持つ部署数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--formats', default='docx=6,pdf=2,txt=1,xlsx=1', help='ファイル形式の比率')
+    parser.add_argument('--shift-ratio', type=float, default=0.05, help='勤務時間表を含む文書の割合')
+    parser.add_argument('--workers', type=int, default=1, help='並列に生成するプロセス数')
+    parser.add_argument('--shard-size', type=int, default=1000, help='1ディレクトリあたりの文書数')
+    args = parser.parse_args()
+
+    if args.docs is None:
+        create_sample_documents()
+        return
+
+    print(f"コーパスを生成中: {args.docs} 件 → {args.output}")
+    manifest = generate_corpus(
+        args.output, args.docs, n_departments=args.departments, seed=args.seed,
+        format_mix=parse_format_mix(args.formats), shift_ratio=args.shift_ratio,
+        workers=args.workers, shard_size=args.shard_size,
+    )
+    print(f"✓ {manifest['n_docs']} 件を生成しました（{manifest['generated_seconds']} 秒, "
+          f"{manifest['total_bytes'] / 1024 ** 2:.1f} MB）")
+    print(f"  形式: {manifest['formats']}")
+    print(f"  マニフェスト: {os.path.join(args.output, 'manifest.json')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,274 @@
 """
-ドキュメント読み込みのデバッグスクリプト
+ドキュメント読み込みのデバッグ・プロファイリングスクリプト
+
+ファイルごと・抽出処理ごとに次の項目を計測し、表で表示する
+- 抽出時間（埋め込みExcelの抽出時間は内訳として別に表示）とチャンク分割時間
+- 抽出中のピークメモリ（tracemalloc）
+- 文字数・抽出速度（文字/秒）・ページ数（PDF）・行数（表・Excel・テキスト）・チャンク数
+
+使い方:
+    python debug_documents.py                          # documents/ を計測
+    python debug_documents.py --dir data/corpus --sort chars_per_sec --limit 20
+    python debug_documents.py --json profile.json      # 結果をJSONで保存
+    python debug_documents.py --profile-dir prof/      # ファイルごとのcProfile（.prof）を保存
+    python debug_documents.py --preview                # 従来どおり先頭500文字を表示
+
+.prof は snakeviz（`snakeviz prof/xxx.prof`）や flameprof（`flameprof prof/xxx.prof > xxx.svg`）で
+フレームグラフとして確認できる
 """
-from document_processor import DocumentProcessor
-
-processor = DocumentProcessor(documents_dir="documents")
-documents = processor.process_all_documents()
-
-print("=" * 80)
-print(f"読み込まれたドキュメント数: {len(documents)}")
-print("=" * 80)
-
-for i, doc in enumerate(documents, 1):
-    print(f"\n【ドキュメント {i}】")
-    print(f"ファイル名: {doc['filename']}")
-    print(f"ファイル種類: {doc['file_type']}")
-    print(f"テキスト長: {len(doc['content'])} 文字")
-    print(f"最初の500文字:")
-    print("-" * 80)
-    print(doc['content'][:500])
-    print("-" * 80)
-
-    # 空のコンテンツをチェック
-    if not doc['content'].strip():
-        print("⚠️ 警告: このファイルは空です！")
-
-print("\n" + "=" * 80)
-print("デバッグ完了")
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import re
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+
+import openpyxl
+import PyPDF2
+from docx import Document
+
+from document_processor import DocumentProcessor, chunk_text
+
+
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.doc', '.xlsx', '.xls', '.txt']
+
+# 表の列: (キー, 見出し, 幅, 書式)
+COLUMNS = [
+    ('file_type', '種類', 6, ''),
+    ('size_kb', 'KB', 8, '.1f'),
+    ('extract_ms', '抽出ms', 9, '.1f'),
+    ('embedded_ms', '埋込Excel', 9, '.1f'),
+    ('chunk_ms', '分割ms', 7, '.1f'),
+    ('peak_mb', 'ピークMB', 8, '.1f'),
+    ('chars', '文字数', 8, ''),
+    ('chars_per_sec', '文字/秒', 10, '.0f'),
+    ('pages', 'ページ', 6, ''),
+    ('rows', '行数', 6, ''),
+    ('chunks', 'チャンク', 7, ''),
+]
+SORT_KEYS = ['name'] + [key for key, _, _, _ in COLUMNS]
+
+
+def count_pages_and_rows(file_path: Path) -> Dict[str, int]:
+    """
+    ファイルの構造上の大きさ（計測の対象外の軽い読み込み）
+
+    Returns:
+        {'pages': PDFのページ数, 'rows': 表・Excel・テキストの行数, 'embedded_workbooks': 埋め込みExcelの数}
+    """
+    suffix = file_path.suffix.lower()
+    counts = {'pages': 0, 'rows': 0, 'embedded_workbooks': 0}
+    try:
+        if suffix == '.pdf':
+            with open(file_path, 'rb') as f:
+                counts['pages'] = len(PyPDF2.PdfReader(f).pages)
+        elif suffix in ['.xlsx', '.xls']:
+            workbook = openpyxl.load_workbook(file_path, read_only=True)
+            counts['rows'] = sum(sheet.max_row or 0 for sheet in workbook.worksheets)
+            workbook.close()
+        elif suffix in ['.docx', '.doc']:
+            counts['rows'] = sum(len(table.rows) for table in Document(file_path).tables)
+            with zipfile.ZipFile(file_path) as z:
+                for name in z.namelist():
+                    if name.startswith('word/embeddings/') and name.endswith('.xlsx'):
+                        counts['embedded_workbooks'] += 1
+                        workbook = openpyxl.load_workbook(io.BytesIO(z.read(name)), read_only=True)
+                        counts['rows'] += sum(sheet.max_row or 0 for sheet in workbook.worksheets)
+                        workbook.close()
+        elif suffix == '.txt':
+            with open(file_path, encoding='utf-8', errors='replace') as f:
+                counts['rows'] = sum(1 for _ in f)
+    except Exception as e:
+        print(f"構造の読み取りエラー ({file_path.name}): {e}")
+    return counts
+
+
+class ExtractionProfiler:
+    """DocumentProcessor の抽出処理をファイルごとに計測するクラス"""
+
+    def __init__(self, measure_memory: bool = True, profile_dir: str = None):
+        """
+        Args:
+            measure_memory: tracemallocでピークメモリを計測するか（計測中は抽出が遅くなるため別パスで実行）
+            profile_dir: 指定するとファイルごとのcProfileの結果（.prof）を保存する
+        """
+        self.processor = DocumentProcessor()
+        self.measure_memory = measure_memory
+        self.profile_dir = profile_dir
+        self._embedded_seconds = 0.0
+
+        # 埋め込みExcelの抽出時間を内訳として取るため、インスタンスのメソッドを計測付きに差し替える
+        extract_embedded = self.processor._extract_embedded_excel
+
+        def timed_extract_embedded(file_path):
+            start = time.perf_counter()
+            try:
+                return extract_embedded(file_path)
+            finally:
+                self._embedded_seconds += time.perf_counter() - start
+
+        self.processor._extract_embedded_excel = timed_extract_embedded
+
+    def profile_file(self, file_path: Path) -> Dict:
+        """1ファイルを計測"""
+        # 1. 抽出時間（tracemallocなし）
+        self._embedded_seconds = 0.0
+        profiler = cProfile.Profile() if self.profile_dir else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            doc = self.processor.process_document(file_path)
+            if profiler:
+                profiler.disable()
+            extract_seconds = time.perf_counter() - start
+        embedded_seconds = self._embedded_seconds
+
+        if profiler:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            safe_name = re.sub(r'[^\w.-]', '_', file_path.name)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{safe_name}.prof"))
+
+        # 2. ピークメモリ（別パス）
+        peak_bytes = 0
+        if self.measure_memory:
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.processor.process_document(file_path)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        # 3. チャンク分割
+        start = time.perf_counter()
+        chunks = chunk_text(doc['content'])
+        chunk_seconds = time.perf_counter() - start
+
+        chars = len(doc['content'])
+        return {
+            'name': str(file_path),
+            'file_type': doc['file_type'],
+            'size_kb': file_path.stat().st_size / 1024,
+            'extract_ms': extract_seconds * 1000,
+            'embedded_ms': embedded_seconds * 1000,
+            'chunk_ms': chunk_seconds * 1000,
+            'peak_mb': peak_bytes / 1024 ** 2,
+            'chars': chars,
+            'chars_per_sec': chars / extract_seconds if extract_seconds > 0 else 0.0,
+            'chunks': len(chunks),
+            'empty': not doc['content'].strip(),
+            'content': doc['content'],
+            **count_pages_and_rows(file_path),
+        }
+
+
+def summarize_by_extractor(records: List[Dict]) -> List[Dict]:
+    """抽出処理（ファイル形式、Wordの埋め込みExcelは別扱い）ごとの集計"""
+    groups: Dict[str, Dict] = {}
+
+    def add(name, seconds, chars):
+        group = groups.setdefault(name, {'extractor': name, 'files': 0, 'total_ms': 0.0, 'chars': 0})
+        group['files'] += 1
+        group['total_ms'] += seconds * 1000
+        group['chars'] += chars
+
+    for record in records:
+        body_ms = record['extract_ms'] - record['embedded_ms']
+        add(record['file_type'], body_ms / 1000, record['chars'])
+        if record['embedded_workbooks']:
+            add(f"{record['file_type']}:埋め込みExcel", record['embedded_ms'] / 1000, 0)
+
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['files']
+        group['chars_per_sec'] = group['chars'] / (group['total_ms'] / 1000) if group['total_ms'] else 0.0
+    return sorted(groups.values(), key=lambda g: g['total_ms'], reverse=True)
+
+
+def print_table(records: List[Dict], root: Path):
+    """ファイルごとの計測結果の表"""
+    header = " ".join(f"{title:>{width}}" for _, title, width, _ in COLUMNS)
+    print(f"{'ファイル':<40} {header}")
+    for record in records:
+        name = os.path.relpath(record['name'], root)
+        name = name if len(name) <= 40 else "…" + name[-39:]
+        values = " ".join(f"{record[key]:>{width}{spec}}" for key, _, width, spec in COLUMNS)
+        flag = "  ⚠️ 空" if record['empty'] else ""
+        print(f"{name:<40} {values}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default='documents', help='計測するディレクトリ（サブディレクトリも対象）')
+    parser.add_argument('--sort', default='extract_ms', choices=SORT_KEYS, help='並べ替えの列')
+    parser.add_argument('--ascending', action='store_true', help='昇順に並べる（デフォルトは降順）')
+    parser.add_argument('--limit', type=int, help='表示する件数')
+    parser.add_argument('--json', help='結果をJSONで保存するパス')
+    parser.add_argument('--profile-dir', help='ファイルごとのcProfileの結果（.prof）の保存先')
+    parser.add_argument('--no-memory', action='store_true', help='ピークメモリを計測しない（計測時間が半分になる）')
+    parser.add_argument('--preview', action='store_true', help='各ファイルの先頭500文字を表示する')
+    args = parser.parse_args()
+
+    root = Path(args.dir)
+    files = sorted(p for p in root.rglob('*') if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS)
+    if not files:
+        print(f"対象のファイルがありません: {root}")
+        return
+
+    profiler = ExtractionProfiler(measure_memory=not args.no_memory, profile_dir=args.profile_dir)
+    print(f"{len(files)} ファイルを計測中...")
+    records = []
+    for i, file_path in enumerate(files, 1):
+        records.append(profiler.profile_file(file_path))
+        if i % 100 == 0:
+            print(f"  {i} / {len(files)}")
+
+    records.sort(key=lambda r: r[args.sort], reverse=not args.ascending)
+    shown = records[:args.limit] if args.limit else records
+
+    print("=" * 80)
+    print_table(shown, root)
+
+    print("\n=== 抽出処理ごとの集計 ===")
+    print(f"{'抽出処理':<20} {'ファイル':>8} {'合計ms':>10} {'平均ms':>9} {'文字/秒':>10}")
+    summary = summarize_by_extractor(records)
+    for group in summary:
+        print(f"{group['extractor']:<20} {group['files']:>8} {group['total_ms']:>10.1f} "
+              f"{group['mean_ms']:>9.1f} {group['chars_per_sec']:>10.0f}")
+
+    total_ms = sum(r['extract_ms'] for r in records)
+    total_chars = sum(r['chars'] for r in records)
+    print(f"\n合計: {len(records)} ファイル, {total_chars} 文字, {sum(r['chunks'] for r in records)} チャンク, "
+          f"抽出 {total_ms / 1000:.2f} 秒（{total_chars / (total_ms / 1000) if total_ms else 0:.0f} 文字/秒）")
+
+    empty = [r['name'] for r in records if r['empty']]
+    if empty:
+        print(f"⚠️ テキストが抽出できなかったファイル: {len(empty)} 件")
+        for name in empty[:10]:
+            print(f"  - {name}")
+
+    if args.preview:
+        for record in shown:
+            print(f"\n【{record['name']}】")
+            print("-" * 80)
+            print(record['content'][:500])
+            print("-" * 80)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'directory': str(root),
+                'files': [{k: v for k, v in r.items() if k != 'content'} for r in records],
+                'extractors': summary,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.json}")
+    if args.profile_dir:
+        print(f"cProfileの結果を保存しました: {args.profile_dir}/*.prof")
+
+
+if __name__ == '__main__':
+    main()
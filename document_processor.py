@@ -6,12 +6,229 @@ import os
 import io
 import re
 import zipfile
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
 import PyPDF2
 from docx import Document
+from docx.oxml.ns import qn
 import openpyxl
 
+from article_index import parse_articles
+
+
+# 部署名の正規化先（アプリの部署選択と同じ名称）
+KNOWN_DEPARTMENTS = [
+    '診療部', '看護部門', '放射線科', 'リハビリテーション科', '栄養科', '検査科',
+    '薬局', '地域連携室', '事務部門', '訪問看護ステーション', 'パートタイマー'
+]
+
+# 勤務時間表のセクション見出し（_extract_excel_from_bytes が出力する形式）
+TIME_TABLE_HEADER_PATTERN = re.compile(r'【([^】]*)の勤務時間】')
+
+# 勤務時間表1つ分（見出しから次の【または文末まで）
+TIME_TABLE_CHUNK_PATTERN = re.compile(r'【[^】]*の勤務時間】[^【]*')
+
+# 勤務時間表の行の区切り記号（始業と終業の間のセル）
+TIME_RANGE_SEPARATORS = {'～', '~', '〜'}
+
+
+def normalize_department(name: str) -> str:
+    """
+    部署名の表記ゆれを吸収
+
+    「薬　局」→「薬局」、「訪問看護ステーション北裏」→「訪問看護ステーション」
+    """
+    compact = re.sub(r'\s+', '', name)
+    for dept in KNOWN_DEPARTMENTS:
+        if compact.startswith(dept):
+            return dept
+    return compact
+
+
+def detect_chunk_department(chunk: str, filename: str = "") -> str:
+    """
+    チャンクが属する部署を判定
+
+    Args:
+        chunk: チャンクのテキスト
+        filename: 元ファイル名（部署専用の規則ファイルの判定に使用）
+
+    Returns:
+        部署名。全部署共通のチャンクは空文字
+    """
+    # 勤務時間表チャンクは見出しの部署に属する
+    match = TIME_TABLE_HEADER_PATTERN.match(chunk)
+    if match:
+        return normalize_department(match.group(1))
+
+    # 「パートタイマー就業規則」のように部署専用のファイル
+    for dept in KNOWN_DEPARTMENTS:
+        if dept in filename:
+            return dept
+    return ""
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> List[str]:
+    """
+    長いテキストをチャンクに分割
+    勤務時間表などの表データは1つのチャンクとして保持
+
+    Args:
+        text: 分割するテキスト
+        chunk_size: 各チャンクの文字数
+        overlap: チャンク間のオーバーラップ文字数
+
+    Returns:
+        テキストチャンクのリスト
+    """
+    chunks = []
+
+    # 勤務時間表を先に抽出（【〇〇の勤務時間】から次の【または文末まで）
+    time_tables = TIME_TABLE_CHUNK_PATTERN.findall(text)
+
+    # 勤務時間表を独立したチャンクとして追加
+    for table in time_tables:
+        if table.strip():
+            chunks.append(table.strip())
+
+    # 勤務時間表を除いたテキストを通常のチャンク分割
+    text_without_tables = TIME_TABLE_CHUNK_PATTERN.sub('', text)
+
+    start = 0
+    while start < len(text_without_tables):
+        end = start + chunk_size
+        chunk = text_without_tables[start:end]
+
+        # 空白で区切るために、最後の改行または句点を探す
+        if end < len(text_without_tables):
+            last_break = max(
+                chunk.rfind('\n'),
+                chunk.rfind('。'),
+                chunk.rfind('. ')
+            )
+            if last_break > chunk_size * 0.5:
+                chunk = chunk[:last_break + 1]
+                end = start + last_break + 1
+
+        if chunk.strip():
+            chunks.append(chunk.strip())
+
+        start = end - overlap
+
+    return chunks
+
+
+def parse_shift_row(cells: List[str], department: str, source: str) -> Optional[Dict[str, str]]:
+    """
+    勤務時間表（埋め込みExcel）の1行を構造化
+
+    行の形式: （空セル） | 勤務種別 | 始業 | ～ | 終業 | 拘束時間 | 休憩時間 | 勤務時間（時刻は整形済みとする）
+
+    Returns:
+        {'department', 'shift_kind', 'start_time', 'end_time', 'binding_time', 'break_time',
+         'working_time', 'source'}。勤務データの行でなければNone
+    """
+    values = [c.strip() for c in cells if c.strip() and c.strip() not in TIME_RANGE_SEPARATORS]
+    if len(values) < 6 or ':' not in values[1]:
+        return None
+    shift_kind = re.sub(r'\s+', '', values.pop(0))
+    return {
+        'department': department,
+        'shift_kind': shift_kind,
+        'start_time': values[0],
+        'end_time': values[1],
+        'binding_time': values[2],
+        'break_time': values[3],
+        'working_time': values[4],
+        'source': source,
+    }
+
+
+class WordNumbering:
+    """
+    Wordの自動番号のうち「第N条」「第N章」を復元
+
+    python-docx の paragraph.text には自動番号が含まれないため、条の見出しを自動番号で付けた規程は
+    本文に「第36条」が現れない。numbering.xml の定義（abstractNum の各レベルの開始番号・書式）から
+    Wordの表示と同じ番号を数え直す。番号は abstractNum・レベルごとに数え、上のレベルが進んだら下のレベルを戻す
+
+    条・章のレベルとその下のレベル（同じリストの「1.」などの項番号）だけを対象にし、
+    号や箇条書きの番号は従来どおり出力しない
+    """
+
+    STRUCTURAL_MARKERS = ('条', '章')
+
+    def __init__(self, doc):
+        self._levels: Dict[str, Dict[int, tuple]] = {}  # abstractNumId → {ilvl: (開始番号, lvlText)}
+        self._nums: Dict[str, str] = {}  # numId → abstractNumId
+        self._style_numbering: Dict[str, tuple] = {}  # styleId → (numId, ilvl)
+        self._counters: Dict[str, Dict[int, int]] = {}
+        try:
+            numbering = doc.part.numbering_part.element
+        except (KeyError, NotImplementedError):
+            # 自動番号を使っていない文書
+            return
+
+        for abstract in numbering.findall(qn('w:abstractNum')):
+            levels = {}
+            for lvl in abstract.findall(qn('w:lvl')):
+                start = lvl.find(qn('w:start'))
+                lvl_text = lvl.find(qn('w:lvlText'))
+                levels[int(lvl.get(qn('w:ilvl')))] = (
+                    int(start.get(qn('w:val'))) if start is not None else 1,
+                    lvl_text.get(qn('w:val')) if lvl_text is not None else '',
+                )
+            if any(marker in text for _, text in levels.values() for marker in self.STRUCTURAL_MARKERS):
+                self._levels[abstract.get(qn('w:abstractNumId'))] = levels
+
+        for num in numbering.findall(qn('w:num')):
+            abstract_id = num.find(qn('w:abstractNumId'))
+            if abstract_id is not None:
+                self._nums[num.get(qn('w:numId'))] = abstract_id.get(qn('w:val'))
+
+        # 見出しスタイルに付いた自動番号
+        for style in doc.styles.element.findall(qn('w:style')):
+            num_pr = style.find(f"{qn('w:pPr')}/{qn('w:numPr')}")
+            if num_pr is not None:
+                self._style_numbering[style.get(qn('w:styleId'))] = self._read_num_pr(num_pr)
+
+    @staticmethod
+    def _read_num_pr(num_pr) -> tuple:
+        num_id = num_pr.find(qn('w:numId'))
+        ilvl = num_pr.find(qn('w:ilvl'))
+        return (num_id.get(qn('w:val')) if num_id is not None else None,
+                int(ilvl.get(qn('w:val'))) if ilvl is not None else None)
+
+    def label(self, paragraph) -> str:
+        """段落の番号（「第36条」「2.」など）。対象外の段落は空文字"""
+        p_pr = paragraph._element.pPr
+        if p_pr is None:
+            return ""
+        num_id, ilvl = self._read_num_pr(p_pr.numPr) if p_pr.numPr is not None else (None, None)
+        if num_id is None and p_pr.pStyle is not None:
+            num_id, style_ilvl = self._style_numbering.get(p_pr.pStyle.val, (None, None))
+            ilvl = ilvl if ilvl is not None else style_ilvl
+        levels = self._levels.get(self._nums.get(num_id))
+        if levels is None:
+            return ""
+
+        ilvl = ilvl or 0
+        counters = self._counters.setdefault(self._nums[num_id], {})
+        start, lvl_text = levels.get(ilvl, (1, ''))
+        counters[ilvl] = counters[ilvl] + 1 if ilvl in counters else start
+        for deeper in [level for level in counters if level > ilvl]:
+            del counters[deeper]
+
+        if not any(marker in text for level, (_, text) in levels.items() if level <= ilvl
+                   for marker in self.STRUCTURAL_MARKERS):
+            return ""
+
+        def replace_level(match):
+            level = int(match.group(1)) - 1
+            return str(counters.get(level, levels.get(level, (1, ''))[0]))
+
+        return re.sub(r'%(\d)', replace_level, lvl_text).strip()
+
 
 class DocumentProcessor:
     """各種ドキュメント形式からテキストを抽出するクラス"""
@@ -35,6 +252,10 @@ class DocumentProcessor:
             documents_dir: ドキュメントが格納されているディレクトリ
         """
         self.documents_dir = Path(documents_dir)
+        # 処理中のドキュメントから抽出した勤務時間表の行（process_document ごとにリセット）
+        self.shift_rows: List[Dict[str, str]] = []
+        # 処理中のドキュメントの条文（article_index.parse_articles の形式）
+        self.articles: List[Dict] = []
 
     def extract_text_from_pdf(self, file_path: Path) -> str:
         """PDFファイルからテキストを抽出"""
@@ -49,10 +270,11 @@ class DocumentProcessor:
         return text
 
     def extract_text_from_word(self, file_path: Path) -> str:
-        """Wordファイルからテキストを抽出（表の構造を保持、埋め込みExcel対応）"""
+        """Wordファイルからテキストを抽出（表の構造を保持、埋め込みExcel対応、条・章の自動番号を復元）"""
         text = ""
         try:
             doc = Document(file_path)
+            numbering = WordNumbering(doc)
 
             # 段落と表を文書内の順序通りに処理
             for element in doc.element.body:
@@ -60,8 +282,10 @@ class DocumentProcessor:
                     # 段落の処理
                     for paragraph in doc.paragraphs:
                         if paragraph._element == element:
+                            # 自動番号は空の段落でも数える（Wordの表示と番号を合わせる）
+                            label = numbering.label(paragraph)
                             if paragraph.text.strip():
-                                text += paragraph.text + "\n"
+                                text += (f"{label}　{paragraph.text.strip()}" if label else paragraph.text) + "\n"
                             break
                 elif element.tag.endswith('tbl'):
                     # 表の処理
@@ -70,6 +294,9 @@ class DocumentProcessor:
                             text += self._extract_table(table)
                             break
 
+            # 条文は本文だけから抽出（埋め込みExcelの勤務時間表は含めない）
+            self.articles = parse_articles(text)
+
             # 埋め込みExcelファイルを抽出
             embedded_text = self._extract_embedded_excel(file_path)
             if embedded_text:
@@ -144,6 +371,10 @@ class DocumentProcessor:
                     elif current_dept and ('勤' in row_text or '番' in row_text or '曜' in row_text or ':' in row_text):
                         # 勤務データ行
                         dept_data.append(row_text)
+                        shift_row = parse_shift_row([self._format_time(c) for c in cells],
+                                                    normalize_department(current_dept), source_name)
+                        if shift_row:
+                            self.shift_rows.append(shift_row)
 
                 # 最後の部門データを保存
                 if current_dept and dept_data:
@@ -222,9 +453,13 @@ class DocumentProcessor:
         ファイル形式に応じてテキストを抽出
 
         Returns:
-            {'filename': str, 'content': str, 'file_type': str}
+            {'filename': str, 'content': str, 'file_type': str, 'file_path': str,
+             'shift_rows': 埋め込みExcelの勤務時間表の行（parse_shift_row の形式）,
+             'articles': 条文（article_index.parse_articles の形式）}
         """
         suffix = file_path.suffix.lower()
+        self.shift_rows = []
+        self.articles = []
 
         if suffix == '.pdf':
             content = self.extract_text_from_pdf(file_path)
@@ -246,7 +481,10 @@ class DocumentProcessor:
             'filename': file_path.name,
             'content': content,
             'file_type': file_type,
-            'file_path': str(file_path)
+            'file_path': str(file_path),
+            'shift_rows': [dict(row, source=f"{file_path.name}:{row['source']}") for row in self.shift_rows],
+            # Word以外（PDF・テキスト）は抽出したテキスト全体から条文を探す
+            'articles': self.articles if file_type == 'Word' else parse_articles(content)
         }
 
     def process_all_documents(self) -> List[Dict[str, str]]:
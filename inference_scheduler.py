@@ -0,0 +1,144 @@
+"""
+推論マイクロバッチングモジュール
+複数セッション（スレッド）から届くクエリの埋め込み・リランキングの推論ジョブを数ミリ秒だけ集約し、
+1回のバッチ推論にまとめて実行してから各呼び出し元に自分の分の結果を返す
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Sequence
+
+
+class MicroBatcher:
+    """推論ジョブを集約して1バッチで実行するスケジューラ"""
+
+    def __init__(self, batch_fn: Callable[[list], Sequence], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, name: str = "micro-batcher"):
+        """
+        Args:
+            batch_fn: 入力のリストを受け取り、同じ長さの出力（リストやndarray）を返す推論関数
+            max_batch_size: 1バッチにまとめる入力数の上限
+            max_wait_ms: 最初のジョブが届いてから後続のジョブを待つ最大時間（ミリ秒）
+            name: ワーカースレッド名
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._carry = None  # 前のバッチに入りきらなかったジョブ（ワーカースレッドだけが使う）
+        self._stats_lock = threading.Lock()
+        self._stats = {'batches': 0, 'jobs': 0, 'items': 0}
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, items: list) -> Future:
+        """
+        推論ジョブを登録
+
+        Args:
+            items: 推論する入力のリスト
+
+        Returns:
+            入力と同じ順序の出力（batch_fnの出力のスライス）を返すFuture
+        """
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._queue.put((list(items), future))
+        return future
+
+    def run(self, items: list) -> Sequence:
+        """推論ジョブを登録して結果を待つ"""
+        return self.submit(items).result()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """実行したバッチ数・ジョブ数・入力数と平均バッチサイズ"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_batch_size'] = stats['items'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _collect(self) -> List[tuple]:
+        """
+        最初のジョブを待ち、上限件数か待ち時間に達するまで後続のジョブを集める
+        加えると上限件数を超えるジョブは次のバッチの最初のジョブにする（1つで上限を超えるジョブはそのまま1バッチ）
+        """
+        if self._carry is not None:
+            jobs, self._carry = [self._carry], None
+        else:
+            jobs = [self._queue.get()]
+        n_items = len(jobs[0][0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while n_items < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if n_items + len(job[0]) > self.max_batch_size:
+                self._carry = job
+                break
+            jobs.append(job)
+            n_items += len(job[0])
+        return jobs
+
+    def _run(self):
+        """ワーカースレッド本体"""
+        while True:
+            jobs = self._collect()
+            batch = [item for items, _ in jobs for item in items]
+            try:
+                outputs = self.batch_fn(batch)
+            except Exception as e:
+                for _, future in jobs:
+                    future.set_exception(e)
+                continue
+
+            # 各呼び出し元に自分の入力分の出力だけを返す
+            offset = 0
+            for items, future in jobs:
+                future.set_result(outputs[offset:offset + len(items)])
+                offset += len(items)
+
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['jobs'] += len(jobs)
+                self._stats['items'] += len(batch)
+
+
+class InferenceScheduler:
+    """埋め込みモデルとリランキングモデルのマイクロバッチングをまとめたクラス"""
+
+    def __init__(self, encode_fn: Callable[[List[str], int], Sequence],
+                 rerank_fn: Callable[[List[tuple], int], Sequence],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        """
+        Args:
+            encode_fn: (テキストのリスト, バッチサイズ) を受け取りクエリの埋め込みを返す関数
+            rerank_fn: ((クエリ, チャンク) ペアのリスト, バッチサイズ) を受け取りスコアを返す関数
+                （VectorStore のモデルは遅延読み込みのため、モデル本体ではなく推論関数を受け取る）
+            max_batch_size: 1バッチにまとめる入力数の上限
+            max_wait_ms: ジョブを集約する最大待ち時間（ミリ秒）
+        """
+        self.encoder = MicroBatcher(
+            lambda texts: encode_fn(texts, max_batch_size),
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name="encode-batcher"
+        )
+        self.reranker = MicroBatcher(
+            lambda pairs: rerank_fn(pairs, max_batch_size),
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name="rerank-batcher"
+        )
+
+    def encode(self, texts: List[str]):
+        """テキストの埋め込み（他セッションのジョブとまとめて推論）"""
+        return self.encoder.run(texts)
+
+    def rerank(self, pairs: List[tuple]):
+        """(クエリ, チャンク) ペアのスコア計算（他セッションのジョブとまとめて推論）"""
+        return self.reranker.run(pairs)
@@ -0,0 +1,81 @@
+"""
+質問の意図の振り分け
+resources/intents.json に宣言したルール（語の組み合わせ → 処理）を1つの Aho–Corasick オートマトンに
+まとめ、質問を1回走査するだけで当てはまる意図をすべて求める
+
+ルールの形式:
+    {"name": 意図の名前, "handler": 処理の種類, "triggers": [条件, ...], ...（処理ごとの設定）}
+    条件は語（その語を含む）か語のリスト（すべての語を含む）、または {"terms": 語のリスト, "unless": 語のリスト}
+    （terms をすべて含み、unless をどれも含まない。「何時」で「何時間」を除く場合など）。条件のいずれかを満たせば当てはまる
+    複数の意図が当てはまる場合は、ファイルに書いた順を優先順とする
+
+振り分けの時間は質問の長さと見つかった語の数で決まり、意図を増やしても変わらない
+"""
+import json
+from typing import Dict, List, Optional
+
+from aho_corasick import AhoCorasick
+
+
+class IntentRouter:
+    """宣言したルールから質問の意図を求める"""
+
+    def __init__(self, intents: List[Dict]):
+        """
+        Args:
+            intents: ルールのリスト（優先順）
+        """
+        self.intents = intents
+        terms: Dict[str, int] = {}
+        # 条件ごとの (意図の添字, 必要な語の数, 除外する語のID) と、語ごとにその語を含む条件
+        self._clauses: List[tuple] = []
+        self._term_clauses: List[List[int]] = []
+
+        def term_id_of(term: str) -> int:
+            term_id = terms.setdefault(term, len(terms))
+            if term_id == len(self._term_clauses):
+                self._term_clauses.append([])
+            return term_id
+
+        for intent_index, intent in enumerate(intents):
+            for name in ('name', 'handler', 'triggers'):
+                if name not in intent:
+                    raise ValueError(f"意図の定義に {name} がありません: {intent}")
+            for trigger in intent['triggers']:
+                if isinstance(trigger, str):
+                    clause_terms, unless = {trigger}, set()
+                elif isinstance(trigger, dict):
+                    clause_terms, unless = set(trigger['terms']), set(trigger.get('unless', []))
+                else:
+                    clause_terms, unless = set(trigger), set()
+                clause_id = len(self._clauses)
+                self._clauses.append((intent_index, len(clause_terms),
+                                      frozenset(term_id_of(term) for term in unless)))
+                for term in clause_terms:
+                    self._term_clauses[term_id_of(term)].append(clause_id)
+
+        self._automaton = AhoCorasick(list(terms))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'IntentRouter':
+        """JSONのルールファイルから作成"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['intents'])
+
+    def route(self, text: str) -> List[Dict]:
+        """当てはまる意図（優先順）"""
+        found = self._automaton.search(text)
+        hits: Dict[int, int] = {}
+        for term_id in found:
+            for clause_id in self._term_clauses[term_id]:
+                hits[clause_id] = hits.get(clause_id, 0) + 1
+        matched = {self._clauses[clause_id][0] for clause_id, count in hits.items()
+                   if count == self._clauses[clause_id][1] and not (self._clauses[clause_id][2] & found)}
+        return [self.intents[index] for index in sorted(matched)]
+
+    def first(self, text: str, handler: str) -> Optional[Dict]:
+        """指定した処理の意図のうち最も優先するもの（なければNone）"""
+        for intent in self.route(text):
+            if intent['handler'] == handler:
+                return intent
+        return None
@@ -0,0 +1,275 @@
+"""
+LLM呼び出しモジュール
+Groq（メイン）とGemini（フォールバック）のAPI呼び出し・リトライ・プロンプト作成
+接続先は GROQ_BASE_URL / GEMINI_BASE_URL で差し替えられる（ローカルの疑似LLMサーバーでの負荷試験用）
+"""
+import os
+import time
+from typing import Optional, Tuple
+
+import google.generativeai as genai
+from groq import Groq
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from google.api_core.exceptions import ResourceExhausted
+
+import metrics
+from context_packer import PackedContext, context_token_budget, get_token_counter, pack_context
+from tracing import tracer, traced_sleep
+
+
+GROQ_MODELS = [
+    'llama-3.3-70b-versatile',
+    'llama-3.1-8b-instant',  # フォールバック
+]
+
+GEMINI_MODELS = [
+    'gemini-2.0-flash',
+    'gemini-1.5-flash',
+    'gemini-1.5-pro',
+]
+
+# 回答の最大トークン数（回答は表を含めても1,000トークン程度。Groqは max_tokens をレート制限の枠として先に確保する）
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "2048"))
+
+
+def _gemini_transport_options() -> dict:
+    """GEMINI_BASE_URL が指定されていればRESTでその接続先を使う"""
+    base_url = os.getenv("GEMINI_BASE_URL")
+    if not base_url:
+        return {}
+    return {'transport': 'rest', 'client_options': {'api_endpoint': base_url}}
+
+
+def call_groq_api(prompt: str, api_key: str, model_name: str = 'llama-3.3-70b-versatile'):
+    """
+    Groq APIを呼び出す
+
+    Args:
+        prompt: プロンプト
+        api_key: APIキー
+        model_name: 使用するモデル名
+
+    Returns:
+        回答テキスト
+    """
+    client = Groq(api_key=api_key, base_url=os.getenv("GROQ_BASE_URL") or None)
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=LLM_MAX_TOKENS,
+        )
+    except Exception as e:
+        metrics.record_llm_request('groq', model_name, time.perf_counter() - start, error=e)
+        raise
+    metrics.record_llm_request('groq', model_name, time.perf_counter() - start)
+    return response.choices[0].message.content
+
+
+def backoff_sleep(seconds: float):
+    """リトライのバックオフ待ち（待ち時間をメトリクスとトレースに記録）"""
+    metrics.LLM_RETRY_SLEEP.observe(seconds)
+    traced_sleep(seconds)
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=2, min=4, max=30),
+    sleep=backoff_sleep,
+    reraise=True
+)
+def call_groq_with_retry(prompt: str, api_key: str, model_name: str = 'llama-3.3-70b-versatile'):
+    """
+    リトライ機能付きでGroq APIを呼び出す
+    エクスポネンシャルバックオフ: 4秒 → 8秒 → 16秒
+    """
+    return call_groq_api(prompt, api_key, model_name)
+
+
+def call_gemini_api(prompt: str, api_key: str, model_name: str = 'gemini-2.0-flash'):
+    """
+    Gemini APIを呼び出す
+
+    Args:
+        prompt: プロンプト
+        api_key: APIキー
+        model_name: 使用するモデル名
+
+    Returns:
+        APIレスポンス
+    """
+    genai.configure(api_key=api_key, **_gemini_transport_options())
+    model = genai.GenerativeModel(model_name)
+    start = time.perf_counter()
+    try:
+        response = model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.1,
+                max_output_tokens=LLM_MAX_TOKENS,
+            )
+        )
+    except Exception as e:
+        metrics.record_llm_request('gemini', model_name, time.perf_counter() - start, error=e)
+        raise
+    metrics.record_llm_request('gemini', model_name, time.perf_counter() - start)
+    return response
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=2, min=4, max=30),
+    retry=retry_if_exception_type((ResourceExhausted, Exception)),
+    sleep=backoff_sleep,
+    reraise=True
+)
+def call_gemini_with_retry(prompt: str, api_key: str, model_name: str = 'gemini-2.0-flash'):
+    """
+    リトライ機能付きでGemini APIを呼び出す
+    エクスポネンシャルバックオフ: 4秒 → 8秒 → 16秒
+    """
+    return call_gemini_api(prompt, api_key, model_name)
+
+
+def pack_answer_context(context_chunks: list) -> PackedContext:
+    """
+    参照情報をトークン予算（CONTEXT_TOKEN_BUDGET）に収める
+
+    Args:
+        context_chunks: 関連する文書チャンク（優先する順）
+
+    Returns:
+        PackedContext（chunks を build_answer_prompt に渡す）
+    """
+    with tracer.span('llm.pack_context'):
+        packed = pack_context(context_chunks, context_token_budget(), get_token_counter())
+    metrics.CONTEXT_TOKENS.observe(packed.tokens)
+    metrics.CONTEXT_TOKENS_SAVED.inc(packed.original_tokens - packed.tokens)
+    return packed
+
+
+def build_answer_prompt(query: str, context_chunks: list, department: str = "") -> str:
+    """
+    回答生成用のプロンプトを作成
+
+    Args:
+        query: ユーザーの質問
+        context_chunks: 関連する文書チャンク
+        department: ユーザーの所属部署
+
+    Returns:
+        プロンプト
+    """
+    # コンテキストを結合
+    context = "\n\n---\n\n".join([
+        f"【{chunk['metadata']['filename']}】\n{chunk['content']}"
+        for chunk in context_chunks
+    ])
+
+    return f"""あなたは社内規定に詳しいアシスタントです。以下の参照情報を基に、質問に回答してください。
+
+【ユーザーの所属部署】{department}
+
+【参照情報】
+{context}
+
+【質問】
+{query}
+
+【回答ルール】
+1. 質問されたことだけに回答すること
+2. 参照情報にある表やデータは、そのままの形式で出力すること（まとめたり要約しない）
+3. 「【{department}の勤務時間】」というセクションがあれば、その表をそのまま出力すること
+
+【勤務時間について聞かれた場合 - 必ずMarkdown表形式で出力】
+参照情報に「【{department}の勤務時間】」があれば、以下の形式で出力：
+
+【{department}の勤務時間】
+
+| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |
+|----------|------------|----------|----------|----------|
+| （参照情報の各行をここに記載） |
+
+★重要：必ず上記のMarkdown表形式（|で区切り、各行を改行）で出力すること
+★参照情報にある勤務種別（日勤、早番、遅番、夜勤、土曜など）を全て含めること
+★1行にまとめず、必ず改行して表形式にすること
+
+【有給休暇について聞かれた場合】
+以下の表のみを出力すること：
+
+| 勤続年数 | 6か月 | 1年6か月 | 2年6か月 | 3年6か月 | 4年6か月 | 5年6か月 | 6年6か月以上 |
+|----------|-------|---------|---------|---------|---------|---------|-------------|
+| 付与日数 | 10日 | 11日 | 12日 | 14日 | 16日 | 18日 | 20日 |
+
+【特別休暇について聞かれた場合】
+慶弔休暇と新特別休暇（夏季休暇廃止後の制度）について回答すること。
+
+【回答】"""
+
+
+def generate_with_fallback(prompt: str, groq_api_key: str,
+                           gemini_api_key: str) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[Exception]]:
+    """
+    Groqのモデルを順に試し、失敗したらGeminiのモデルを順に試して回答を生成
+
+    Args:
+        prompt: プロンプト
+        groq_api_key: Groq APIキー（空ならGroqを使わない）
+        gemini_api_key: Gemini APIキー
+
+    Returns:
+        (回答, 使用したプロバイダー, 使用したモデル, 最後のエラー)。全て失敗した場合は回答がNone
+    """
+    last_error = None
+
+    # 1. まずGroqを試す（メイン）
+    if groq_api_key:
+        for model_name in GROQ_MODELS:
+            try:
+                with tracer.span('llm.groq'):
+                    result = call_groq_with_retry(prompt, groq_api_key, model_name)
+                return result, 'groq', model_name, None
+
+            except Exception as e:
+                last_error = e
+                error_str = str(e).lower()
+                # レート制限エラーの場合、次のモデルを試す
+                if '429' in error_str or 'rate' in error_str or 'limit' in error_str:
+                    continue
+                # その他のエラーは次のプロバイダーへ
+                break
+
+    # 2. Groqが失敗したらGeminiを試す（フォールバック）
+    for model_name in GEMINI_MODELS:
+        try:
+            with tracer.span('llm.gemini'):
+                response = call_gemini_with_retry(prompt, gemini_api_key, model_name)
+
+            # レスポンスの完全性チェック
+            if response.candidates and len(response.candidates) > 0:
+                candidate = response.candidates[0]
+                if candidate.finish_reason.name == "SAFETY":
+                    result = "安全性フィルターにより回答がブロックされました。別の質問をお試しください。"
+                elif candidate.content and candidate.content.parts:
+                    result = candidate.content.parts[0].text
+                else:
+                    result = response.text
+            else:
+                result = response.text
+
+            return result, 'gemini', model_name, None
+
+        except Exception as e:
+            last_error = e
+            error_str = str(e).lower()
+            # 429エラーまたはリソース枯渇の場合、次のモデルを試す
+            if '429' in error_str or 'resource' in error_str or 'exhausted' in error_str or 'quota' in error_str:
+                continue
+            # その他のエラーは即座に返す
+            break
+
+    return None, None, None, last_error
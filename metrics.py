@@ -0,0 +1,347 @@
+"""
+メトリクス収集モジュール
+プロセス内でカウンター・ゲージ・ヒストグラムを記録し、Prometheusのテキスト形式で公開する
+公開用のHTTPサーバーはバックグラウンドスレッドでローカルポートに立てる
+
+動作確認（ローカルでスクレイプ）:
+    python metrics.py
+"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    """ラベル値のエスケープ（テキスト形式の仕様に従う）"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """{name="value",...} 形式のラベル文字列"""
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """数値のテキスト表現"""
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """メトリクスの基底クラス"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ラベルは {self.labelnames} を指定してください（指定: {tuple(labels)}）")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.metric_type}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        """カウンターを増やす"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        """現在値を返す"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """増減する値（関数を登録するとスクレイプ時に評価）"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = float(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """スクレイプのたびに値を計算する関数を登録"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        value = self._value
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """累積バケットのヒストグラム"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # ラベルごとに [各バケットの件数..., 合計値, 件数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        """値を記録"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    """メトリクスの登録先"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """全メトリクスをテキスト形式で出力"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "".join(metric.render() for metric in metrics)
+
+
+def resident_memory_bytes() -> float:
+    """常駐メモリ量（Linuxでは/procの現在値、macOSなどは最大値、Windowsでは取得せず0）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0
+        # macOSではバイト、Linuxではキロバイト単位
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+REGISTRY = Registry()
+
+QUERIES = REGISTRY.register(Counter(
+    "chatbot_queries_total", "Questions answered"))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_llm_requests_total", "LLM calls by provider, model and status", ["provider", "model", "status"]))
+LLM_RETRY_SLEEP = REGISTRY.register(Histogram(
+    "chatbot_llm_retry_sleep_seconds", "Backoff sleeps between LLM retries",
+    buckets=(1, 2, 4, 8, 16, 30, 60)))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_llm_latency_seconds", "Latency of each LLM API attempt", ["provider"]))
+RETRIEVAL_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_retrieval_latency_seconds", "VectorStore.search latency"))
+RERANK_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_rerank_latency_seconds", "Cross-encoder rerank latency"))
+RETRIEVED_CHUNKS = REGISTRY.register(Histogram(
+    "chatbot_retrieved_chunks", "Chunks returned per search", buckets=(0, 1, 3, 5, 10, 15, 20, 30)))
+MERGED_CHUNKS = REGISTRY.register(Counter(
+    "chatbot_merged_chunks_total", "Retrieved chunks folded into an adjacent chunk of the same file before reranking"))
+RERANK_PAIRS = REGISTRY.register(Counter(
+    "chatbot_rerank_pairs_total", "Query-chunk pairs scored by the cross-encoder"))
+CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "chatbot_context_tokens", "Tokens of retrieved context packed into each answer prompt",
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000)))
+CONTEXT_TOKENS_SAVED = REGISTRY.register(Counter(
+    "chatbot_context_tokens_saved_total", "Context tokens trimmed or dropped to fit the token budget"))
+COMPRESSED_CHARS = REGISTRY.register(Counter(
+    "chatbot_compressed_chars_total", "Characters removed from retrieved chunks by extractive context compression"))
+INDEX_CHUNKS = REGISTRY.register(Gauge(
+    "chatbot_index_chunks", "Chunks stored in the vector collection"))
+RESIDENT_MEMORY = REGISTRY.register(Gauge(
+    "chatbot_process_resident_memory_bytes", "Resident memory of the app process"))
+RESIDENT_MEMORY.set_function(resident_memory_bytes)
+
+
+def record_cache(cache: str, hit: bool):
+    """キャッシュのヒット/ミスを記録"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+_rate_limit_error_types: Optional[Tuple[type, ...]] = None
+
+
+def _get_rate_limit_error_types() -> Tuple[type, ...]:
+    """Groq/Geminiのレート制限の例外クラス（SDKのないものは除く。最初に使う時点でimportする）"""
+    global _rate_limit_error_types
+    if _rate_limit_error_types is None:
+        types = []
+        try:
+            from groq import RateLimitError
+            types.append(RateLimitError)
+        except ImportError:
+            pass
+        try:
+            from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+            types += [ResourceExhausted, TooManyRequests]
+        except ImportError:
+            pass
+        _rate_limit_error_types = tuple(types)
+    return _rate_limit_error_types
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    429・クォータ超過系のエラーか（例外の型・HTTPステータスで判定し、どちらもなければメッセージの '429'）
+    メッセージの 'rate' などでは判定しない（Geminiのエラーは generateContent を含むため、ほぼすべてが該当する）
+    """
+    if isinstance(error, _get_rate_limit_error_types()):
+        return True
+    # groq.APIStatusError は status_code、google.api_core の例外は code にHTTPステータスを持つ
+    if getattr(error, 'status_code', None) == 429 or getattr(error, 'code', None) == 429:
+        return True
+    return '429' in str(error)
+
+
+def record_llm_request(provider: str, model: str, duration: float, error: Optional[Exception] = None):
+    """
+    LLM API呼び出し1回分（リトライの各試行）を記録
+
+    Args:
+        provider: groq / gemini
+        model: モデル名
+        duration: 所要時間（秒）
+        error: 失敗した場合の例外
+    """
+    if error is None:
+        status = "success"
+    elif is_rate_limit_error(error):
+        status = "rate_limited"
+    else:
+        status = "error"
+    LLM_REQUESTS.inc(provider=provider, model=model, status=status)
+    LLM_LATENCY.observe(duration, provider=provider)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics を返すHTTPハンドラ"""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # スクレイプごとのアクセスログは出さない
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    メトリクス公開用のHTTPサーバーをバックグラウンドスレッドで起動
+
+    Args:
+        port: 待ち受けポート（0なら空きポートを自動選択）
+        host: 待ち受けアドレス（デフォルトはローカルのみ）
+
+    Returns:
+        起動したサーバー（server.server_address で実際のポートを確認できる）
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    # 空きポートで起動し、サンプルを記録してからローカルでスクレイプする
+    from urllib.request import urlopen
+
+    server = start_metrics_server(0)
+    QUERIES.inc()
+    record_cache("precached", hit=True)
+    record_cache("answer", hit=False)
+    record_llm_request("groq", "llama-3.3-70b-versatile", 0.4, error=RuntimeError("Error code: 429"))
+    record_llm_request("groq", "llama-3.1-8b-instant", 1.2)
+    RETRIEVAL_LATENCY.observe(0.12)
+
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/metrics"
+    print(f"スクレイプ: {url}\n")
+    with urlopen(url) as response:
+        print(response.read().decode('utf-8'))
+    server.shutdown()
@@ -0,0 +1,127 @@
+"""
+部署 × よくある質問の回答の事前計算スクリプト
+
+アプリと同じ経路（部署名・同義語を構造化した検索クエリ → 部署で絞り込んだハイブリッド検索 → 休暇チャンクの並べ替え →
+参照情報の圧縮・トークン予算 → build_answer_prompt → LLM）で全部署 × QUICK_QUESTIONS の回答を生成し、インデックスのバージョンと一緒に
+data/precomputed_answers.json に保存する。アプリはバージョンが一致する間だけこの回答をそのまま返すので、
+ドキュメントを読み込み直したら実行し直す
+
+LLMは次から選べる
+- api:  Groq → Geminiフォールバック（.env のAPIキー）。GROQ_BASE_URL を指定すれば
+        OpenAI互換のローカルLLM（llama.cpp server・vLLM など）でも生成できる
+- fake: benchmarks/fake_llm_server.py の疑似LLMをプロセス内で起動（APIを使わない動作確認用）
+
+使い方:
+    python precompute_answers.py
+    python precompute_answers.py --llm fake --output /tmp/answers.json
+    python precompute_answers.py --departments 看護部門 薬局
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from answer_table import AnswerTable
+from vector_store import VectorStore
+from llm_client import build_answer_prompt, generate_with_fallback, pack_answer_context
+from app import (ANSWER_SEARCH_KWARGS, ANSWER_TABLE_PATH, DEPARTMENTS, QUICK_QUESTIONS,
+                 compress_context, make_search_query, prioritize_leave_chunks)
+
+
+def make_generator(kind: str) -> Tuple[str, Callable[[str], Optional[str]], Set[str]]:
+    """
+    LLMの生成関数を作成
+
+    Returns:
+        (生成元の説明, プロンプトを受け取り回答を返す関数（失敗したらNone）, 実際に使われたモデルの集合)
+    """
+    if kind == 'fake':
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+        from fake_llm_server import FakeLLMConfig, start_fake_llm_server
+        server = start_fake_llm_server(FakeLLMConfig(latency_ms=0, tokens_per_sec=0), port=0)
+        base_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+        os.environ["GROQ_BASE_URL"] = base_url
+        os.environ["GEMINI_BASE_URL"] = base_url
+        groq_api_key, gemini_api_key = "fake-groq-key", "fake-gemini-key"
+    else:
+        groq_api_key, gemini_api_key = os.getenv("GROQ_API_KEY"), os.getenv("GEMINI_API_KEY")
+        if not groq_api_key and not gemini_api_key:
+            print("GROQ_API_KEY / GEMINI_API_KEY が設定されていません")
+            sys.exit(1)
+
+    used = set()
+
+    def generate(prompt: str) -> Optional[str]:
+        result, provider, model, last_error = generate_with_fallback(prompt, groq_api_key, gemini_api_key)
+        if result is None:
+            print(f"  ✗ 生成に失敗しました: {last_error}")
+            return None
+        used.add(f"{provider}:{model}")
+        return result
+
+    label = kind if kind == 'fake' else f"api ({os.getenv('GROQ_BASE_URL') or 'groq'})"
+    return label, generate, used
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--llm', default='api', choices=['api', 'fake'], help='回答を生成するLLM')
+    parser.add_argument('--output', help='回答表の保存先（省略時はアプリが読む ANSWER_TABLE_PATH。'
+                                         '--llm fake では誤ってアプリで使わないよう別名にする）')
+    parser.add_argument('--departments', nargs='+', help='対象の部署（省略時は全部署）')
+    parser.add_argument('--interval', type=float, default=0.0,
+                        help='生成の間隔（秒）。APIのレート制限に合わせて指定する')
+    args = parser.parse_args()
+
+    output = args.output or (ANSWER_TABLE_PATH.replace('.json', '.fake.json') if args.llm == 'fake'
+                             else ANSWER_TABLE_PATH)
+    departments = args.departments or [dept['name'] for dept in DEPARTMENTS]
+    questions = [q['question'] for q in QUICK_QUESTIONS]
+
+    store = VectorStore()
+    if store.get_collection_count() == 0:
+        print("ドキュメントが登録されていません。アプリで読み込んでから実行してください。")
+        sys.exit(1)
+
+    label, generate, used_models = make_generator(args.llm)
+    table = AnswerTable(store.index_version)
+    print(f"インデックス {store.index_version}（{store.get_collection_count()} チャンク）, LLM: {label}")
+    print(f"{len(departments)} 部署 × {len(questions)} 質問の回答を生成します")
+
+    start = time.perf_counter()
+    failed = 0
+    for department in departments:
+        # 部署ごとに全質問の検索をまとめて実行
+        search_queries = [make_search_query(question, department) for question in questions]
+        all_results = store.search_many(search_queries, department=department, **ANSWER_SEARCH_KWARGS)
+
+        for question, search_query, search_results in zip(questions, search_queries, all_results):
+            search_results = prioritize_leave_chunks(question, search_results)
+            if not search_results:
+                print(f"  - {department} / {question}: 関連する情報が見つかりませんでした")
+                failed += 1
+                continue
+
+            packed = pack_answer_context(compress_context(store, search_query, search_results))
+            answer = generate(build_answer_prompt(question, packed.chunks, department))
+            if answer is None:
+                failed += 1
+                continue
+            table.put(department, question, answer, [r['metadata']['filename'] for r in search_results])
+            print(f"  ✓ {department} / {question}")
+            if args.interval:
+                time.sleep(args.interval)
+
+    table.generator = f"{label}: {', '.join(sorted(used_models))}"
+    table.save(output)
+    print(f"\n{len(table)} 件の回答を保存しました: {output}（{time.perf_counter() - start:.1f}秒）")
+    if failed:
+        print(f"⚠️ {failed} 件は生成できませんでした（アプリでは通常どおり検索・生成します）")
+
+
+if __name__ == '__main__':
+    main()
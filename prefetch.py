@@ -0,0 +1,121 @@
+"""
+部署選択後の先読みモジュール
+部署を選んだ直後（よくある質問ボタンを押す前）にバックグラウンドで次を実行する
+
+1. 埋め込み・リランキングモデルのウォームアップ（初回推論の遅さを先に済ませる）
+2. その部署のよくある質問の検索結果を search_many で一括計算してキャッシュ
+3. （任意）検索結果からLLMの回答を生成してキャッシュ
+
+キャッシュはプロセス全体で共有し、同じ部署を選んだ別のセッションも利用する
+登録内容のバージョン（VectorStore.index_version）が変わった（ドキュメントの再読み込み・クリア）キャッシュは使わない
+（チャンク数が同じでも本文が変われば別のバージョンになる）
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tracing import tracer
+
+
+class Prefetcher:
+    """部署ごとの検索結果・回答の先読みとキャッシュ"""
+
+    def __init__(self, ttl_seconds: float = 1800.0, max_entries: int = 512):
+        """
+        Args:
+            ttl_seconds: 先読みした結果の有効期間（秒）
+            max_entries: キャッシュの上限件数（超えたら古いものから削除）
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # 先読みは1件ずつ順に実行する（推論を質問の処理と取り合わないよう並列にはしない）
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._searches: Dict[Tuple[str, str], Tuple[float, str, List[Dict]]] = {}
+        self._answers: Dict[Tuple[str, str], Tuple[float, str, str]] = {}
+        self._pending: Dict[str, Future] = {}
+
+    def prefetch_department(self, store, department: str, jobs: List[Tuple[str, str]],
+                            search_kwargs: Dict,
+                            answer_fn: Optional[Callable[[str, List[Dict]], Optional[str]]] = None) -> Future:
+        """
+        部署の先読みをバックグラウンドで開始（同じ部署の先読みが実行中なら、その完了を待つFutureを返す）
+
+        Args:
+            store: VectorStore
+            department: 部署名
+            jobs: (質問, 検索クエリ) のリスト。検索クエリはアプリが search に渡すもの（文字列または SearchQuery）と同じにする
+            search_kwargs: search_many に渡す引数（n_results など。department は自動で指定）
+            answer_fn: (質問, 検索結果) から回答を生成する関数。Noneなら回答は先読みしない
+        """
+        with self._lock:
+            pending = self._pending.get(department)
+            if pending is not None and not pending.done():
+                return pending
+            future = self._executor.submit(self._run, store, department, jobs, search_kwargs, answer_fn)
+            self._pending[department] = future
+            return future
+
+    def _run(self, store, department: str, jobs: List[Tuple[str, str]], search_kwargs: Dict, answer_fn):
+        try:
+            with tracer.span('prefetch.warm_up'):
+                store.warm_up()
+
+            version = store.index_version
+            if not version:
+                return
+            missing = [(question, query) for question, query in jobs
+                       if self.get_search(department, query, version) is None]
+            if missing:
+                with tracer.span('prefetch.search'):
+                    results = store.search_many([query for _, query in missing],
+                                                department=department, **search_kwargs)
+                now = time.monotonic()
+                with self._lock:
+                    for (_, query), result in zip(missing, results):
+                        self._searches[(department, query)] = (now, version, result)
+                    self._evict(self._searches)
+
+            if answer_fn is None:
+                return
+            for question, query in jobs:
+                if self.get_answer(department, question, version) is not None:
+                    continue
+                result = self.get_search(department, query, version)
+                if not result:
+                    continue
+                with tracer.span('prefetch.answer'):
+                    answer = answer_fn(question, result)
+                if answer is not None:
+                    with self._lock:
+                        self._answers[(department, question)] = (time.monotonic(), version, answer)
+                        self._evict(self._answers)
+        except Exception as e:
+            # 先読みの失敗は質問の処理に影響させない（通常どおり検索・生成する）
+            print(f"先読みエラー（{department}）: {e}")
+
+    def get_search(self, department: str, query: str, version: str) -> Optional[List[Dict]]:
+        """先読みした検索結果（なければNone）。呼び出し側で並べ替えてもよいようリストはコピーして返す"""
+        entry = self._lookup(self._searches, (department, query), version)
+        return list(entry) if entry is not None else None
+
+    def get_answer(self, department: str, question: str, version: str) -> Optional[str]:
+        """先読みした回答（なければNone）"""
+        return self._lookup(self._answers, (department, question), version)
+
+    def _lookup(self, cache: Dict, key: Tuple[str, str], version: str):
+        with self._lock:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            created, entry_version, value = entry
+            if entry_version != version or time.monotonic() - created > self.ttl_seconds:
+                del cache[key]
+                return None
+            return value
+
+    def _evict(self, cache: Dict):
+        """上限を超えた分を古い順に削除（ロックを取得した状態で呼ぶ）"""
+        while len(cache) > self.max_entries:
+            del cache[next(iter(cache))]
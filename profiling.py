@@ -0,0 +1,170 @@
+"""
+質問1回分のプロファイリングモジュール
+デバッグモードで「次の質問をプロファイル」したときに、回答処理全体を計測する
+
+- cProfile（決定的）: 質問を処理するスレッドの全関数呼び出しを記録。.prof をダウンロードして snakeviz 等で確認できる
+- サンプリング: 一定間隔で質問処理・検索レッグ・推論バッチのスレッドのスタックを採取。
+  別スレッドで動く検索や推論の内訳も見えるので、collapsed形式で保存してフレームグラフにできる
+
+どちらの方式でも、段階ごとの時間はトレーサーのスパン（answer.* / search.* / llm.*）から集計する
+"""
+import contextlib
+import cProfile
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from tracing import tracer
+
+
+# サンプリング対象とする補助スレッド（質問を処理するスレッド自体は常に対象）
+SAMPLED_THREAD_PREFIXES = ('search-leg', 'encode-batcher', 'rerank-batcher')
+
+# 待機中とみなして集計から除くスタック末尾の関数（ファイル名の末尾, 関数名）
+IDLE_FRAMES = {('threading.py', 'wait'), ('queue.py', 'get'), ('thread.py', '_worker')}
+
+
+class SamplingProfiler:
+    """sys._current_frames() でスタックを一定間隔に採取するプロファイラ"""
+
+    def __init__(self, interval_ms: float = 5.0):
+        """
+        Args:
+            interval_ms: サンプリング間隔（ミリ秒）
+        """
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.n_samples = 0
+        self._target_ident: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """呼び出したスレッドと検索・推論スレッドのサンプリングを開始"""
+        self._target_ident = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """サンプリングを終了"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "")
+                if ident != self._target_ident and not name.startswith(SAMPLED_THREAD_PREFIXES):
+                    continue
+                code = frame.f_code
+                if (code.co_filename.rsplit('/', 1)[-1], code.co_name) in IDLE_FRAMES:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                thread_label = "main" if ident == self._target_ident else name.rstrip('_0123456789')
+                self.stacks[(thread_label,) + tuple(reversed(stack))] += 1
+            self.n_samples += 1
+
+    def top_functions(self, limit: int = 25) -> List[Dict]:
+        """自己時間（スタック末尾）と累積時間（スタックに含まれる）の多い関数"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for function in set(stack[1:]):
+                total_counts[function] += count
+        interval_ms = self.interval * 1000
+        return [
+            {
+                'function': function,
+                'self_ms': round(self_counts[function] * interval_ms, 1),
+                'cumulative_ms': round(total_counts[function] * interval_ms, 1),
+            }
+            for function, _ in self_counts.most_common(limit)
+        ]
+
+    def collapsed(self) -> str:
+        """フレームグラフ用のcollapsed形式（flamegraph.pl / speedscope で読める）"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.items())
+
+
+def _cprofile_top_functions(profiler: cProfile.Profile, limit: int = 25) -> List[Dict]:
+    """cProfileの結果から自己時間の多い関数"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, lineno, name), (_, n_calls, self_time, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({filename.rsplit('/', 1)[-1]}:{lineno})",
+            'calls': n_calls,
+            'self_ms': round(self_time * 1000, 1),
+            'cumulative_ms': round(cumulative * 1000, 1),
+        })
+    rows.sort(key=lambda r: r['self_ms'], reverse=True)
+    return rows[:limit]
+
+
+def summarize_spans(spans: List[Dict]) -> List[Dict]:
+    """スパンを段階ごとに集計（最初に現れた順）"""
+    stages: Dict[str, Dict] = {}
+    for span in spans:
+        stage = stages.setdefault(span['name'], {'stage': span['name'], 'count': 0, 'total_ms': 0.0})
+        stage['count'] += 1
+        stage['total_ms'] = round(stage['total_ms'] + span['duration_ms'], 1)
+    return list(stages.values())
+
+
+@contextlib.contextmanager
+def profile_query(mode: str = "cprofile", on_finish: Optional[Callable[[Dict], None]] = None):
+    """
+    ブロック内の処理をプロファイルする
+
+    Streamlitの st.rerun() は例外でブロックを抜けるため、結果は戻り値ではなく
+    on_finish に渡す（例外で抜けた場合も必ず呼ばれる）
+
+    Args:
+        mode: "cprofile"（決定的）または "sampling"
+        on_finish: 計測結果の辞書を受け取る関数
+            {'mode', 'wall_ms', 'stages', 'top_functions', 'raw', 'raw_filename'}
+    """
+    profiler = cProfile.Profile() if mode == "cprofile" else SamplingProfiler()
+    start = time.perf_counter()
+    with tracer.capture() as spans:
+        if mode == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+        try:
+            yield
+        finally:
+            if mode == "cprofile":
+                profiler.disable()
+                profiler.create_stats()
+                # pstats.Stats は profiler.stats を空にするので先に書き出す
+                raw, raw_filename = marshal.dumps(profiler.stats), "query_profile.prof"
+                top = _cprofile_top_functions(profiler)
+            else:
+                profiler.stop()
+                top = profiler.top_functions()
+                raw, raw_filename = profiler.collapsed().encode('utf-8'), "query_profile.collapsed.txt"
+
+            result = {
+                'mode': mode,
+                'wall_ms': round((time.perf_counter() - start) * 1000, 1),
+                'stages': summarize_spans(spans),
+                'top_functions': top,
+                'raw': raw,
+                'raw_filename': raw_filename,
+            }
+            if on_finish is not None:
+                on_finish(result)
@@ -0,0 +1,108 @@
+"""
+同義語によるクエリ拡張
+resources/synonyms.json の同義語辞書の見出し語をすべて1つの Aho–Corasick オートマトンにまとめ、
+クエリを1回走査するだけで含まれる見出し語を見つけて同義語を追加する
+
+辞書の語数が増えても、1クエリの処理はクエリの長さと追加する同義語の数だけで決まる
+拡張結果は、埋め込み用（元の質問のまま）とキーワード検索用（同義語を追加）を別々に取り出せる
+VectorStore.search には SearchQuery（質問・部署名・同義語）を渡し、各段階に必要な部分だけを使わせる
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Union
+
+from aho_corasick import AhoCorasick
+
+
+@dataclass
+class ExpandedQuery:
+    """拡張したクエリ"""
+    original: str
+    terms: List[str] = field(default_factory=list)  # 追加する同義語（元のクエリに含まれない語、辞書の順）
+
+    @property
+    def embedding_query(self) -> str:
+        """埋め込み・リランキング用（同義語を並べると文の意味が薄まるため元のクエリのまま）"""
+        return self.original
+
+    @property
+    def keyword_query(self) -> str:
+        """キーワード検索用（元のクエリ + 同義語）"""
+        return " ".join([self.original] + self.terms)
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """
+    構造化した検索クエリ
+
+    埋め込み・リランキングは短い semantic_text（部署名 + 質問）、キーワード検索・BM25は同義語を加えた
+    keyword_text を使う。同義語を並べた長い文字列で埋め込みやCross-Encoderを推論すると、
+    文の意味が薄まるうえ推論のトークン数も増えるため
+    """
+    text: str                           # 元の質問
+    department: str = ""                # 質問に付ける部署名（文書中の表記。絞り込みは search の department 引数）
+    expansions: Tuple[str, ...] = ()    # キーワード検索に加える同義語
+
+    @classmethod
+    def coerce(cls, query: Union[str, 'SearchQuery']) -> 'SearchQuery':
+        """文字列はすべての段階で同じ文字列を使うクエリにする（従来の呼び出し方）"""
+        return query if isinstance(query, cls) else cls(query)
+
+    @property
+    def semantic_text(self) -> str:
+        """埋め込み・リランキング用"""
+        return f"{self.department} {self.text}" if self.department else self.text
+
+    @property
+    def keyword_text(self) -> str:
+        """キーワード検索・BM25用"""
+        return " ".join((self.semantic_text,) + self.expansions)
+
+
+class QueryExpander:
+    """同義語辞書をコンパイルしたクエリ拡張"""
+
+    def __init__(self, synonyms: Dict[str, List[str]]):
+        """
+        Args:
+            synonyms: 見出し語 → 同義語のリスト。クエリに見出し語が含まれると同義語を追加する
+        """
+        self._keys = list(synonyms)
+        self._values = [list(dict.fromkeys(values)) for values in synonyms.values()]
+        self._automaton = AhoCorasick(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'QueryExpander':
+        """JSONの同義語辞書から作成"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['synonyms'])
+
+    def expand(self, query: str) -> ExpandedQuery:
+        """
+        クエリを拡張
+
+        見出し語は辞書の順に処理し、同じ同義語は1回だけ、元のクエリに含まれる同義語は追加しない
+        """
+        seen = set()
+        terms = []
+        for key_index in sorted(self._automaton.search(query)):
+            for term in self._values[key_index]:
+                if term not in seen and term not in query:
+                    seen.add(term)
+                    terms.append(term)
+        return ExpandedQuery(query, terms)
+
+    def search_query(self, text: str, department: str = "") -> SearchQuery:
+        """
+        検索クエリを作成（同義語は部署名 + 質問に対して求める）
+
+        Args:
+            text: 質問
+            department: 質問に付ける部署名（文書中の表記）
+        """
+        query = SearchQuery(text, department)
+        return SearchQuery(text, department, tuple(self.expand(query.semantic_text).terms))
@@ -0,0 +1,109 @@
+"""
+勤務時間表の構造化ストア
+埋め込みExcelから抽出した部署ごとの勤務時間表（DocumentProcessor の shift_rows）を SQLite に保存し、
+勤務時間の質問には検索もLLMも使わず部署をキーにした参照だけで回答する
+
+ドキュメントを読み込むたびに全件を置き換えるので、回答は常に元の文書と一致する
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+
+SHIFT_COLUMNS = ['department', 'shift_kind', 'start_time', 'end_time',
+                 'binding_time', 'break_time', 'working_time', 'source']
+
+
+class ShiftTableStore:
+    """部署ごとの勤務時間表（SQLite）"""
+
+    def __init__(self, db_path: str = "./data/shift_tables.db"):
+        """
+        Args:
+            db_path: SQLiteファイルのパス（":memory:" でメモリ上に作成）
+        """
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # Streamlitの各セッション（スレッド）から共有するため、接続は1つにしてロックで保護する
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS shifts (
+                    department TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    shift_kind TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    binding_time TEXT NOT NULL,
+                    break_time TEXT NOT NULL,
+                    working_time TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    PRIMARY KEY (department, position)
+                )
+            """)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM shifts").fetchone()[0]
+
+    def replace_all(self, rows: List[Dict[str, str]]):
+        """
+        全件を置き換え（1トランザクション）
+
+        Args:
+            rows: 勤務時間表の行（文書内の順序）。同じ部署・勤務種別が複数の文書にある場合は先に現れた行を使う
+        """
+        seen = set()
+        records = []
+        positions: Dict[str, int] = {}
+        for row in rows:
+            key = (row['department'], row['shift_kind'])
+            if key in seen:
+                continue
+            seen.add(key)
+            position = positions.get(row['department'], 0)
+            positions[row['department']] = position + 1
+            records.append((row['department'], position) + tuple(row[c] for c in SHIFT_COLUMNS[1:]))
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM shifts")
+            self._conn.executemany(
+                "INSERT INTO shifts (department, position, shift_kind, start_time, end_time, "
+                "binding_time, break_time, working_time, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records
+            )
+        print(f"✓ 勤務時間表を保存しました（{len(positions)} 部署, {len(records)} 行）")
+
+    def get_department(self, department: str) -> List[Dict[str, str]]:
+        """部署の勤務時間表（表の順序）。なければ空のリスト"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM shifts WHERE department = ? ORDER BY position", (department,)
+            )
+            return [{column: row[column] for column in SHIFT_COLUMNS} for row in cursor]
+
+    def departments(self) -> List[str]:
+        """勤務時間表のある部署"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT department FROM shifts")]
+
+    def format_markdown(self, department: str) -> Optional[str]:
+        """部署の勤務時間表をMarkdownの表で返す（なければNone）"""
+        rows = self.get_department(department)
+        if not rows:
+            return None
+        lines = [
+            f"## {department}の勤務時間",
+            "",
+            "| 勤務種別 | 始業～終業 | 拘束時間 | 休憩時間 | 勤務時間 |",
+            "|----------|------------|----------|----------|----------|",
+        ]
+        lines += [
+            f"| {r['shift_kind']} | {r['start_time']}～{r['end_time']} | {r['binding_time']} | "
+            f"{r['break_time']} | {r['working_time']} |"
+            for r in rows
+        ]
+        return "\n".join(lines)
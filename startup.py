@@ -0,0 +1,55 @@
+"""
+起動時間の計測モジュール
+重いモジュールのimportやモデルの読み込みを段階ごとに計測し、管理画面とログで確認できるようにする
+
+app.py はログイン画面をすぐ表示するため、vector_store（sentence_transformers / torch）や
+llm_client（google.generativeai / groq）を最初に使う時点まで、またはバックグラウンドスレッドで読み込む
+import全体の内訳は `python -X importtime -c "import vector_store" 2> import.log` で確認できる
+"""
+import contextlib
+import importlib
+import sys
+import threading
+import time
+from typing import Dict, List
+
+
+_lock = threading.Lock()
+_timings: Dict[str, Dict] = {}
+
+
+def record_startup(phase: str, seconds: float):
+    """起動段階の所要時間を記録（同じ段階は最初の1回のみ）"""
+    with _lock:
+        if phase in _timings:
+            return
+        _timings[phase] = {
+            'phase': phase,
+            'seconds': round(seconds, 3),
+            'thread': threading.current_thread().name,
+        }
+    print(f"⏱️ {phase}: {seconds:.2f}秒")
+
+
+@contextlib.contextmanager
+def startup_phase(phase: str):
+    """ブロックの所要時間を起動段階として記録するコンテキストマネージャ（例外で抜けた場合は記録しない）"""
+    start = time.perf_counter()
+    yield
+    record_startup(phase, time.perf_counter() - start)
+
+
+def timed_import(module_name: str):
+    """モジュールをimportし、初回のみ所要時間を記録"""
+    # 別スレッドでimport中のモジュールは sys.modules に途中の状態で入っているため、
+    # 読み込み済みでも import_module を通してimportの完了を待つ
+    if module_name in sys.modules:
+        return importlib.import_module(module_name)
+    with startup_phase(f"import {module_name}"):
+        return importlib.import_module(module_name)
+
+
+def startup_timings() -> List[Dict]:
+    """記録された起動段階（記録順）"""
+    with _lock:
+        return [dict(timing) for timing in _timings.values()]
@@ -0,0 +1,212 @@
+"""
+文書・セクションの要約ベクトル（階層検索の1段目）
+規程集が増えると、全チャンクを対象にした検索は採点の量が総チャンク数に比例して増え、関係のない文書の
+チャンクが候補を占めるようになる。登録時に文書ごと・セクションごとのチャンク埋め込みの平均（正規化済み）を
+求めておき、検索時はまずクエリに近い文書・セクションを選び、チャンク単位の検索はその中だけで行う
+
+セクションは同じ文書の連続したチャンクで、章の見出し（第N章）・部署タグが変わる位置と max_section_chunks で区切る
+ベクトルは .npz に保存し、全セクションとの類似度は行列積1回で計算する
+"""
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# チャンク内の章の見出し行（ここから新しいセクションにする）
+CHAPTER_LINE_PATTERN = re.compile(r'^\s*第\s*[0-9０-９一二三四五六七八九十百]+\s*章', re.MULTILINE)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class SummaryIndex:
+    """文書・セクションの要約ベクトル"""
+
+    def __init__(self, max_section_chunks: int = 8):
+        """
+        Args:
+            max_section_chunks: 1セクションの最大チャンク数
+        """
+        self.max_section_chunks = max_section_chunks
+        self.filenames: List[str] = []                                  # 文書（ファイル名）
+        self.document_vectors = np.zeros((0, 0), dtype=np.float32)
+        self.section_documents = np.zeros(0, dtype=np.int32)            # セクションの文書の添字
+        self.section_starts = np.zeros(0, dtype=np.int32)               # セクションの先頭の chunk_index
+        self.section_ends = np.zeros(0, dtype=np.int32)                 # セクションの最後の chunk_index
+        self.section_departments = np.zeros(0, dtype=str)               # セクションの部署タグ（共通は空文字）
+        self.section_vectors = np.zeros((0, 0), dtype=np.float32)
+        self.chunk_ids: List[str] = []
+        self.chunk_sections = np.zeros(0, dtype=np.int32)               # chunk_ids と同じ順のセクションの添字
+        self.index_version = ""                                         # 作成元の登録内容のバージョン
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def section_count(self) -> int:
+        return len(self.section_starts)
+
+    def build(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: Sequence):
+        """
+        登録済みチャンクから要約ベクトルを作成
+
+        Args:
+            ids: チャンクID
+            documents: チャンクの本文（章の見出しの検出に使う）
+            metadatas: チャンクのメタデータ（filename・chunk_index・department）
+            embeddings: チャンクの埋め込み（登録時に計算したもの）
+        """
+        embeddings = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        by_file: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            by_file.setdefault(metadata['filename'], []).append(row)
+
+        self.filenames = sorted(by_file)
+        document_vectors, section_vectors = [], []
+        section_documents, section_starts, section_ends, section_departments = [], [], [], []
+        chunk_sections = np.zeros(len(ids), dtype=np.int32)
+
+        for document_index, filename in enumerate(self.filenames):
+            rows = sorted(by_file[filename], key=lambda row: metadatas[row]['chunk_index'])
+            document_vectors.append(embeddings[rows].mean(axis=0))
+
+            section: List[int] = []
+            for row in rows + [None]:
+                if section and (row is None
+                                or len(section) >= self.max_section_chunks
+                                or metadatas[row].get('department', '') != metadatas[section[-1]].get('department', '')
+                                or CHAPTER_LINE_PATTERN.search(documents[row])):
+                    chunk_sections[section] = len(section_starts)
+                    section_vectors.append(embeddings[section].mean(axis=0))
+                    section_documents.append(document_index)
+                    section_starts.append(metadatas[section[0]]['chunk_index'])
+                    section_ends.append(metadatas[section[-1]]['chunk_index'])
+                    section_departments.append(metadatas[section[0]].get('department', ''))
+                    section = []
+                if row is not None:
+                    section.append(row)
+
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        self.document_vectors = (_normalize_rows(np.stack(document_vectors)) if document_vectors
+                                 else np.zeros((0, dim), dtype=np.float32))
+        self.section_vectors = (_normalize_rows(np.stack(section_vectors)) if section_vectors
+                                else np.zeros((0, dim), dtype=np.float32))
+        self.section_documents = np.asarray(section_documents, dtype=np.int32)
+        self.section_starts = np.asarray(section_starts, dtype=np.int32)
+        self.section_ends = np.asarray(section_ends, dtype=np.int32)
+        self.section_departments = np.asarray(section_departments, dtype=str)
+        self.chunk_ids = list(ids)
+        self.chunk_sections = chunk_sections
+        return self
+
+    def route(self, query_embeddings: Sequence, max_documents: int, max_sections: int,
+              department_scope: Optional[List[str]] = None) -> List[np.ndarray]:
+        """
+        クエリごとに検索対象のセクションを選ぶ
+
+        類似度の高い文書を max_documents 件選び、その中から類似度の高いセクションを max_sections 件選ぶ
+        部署を指定した場合、その部署タグのセクション（勤務時間表など）は類似度によらず加える
+
+        Args:
+            query_embeddings: クエリの埋め込み（query: プレフィックス付きで推論したもの）
+            max_documents: 選ぶ文書の数
+            max_sections: 選ぶセクションの数
+            department_scope: 部署での絞り込み対象（この部署タグのセクションだけを選ぶ。Noneなら全セクション）
+
+        Returns:
+            クエリごとのセクションの添字の配列（類似度の高い順）
+        """
+        queries = _normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        document_scores = queries @ self.document_vectors.T
+        section_scores = queries @ self.section_vectors.T
+        eligible = (np.isin(self.section_departments, department_scope) if department_scope is not None
+                    else np.ones(self.section_count, dtype=bool))
+
+        department_tags = [tag for tag in (department_scope or []) if tag]
+        department_sections = np.flatnonzero(np.isin(self.section_departments, department_tags))
+
+        # 部署の対象になるセクションがある文書だけを順位づける
+        eligible_documents = np.unique(self.section_documents[eligible])
+
+        selected = []
+        for document_row, section_row in zip(document_scores, section_scores):
+            order = np.argsort(-document_row[eligible_documents], kind='stable')[:max_documents]
+            documents = eligible_documents[order]
+            candidates = np.flatnonzero(eligible & np.isin(self.section_documents, documents))
+            order = np.argsort(-section_row[candidates], kind='stable')[:max_sections]
+            chosen = candidates[order]
+            if len(department_sections):
+                chosen = np.concatenate([chosen, department_sections[~np.isin(department_sections, chosen)]])
+            selected.append(chosen)
+        return selected
+
+    def where(self, sections: Sequence[int]) -> Optional[Dict]:
+        """セクションのチャンクだけを対象にするChromaDBの where 条件（セクションがなければNone = 絞り込まない）"""
+        clauses = [
+            {'$and': [
+                {'filename': self.filenames[self.section_documents[section]]},
+                {'chunk_index': {'$gte': int(self.section_starts[section])}},
+                {'chunk_index': {'$lte': int(self.section_ends[section])}},
+            ]}
+            for section in sections
+        ]
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$or': clauses}
+
+    def chunk_ids_in(self, sections: Sequence[int]) -> set:
+        """セクションに属するチャンクID"""
+        rows = np.flatnonzero(np.isin(self.chunk_sections, np.asarray(sections, dtype=np.int32)))
+        return {self.chunk_ids[row] for row in rows}
+
+    def sections_of(self, chunk_ids: List[str]) -> np.ndarray:
+        """
+        チャンクIDごとのセクションの添字（要約にないチャンクは -1）
+        BM25インデックスの ids に対して1回求めておき、np.isin でセクションのマスクを作る
+        """
+        section_of = dict(zip(self.chunk_ids, self.chunk_sections.tolist()))
+        return np.asarray([section_of.get(chunk_id, -1) for chunk_id in chunk_ids], dtype=np.int32)
+
+    def describe(self, section: int) -> str:
+        """セクションの表示名（ファイル名とチャンク番号の範囲）"""
+        return (f"{self.filenames[self.section_documents[section]]}"
+                f" [{self.section_starts[section]}-{self.section_ends[section]}]")
+
+    def save(self, path: str):
+        """要約ベクトルを.npzファイルに保存"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez_compressed(
+            path,
+            max_section_chunks=np.array(self.max_section_chunks, dtype=np.int32),
+            filenames=np.array(self.filenames, dtype=str),
+            document_vectors=self.document_vectors,
+            section_documents=self.section_documents,
+            section_starts=self.section_starts,
+            section_ends=self.section_ends,
+            section_departments=self.section_departments,
+            section_vectors=self.section_vectors,
+            chunk_ids=np.array(self.chunk_ids, dtype=str),
+            chunk_sections=self.chunk_sections,
+            index_version=np.array(self.index_version, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'SummaryIndex':
+        """保存済みの要約ベクトルを読み込み"""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(int(data['max_section_chunks']))
+            index.filenames = data['filenames'].tolist()
+            index.document_vectors = data['document_vectors']
+            index.section_documents = data['section_documents']
+            index.section_starts = data['section_starts']
+            index.section_ends = data['section_ends']
+            index.section_departments = data['section_departments']
+            index.section_vectors = data['section_vectors']
+            index.chunk_ids = data['chunk_ids'].tolist()
+            index.chunk_sections = data['chunk_sections']
+            if 'index_version' in data.files:
+                index.index_version = str(data['index_version'])
+        return index
@@ -0,0 +1,194 @@
+"""
+軽量トレーシングモジュール
+質問応答の各段階を名前付きスパンで計測し、段階ごとのローリングヒストグラム（p50/p95/p99）に集計する
+スパンはJSON Lines形式でファイルに書き出してオフライン分析にも使える
+無効時の span() は共有のno-opオブジェクトを返すだけなので、計測箇所のオーバーヘッドはほぼない
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional
+
+
+# 現在のトレース（1回の質問応答）のID。検索レッグのスレッドにも contextvars で引き継ぐ
+_current_trace_id: contextvars.ContextVar = contextvars.ContextVar('trace_id', default=None)
+
+# capture() 中のスパンの記録先。トレーサーが無効でもこのコンテキストのスパンだけは記録する
+_captured_spans: contextvars.ContextVar = contextvars.ContextVar('captured_spans', default=None)
+
+
+class _NoopSpan:
+    """トレーシング無効時のスパン"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """計測中のスパン"""
+
+    __slots__ = ('tracer', 'name', 'new_trace', 'start', 'token')
+
+    def __init__(self, tracer: 'Tracer', name: str, new_trace: bool = False):
+        self.tracer = tracer
+        self.name = name
+        self.new_trace = new_trace
+        self.token = None
+
+    def __enter__(self):
+        if self.new_trace:
+            self.token = _current_trace_id.set(uuid.uuid4().hex[:16])
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        self.tracer.record(self.name, duration_ms, error=exc_type is not None and exc_type.__name__)
+        if self.token is not None:
+            _current_trace_id.reset(self.token)
+        return False
+
+
+class Tracer:
+    """名前付きスパンを集計するトレーサー"""
+
+    def __init__(self, enabled: bool = False, window: int = 1000, export_path: Optional[str] = None):
+        """
+        Args:
+            enabled: 計測を有効にするか
+            window: スパン名ごとに保持する直近の計測数（ローリングヒストグラムの幅）
+            export_path: 指定するとスパンをJSON Lines形式で追記する
+        """
+        self.enabled = enabled
+        self.window = window
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._durations: Dict[str, deque] = {}
+        self._recent: deque = deque(maxlen=window)
+
+    def span(self, name: str):
+        """段階を計測するコンテキストマネージャ"""
+        if not self.enabled and _captured_spans.get() is None:
+            return _NOOP_SPAN
+        return _Span(self, name)
+
+    def trace(self, name: str):
+        """新しいトレース（1回の質問応答）を開始して全体を計測するコンテキストマネージャ"""
+        if not self.enabled and _captured_spans.get() is None:
+            return _NOOP_SPAN
+        return _Span(self, name, new_trace=True)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """
+        ブロック内（引き継いだスレッドを含む）のスパンをリストに集める
+        トレーサーが無効でも記録するので、1回の質問だけを計測するときに使う
+
+        Yields:
+            記録されたスパン（recordのエントリ）のリスト。ブロックを抜けるまで追加される
+        """
+        spans: List[Dict] = []
+        token = _captured_spans.set(spans)
+        try:
+            yield spans
+        finally:
+            _captured_spans.reset(token)
+
+    def record(self, name: str, duration_ms: float, error=None):
+        """
+        計測済みの所要時間を記録（スパン以外で測った時間の登録にも使う）
+
+        Args:
+            name: 段階名
+            duration_ms: 所要時間（ミリ秒）
+            error: 例外で終了した場合は例外クラス名
+        """
+        captured = _captured_spans.get()
+        if not self.enabled and captured is None:
+            return
+        entry = {
+            'trace_id': _current_trace_id.get(),
+            'name': name,
+            'ts': time.time(),
+            'duration_ms': round(duration_ms, 3),
+            'thread': threading.current_thread().name,
+        }
+        if error:
+            entry['error'] = error
+        if captured is not None:
+            captured.append(entry)
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if name not in self._durations:
+                self._durations[name] = deque(maxlen=self.window)
+            self._durations[name].append(duration_ms)
+            self._recent.append(entry)
+            if self.export_path:
+                with open(self.export_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def summary(self) -> List[Dict]:
+        """スパン名ごとの件数・平均・p50/p95/p99（ミリ秒）"""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self._durations.items()}
+
+        rows = []
+        for name, values in sorted(snapshot.items()):
+            if not values:
+                continue
+            rows.append({
+                'stage': name,
+                'count': len(values),
+                'mean_ms': round(sum(values) / len(values), 1),
+                'p50_ms': round(_percentile(values, 50), 1),
+                'p95_ms': round(_percentile(values, 95), 1),
+                'p99_ms': round(_percentile(values, 99), 1),
+            })
+        return rows
+
+    def export_jsonl(self) -> str:
+        """直近のスパンをJSON Lines形式の文字列で返す"""
+        with self._lock:
+            return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self._recent)
+
+    def reset(self):
+        """集計をクリア"""
+        with self._lock:
+            self._durations.clear()
+            self._recent.clear()
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    """ソート済みの値からpパーセンタイルを計算（線形補間）"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * p / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def traced_sleep(seconds: float):
+    """tenacityのバックオフ待ちを計測するsleep関数（retryの sleep= に渡す）"""
+    with tracer.span('llm.retry_sleep'):
+        time.sleep(seconds)
+
+
+# アプリ全体で共有するトレーサー
+tracer = Tracer(
+    enabled=os.getenv("TRACING_ENABLED", "0") == "1",
+    export_path=os.getenv("TRACE_EXPORT_PATH") or None,
+)
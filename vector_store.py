@@ -1,33 +1,159 @@
 """
 ベクトルストア管理モジュール
 Sentence TransformersとChromaDBを使用してドキュメントをベクトル化・検索
+
+sentence_transformers（torch・transformers）のimportとモデルの読み込みは数秒かかるため、
+最初にモデルを使う時点、または start_background_loading() のバックグラウンドスレッドで行う
 """
+import contextvars
+import hashlib
+import json
 import os
-from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer, CrossEncoder
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple, Union
 import chromadb
+import numpy as np
 from chromadb.config import Settings
+from bm25_index import BM25Index
+from inference_scheduler import InferenceScheduler
+from tracing import tracer
+import metrics
+from startup import startup_phase, timed_import
+from document_processor import chunk_text, detect_chunk_department, normalize_department
+from query_expander import SearchQuery
+from chunk_merger import merge_adjacent_results
+from summary_index import SummaryIndex
+
+
+# 部署名のパターンリスト（スペース有無両対応）
+DEPT_PATTERNS = [
+    '診療部', '看護部門', '放射線科', 'リハビリテーション科', 'リハビリ',
+    '栄養科', '検査科', '薬局', '薬　局', '地域連携室', '事務部門', '事務',
+    '訪問看護ステーション', '訪問看護', 'パートタイマー'
+]
+
+# 重要キーワード
+IMPORTANT_KEYWORDS = ['勤務時間', '始業', '終業', 'シフト', '休暇', '休業', '給与', '手当',
+                      '有給', '年次有給', '特別休暇', '付与', '日数', '届出', '手続き']
+
+# BM25だけのヒットで距離の閾値を免除する最低スコア（そのクエリのBM25最高スコアに対する割合）
+# 文字n-gramのBM25では日本語のクエリとほぼ全チャンクが2-gramを共有して正のスコアになるため、
+# 上位に近いヒットだけを免除し、それ以外はベクトル検索の結果と同じく距離で絞り込む
+BM25_MIN_RELATIVE_SCORE = 0.5
+
+WORK_TIME_TERMS = ['勤務時間', '始業', '終業', 'シフト', '勤務']
+LEAVE_TERMS = ['休暇', '有給', '特別休暇', '付与', '日数']
+
+
+def extract_keywords(query: str) -> Tuple[List[str], bool, bool]:
+    """
+    クエリからキーワード検索に使う語を抽出
+
+    Returns:
+        (キーワードのリスト, 勤務時間に関するクエリか, 休暇に関するクエリか)
+    """
+    # クエリから部署名・重要キーワードを抽出
+    keywords = [dept for dept in DEPT_PATTERNS if dept in query]
+    keywords += [kw for kw in IMPORTANT_KEYWORDS if kw in query]
+
+    is_work_time_query = any(kw in query for kw in WORK_TIME_TERMS)
+    is_leave_query = any(kw in query for kw in LEAVE_TERMS)
+    return keywords, is_work_time_query, is_leave_query
+
+
+def keyword_filter_terms(keywords: List[str], is_work_time_query: bool,
+                         is_leave_query: bool) -> List[str]:
+    """
+    キーワードスコアが0より大きくなり得るチャンクが必ず含む語の一覧
+    （_keyword_searchのスコアリング条件と対応させること）
+    """
+    terms = list(keywords)
+    if is_work_time_query:
+        terms.append('勤務時間】')
+    if is_leave_query:
+        # 「10日・11日・12日」の表は3語すべてを含むため「10日」だけで十分
+        terms += ['年次有給休暇', '特別休暇', '付与日数', '10日']
+    # 重複を除去（順序は維持）
+    return list(dict.fromkeys(terms))
+
+
+def build_keyword_filter(terms: List[str]) -> Optional[Dict]:
+    """
+    ChromaDBの where_document フィルタを生成
+
+    Returns:
+        $contains / $or のフィルタ。語がなければNone
+    """
+    if not terms:
+        return None
+    if len(terms) == 1:
+        return {'$contains': terms[0]}
+    return {'$or': [{'$contains': term} for term in terms]}
+
+
+def get_in_batches(collection, batch_size: int = 5000, **kwargs) -> Dict[str, list]:
+    """
+    collection.get をページングして実行し、結果を結合して返す
+    （大規模コレクションで一度に取得するとSQLの変数上限を超えるため）
+    """
+    include = kwargs.get('include', ['documents', 'metadatas'])
+    merged = {'ids': []}
+    merged.update({key: [] for key in include})
+    offset = 0
+    while True:
+        page = collection.get(limit=batch_size, offset=offset, **kwargs)
+        merged['ids'].extend(page['ids'])
+        for key in include:
+            merged[key].extend(page[key])
+        if len(page['ids']) < batch_size:
+            return merged
+        offset += batch_size
+
+
+def compute_index_version(all_data: Dict[str, list]) -> str:
+    """登録内容のバージョン（チャンクID・本文のハッシュ。空のコレクションは空文字）"""
+    if not all_data['ids']:
+        return ''
+    digest = hashlib.sha256()
+    for chunk_id, document in sorted(zip(all_data['ids'], all_data['documents'])):
+        digest.update(chunk_id.encode('utf-8') + b'\0' + document.encode('utf-8') + b'\0')
+    return digest.hexdigest()[:16]
 
 
 class VectorStore:
     """ベクトルストアを管理するクラス"""
 
-    def __init__(self, collection_name: str = "company_documents", persist_directory: str = "./data/chroma_db"):
+    def __init__(self, collection_name: str = "company_documents", persist_directory: str = "./data/chroma_db",
+                 parallel_search: bool = True, micro_batching: bool = False,
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 embedding_cache_size: int = 1024, merge_adjacent_chunks: bool = True,
+                 merge_max_chars: int = 2400, hierarchical_search: bool = False,
+                 route_documents: int = 3, route_sections: int = 8, search_concurrency: int = 8):
         """
         Args:
             collection_name: ChromaDBのコレクション名
             persist_directory: ChromaDBの永続化ディレクトリ
+            parallel_search: 検索のベクトル・キーワード・BM25の各レッグを並列に実行するか
+            micro_batching: 複数セッションからのクエリ埋め込み・リランキングを集約してバッチ推論するか
+            max_batch_size: マイクロバッチングの1バッチの上限件数
+            max_wait_ms: マイクロバッチングでジョブを集約する最大待ち時間（ミリ秒）
+            embedding_cache_size: クエリ埋め込みのLRUキャッシュの件数（0で無効）
+            merge_adjacent_chunks: 同じファイルの連続したチャンクをリランキングの前に1つに結合するか
+            merge_max_chars: 結合後の本文の上限文字数
+            hierarchical_search: 先に文書・セクションの要約ベクトルで検索対象を選び、チャンク単位の検索をその中に限るか
+            route_documents: 階層検索で選ぶ文書の数
+            route_sections: 階層検索で選ぶセクションの数
+            search_concurrency: 同時に検索するセッション数の想定（検索レッグのスレッドプールの大きさを決める）
         """
-        # Sentence Transformerモデルの読み込み（高精度な多言語モデル）
-        print("埋め込みモデルを読み込み中...")
-        # より高精度な多言語モデルを使用
-        self.model = SentenceTransformer('intfloat/multilingual-e5-base')
-        print("✓ 埋め込みモデルの読み込み完了")
-
-        # リランキング用のCross-Encoderモデル
-        print("リランキングモデルを読み込み中...")
-        self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
-        print("✓ リランキングモデルの読み込み完了")
+        # 埋め込み・リランキングモデルは遅延読み込み（model / reranker プロパティ）
+        self._model = None
+        self._reranker = None
+        self._models_lock = threading.Lock()
+        self._loader_thread: Optional[threading.Thread] = None
+        self._warmed_up = False
 
         # ChromaDB クライアントの初期化
         self.client = chromadb.PersistentClient(path=persist_directory)
@@ -40,6 +166,214 @@ class VectorStore:
             self.collection = self.client.create_collection(name=collection_name)
             print(f"新しいコレクション '{collection_name}' を作成しました")
 
+        # インデックスのバージョン（登録内容のハッシュ）。事前計算した回答などが同じ登録内容のものか確認する
+        # （BM25インデックスを構築したときにも更新する）
+        self.manifest_path = os.path.join(persist_directory, f"{collection_name}_manifest.json")
+
+        # 保存済みのBM25インデックス・要約ベクトル・マニフェストは、コレクションの現在の登録内容と
+        # バージョンが一致する場合だけ使う（チャンク数が同じでもChromaDBが差し替えられていれば作り直す）
+        all_data = get_in_batches(self.collection, include=['documents'])
+        current_version = compute_index_version(all_data)
+
+        # BM25スパースインデックス（文字n-gram）の読み込み
+        self.bm25_path = os.path.join(persist_directory, f"{collection_name}_bm25.npz")
+        self.bm25_index = self._load_bm25_index(current_version)
+        self.manifest = self._load_manifest(current_version)
+
+        # 文書・セクションの要約ベクトル（階層検索の1段目。登録時に常に作成し、階層検索が有効な場合だけ読み込む）
+        self.summary_path = os.path.join(persist_directory, f"{collection_name}_summaries.npz")
+        self.hierarchical_search = hierarchical_search
+        self.route_documents = route_documents
+        self.route_sections = route_sections
+        self.summary_index: Optional[SummaryIndex] = (self._load_summary_index(current_version)
+                                                      if hierarchical_search else None)
+        self._bm25_sections = None  # BM25インデックスの各チャンクのセクション（要約・BM25の再構築で作り直す）
+
+        # 検索レッグ並列実行用のスレッドプール（モデル推論・ChromaDB・numpyはGILを解放する）
+        # ストアは全セッションで共有するため、キーワード・BM25の2レッグ × 同時検索数のワーカーを用意する
+        # （ベクトル検索のレッグは呼び出し元のスレッドで実行する。_run_legs を参照）
+        self.parallel_search = parallel_search
+        self._search_executor = ThreadPoolExecutor(max_workers=2 * max(search_concurrency, 1),
+                                                   thread_name_prefix="search-leg")
+        self._local = threading.local()
+
+        # セッション横断の推論マイクロバッチング（Noneなら各呼び出しで直接推論）
+        self.scheduler = (InferenceScheduler(self.encode_texts, self.rerank_pairs, max_batch_size, max_wait_ms)
+                          if micro_batching else None)
+
+        # 連続したチャンクの結合（オーバーラップの重複をリランキング・プロンプトから除く）
+        self.merge_adjacent_chunks = merge_adjacent_chunks
+        self.merge_max_chars = merge_max_chars
+
+        # クエリ埋め込みのLRUキャッシュ（同じ質問・展開済みクエリの再推論を省く）
+        self.embedding_cache_size = embedding_cache_size
+        self._embedding_cache: "OrderedDict[str, object]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """埋め込みモデル（未読み込みなら読み込みを待つ）"""
+        if self._model is None:
+            self.load_models()
+        return self._model
+
+    @property
+    def reranker(self):
+        """リランキングモデル（未読み込みなら読み込みを待つ）"""
+        if self._reranker is None:
+            self.load_models()
+        return self._reranker
+
+    @property
+    def models_loaded(self) -> bool:
+        """埋め込み・リランキングモデルの読み込みが完了しているか"""
+        return self._model is not None and self._reranker is not None
+
+    def load_models(self):
+        """埋め込み・リランキングモデルを読み込む（読み込み済みなら何もしない。複数スレッドから呼んでも1回だけ）"""
+        with self._models_lock:
+            if self.models_loaded:
+                return
+            sentence_transformers = timed_import('sentence_transformers')
+
+            # Sentence Transformerモデルの読み込み（高精度な多言語モデル）
+            print("埋め込みモデルを読み込み中...")
+            with startup_phase("load embedding model"):
+                model = sentence_transformers.SentenceTransformer('intfloat/multilingual-e5-base')
+            print("✓ 埋め込みモデルの読み込み完了")
+
+            # リランキング用のCross-Encoderモデル
+            print("リランキングモデルを読み込み中...")
+            with startup_phase("load reranker model"):
+                self._reranker = sentence_transformers.CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+            self._model = model
+            print("✓ リランキングモデルの読み込み完了")
+
+    def start_background_loading(self):
+        """モデルの読み込みをバックグラウンドスレッドで開始（最初の検索はこの完了を待つ）"""
+        if self.models_loaded or self._loader_thread is not None:
+            return
+
+        def load():
+            try:
+                self.load_models()
+            except Exception as e:
+                # 読み込みに失敗しても、最初の検索時に改めて読み込んでエラーを表示する
+                print(f"モデルのバックグラウンド読み込みエラー: {e}")
+
+        self._loader_thread = threading.Thread(target=load, name="model-loader", daemon=True)
+        self._loader_thread.start()
+
+    def warm_up(self):
+        """
+        モデルを読み込み、ダミー入力で1回ずつ推論する（初回推論だけ遅い分を先に済ませる）
+        2回目以降の呼び出しは何もしない
+        """
+        if self._warmed_up:
+            return
+        self.load_models()
+        self.encode_texts(["query: ウォームアップ"])
+        self.rerank_pairs([("ウォームアップ", "ウォームアップ")])
+        self._warmed_up = True
+
+    def _load_bm25_index(self, index_version: str) -> BM25Index:
+        """保存済みのBM25インデックスを読み込み（なければ、または登録内容のバージョンが違えばコレクションから構築）"""
+        if os.path.exists(self.bm25_path):
+            try:
+                index = BM25Index.load(self.bm25_path)
+                if index_version and index.index_version == index_version:
+                    print(f"✓ BM25インデックスを読み込みました（{len(index)} チャンク）")
+                    return index
+            except Exception as e:
+                print(f"BM25インデックス読み込みエラー: {e}")
+
+        index = BM25Index()
+        if self.collection.count() > 0:
+            self._rebuild_bm25_index(index)
+        return index
+
+    def _load_summary_index(self, index_version: str) -> Optional[SummaryIndex]:
+        """保存済みの要約ベクトルを読み込み（なければ、または登録内容のバージョンが違えばコレクションから作成）"""
+        if os.path.exists(self.summary_path):
+            try:
+                index = SummaryIndex.load(self.summary_path)
+                if index_version and index.index_version == index_version:
+                    print(f"✓ 要約ベクトルを読み込みました（{len(index.filenames)} 文書, {index.section_count} セクション）")
+                    return index
+            except Exception as e:
+                print(f"要約ベクトル読み込みエラー: {e}")
+
+        if self.collection.count() == 0:
+            return None
+        return self._rebuild_summary_index()
+
+    def _rebuild_summary_index(self) -> SummaryIndex:
+        """コレクション全体の埋め込みから文書・セクションの要約ベクトルを作成して保存（推論はしない）"""
+        print("要約ベクトルを作成中...")
+        all_data = get_in_batches(self.collection, include=['documents', 'metadatas', 'embeddings'])
+        index = SummaryIndex().build(all_data['ids'], all_data['documents'], all_data['metadatas'],
+                                     all_data['embeddings'])
+        index.index_version = compute_index_version(all_data)
+        index.save(self.summary_path)
+        self.summary_index = index
+        self._bm25_sections = None
+        print(f"✓ 要約ベクトルの作成完了（{len(index.filenames)} 文書, {index.section_count} セクション）")
+        return index
+
+    def _load_manifest(self, index_version: str) -> Dict:
+        """保存済みのマニフェストを読み込み（なければ、または登録内容のバージョンが違えば作り直す）"""
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('index_version') == index_version:
+                    return manifest
+            except (OSError, ValueError) as e:
+                print(f"マニフェスト読み込みエラー: {e}")
+        all_data = get_in_batches(self.collection, include=['documents', 'metadatas'])
+        return self._write_manifest(all_data)
+
+    def _write_manifest(self, all_data: Dict[str, list]) -> Dict:
+        """登録済みチャンク全体からインデックスのバージョンを計算して保存"""
+        files: Dict[str, int] = {}
+        for metadata in all_data['metadatas']:
+            filename = (metadata or {}).get('filename', '')
+            files[filename] = files.get(filename, 0) + 1
+        manifest = {
+            'index_version': compute_index_version(all_data),
+            'chunks': len(all_data['ids']),
+            'files': files,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    @property
+    def index_version(self) -> str:
+        """登録内容のバージョン（チャンクID・本文のハッシュ。空のコレクションは空文字）"""
+        return self.manifest['index_version']
+
+    def _rebuild_bm25_index(self, index: Optional[BM25Index] = None):
+        """コレクション全体からBM25インデックスを再構築して保存"""
+        # 空のインデックスは len() が0で偽になるため None と比較する
+        index = index if index is not None else BM25Index()
+        print("BM25インデックスを構築中...")
+        all_data = get_in_batches(self.collection, include=['documents', 'metadatas'])
+        # 部署タグのない旧形式のコレクションでは部署での絞り込みを行わない
+        departments = [(m or {}).get('department') for m in all_data['metadatas']]
+        if any(d is None for d in departments):
+            print("※ 部署タグのないチャンクがあるため部署での絞り込みは無効です（再読み込みで有効になります）")
+            departments = None
+        index.build(all_data['ids'], all_data['documents'], departments)
+        index.index_version = compute_index_version(all_data)
+        index.save(self.bm25_path)
+        self.bm25_index = index
+        self._bm25_sections = None
+        self.manifest = self._write_manifest(all_data)
+        print(f"✓ BM25インデックスの構築完了（{len(index)} チャンク, {len(index.vocab)} 語）")
+
     def get_embedding(self, text: str, is_query: bool = False) -> List[float]:
         """
         Sentence Transformersを使用してテキストをベクトル化
@@ -60,56 +394,8 @@ class VectorStore:
         return embedding.tolist()
 
     def chunk_text(self, text: str, chunk_size: int = 800, overlap: int = 150) -> List[str]:
-        """
-        長いテキストをチャンクに分割
-        勤務時間表などの表データは1つのチャンクとして保持
-
-        Args:
-            text: 分割するテキスト
-            chunk_size: 各チャンクの文字数
-            overlap: チャンク間のオーバーラップ文字数
-
-        Returns:
-            テキストチャンクのリスト
-        """
-        import re
-
-        chunks = []
-
-        # 勤務時間表を先に抽出（【〇〇の勤務時間】から次の【または文末まで）
-        time_table_pattern = r'【[^】]*の勤務時間】[^【]*'
-        time_tables = re.findall(time_table_pattern, text)
-
-        # 勤務時間表を独立したチャンクとして追加
-        for table in time_tables:
-            if table.strip():
-                chunks.append(table.strip())
-
-        # 勤務時間表を除いたテキストを通常のチャンク分割
-        text_without_tables = re.sub(time_table_pattern, '', text)
-
-        start = 0
-        while start < len(text_without_tables):
-            end = start + chunk_size
-            chunk = text_without_tables[start:end]
-
-            # 空白で区切るために、最後の改行または句点を探す
-            if end < len(text_without_tables):
-                last_break = max(
-                    chunk.rfind('\n'),
-                    chunk.rfind('。'),
-                    chunk.rfind('. ')
-                )
-                if last_break > chunk_size * 0.5:
-                    chunk = chunk[:last_break + 1]
-                    end = start + last_break + 1
-
-            if chunk.strip():
-                chunks.append(chunk.strip())
-
-            start = end - overlap
-
-        return chunks
+        """長いテキストをチャンクに分割（document_processor.chunk_text を参照）"""
+        return chunk_text(text, chunk_size, overlap)
 
     def add_documents(self, documents: List[Dict[str, str]]):
         """
@@ -135,7 +421,9 @@ class VectorStore:
                     'filename': doc['filename'],
                     'file_type': doc['file_type'],
                     'chunk_index': chunk_idx,
-                    'total_chunks': len(chunks)
+                    'total_chunks': len(chunks),
+                    # 部署固有のチャンク（勤務時間表など）は部署名、共通チャンクは空文字
+                    'department': detect_chunk_department(chunk, doc['filename'])
                 })
                 all_ids.append(f"{doc['filename']}_{chunk_idx}")
 
@@ -160,178 +448,560 @@ class VectorStore:
         )
         print("保存完了！")
 
-    def search(self, query: str, n_results: int = 5, use_reranking: bool = True,
-               distance_threshold: float = 1.5) -> List[Dict]:
+        # BM25インデックス・要約ベクトルを再構築（コレクション全体が対象）
+        self._rebuild_bm25_index()
+        self._rebuild_summary_index()
+
+    def _department_scope(self, department: Optional[str]) -> Optional[List[str]]:
         """
-        ハイブリッド検索：ベクトル検索 + キーワード検索 + リランキング
+        部署での絞り込み対象（指定部署 + 全部署共通）を返す
+
+        Returns:
+            部署タグのリスト。絞り込まない場合はNone
+        """
+        if not department or self.bm25_index.partitions is None:
+            return None
+        return [normalize_department(department), ""]
+
+    def search(self, query: Union[str, SearchQuery], n_results: int = 5, use_reranking: bool = True,
+               distance_threshold: float = 1.5, department: Optional[str] = None) -> List[Dict]:
+        """
+        ハイブリッド検索：ベクトル検索 + キーワード検索 + BM25 + リランキング
 
         Args:
-            query: 検索クエリ
+            query: 検索クエリ。SearchQuery なら埋め込み・リランキングは semantic_text、
+                   キーワード検索・BM25は keyword_text（同義語を含む）を使う。文字列はすべての段階で同じ文字列を使う
             n_results: 返す結果の数
             use_reranking: リランキングを使用するかどうか
             distance_threshold: この距離を超える結果は除外（低いほど厳しい）
+            department: 指定すると、その部署のチャンクと全部署共通のチャンクだけを検索
 
         Returns:
             検索結果のリスト
         """
-        # 1. ベクトル検索（E5モデル用にquery:プレフィックスを追加）
-        query_with_prefix = f"query: {query}"
-        query_embedding = self.model.encode(query_with_prefix, convert_to_numpy=True).tolist()
-        vector_results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results * 3  # リランキング用に多めに取得
-        )
+        return self.search_many([query], n_results=n_results, use_reranking=use_reranking,
+                                distance_threshold=distance_threshold, department=department)[0]
+
+    def search_many(self, queries: List[Union[str, SearchQuery]], n_results: int = 5, use_reranking: bool = True,
+                    distance_threshold: float = 1.5, department: Optional[str] = None,
+                    rerank_batch_size: int = 128) -> List[List[Dict]]:
+        """
+        複数クエリの一括ハイブリッド検索（評価スクリプトやキャッシュのウォームアップ用）
 
-        # 2. キーワード検索（全チャンクから部分一致）
-        keyword_matches = self._keyword_search(query, n_results * 2)
+        埋め込みは1回のバッチ推論、ベクトル検索は1回のcollection.query、
+        キーワード検索は1回の候補取得、リランキングは全クエリ分のペアをまとめて推論する
+        各クエリの結果は search() を個別に呼んだ場合と同じ
+
+        Args:
+            queries: 検索クエリ（文字列または SearchQuery）のリスト
+            n_results: クエリごとに返す結果の数
+            use_reranking: リランキングを使用するかどうか
+            distance_threshold: この距離を超える結果は除外（低いほど厳しい）
+            department: 指定すると、その部署のチャンクと全部署共通のチャンクだけを検索（全クエリ共通）
+            rerank_batch_size: Cross-Encoderの推論バッチサイズ
+
+        Returns:
+            クエリごとの検索結果のリスト
+        """
+        if not queries:
+            return []
+        with tracer.span('search.total'):
+            return self._search_many([SearchQuery.coerce(q) for q in queries], n_results, use_reranking,
+                                     distance_threshold, department, rerank_batch_size)
+
+    def _search_many(self, queries: List[SearchQuery], n_results: int, use_reranking: bool,
+                     distance_threshold: float, department: Optional[str],
+                     rerank_batch_size: int) -> List[List[Dict]]:
+        """search_many の本体"""
+        search_start = time.perf_counter()
+
+        # 0. 部署による候補の絞り込み条件
+        department_scope = self._department_scope(department)
+        where = {'department': {'$in': department_scope}} if department_scope else None
+        bm25_mask = self.bm25_index.partition_mask(department_scope) if department_scope else None
+
+        # 埋め込み・リランキングは短いクエリ、キーワード検索・BM25は同義語を含むクエリ
+        semantic_texts = [q.semantic_text for q in queries]
+        keyword_texts = [q.keyword_text for q in queries]
+
+        # 階層検索：クエリに近い文書・セクションを選び、各レッグの検索対象をその中に限る
+        query_embeddings = None
+        wheres = [where] * len(queries)
+        keyword_where, keyword_ids = where, None
+        bm25_masks = [bm25_mask] * len(queries)
+        route_ms = None
+        routed = self.hierarchical_search and self.summary_index is not None and self.summary_index.section_count
+        if routed:
+            route_start = time.perf_counter()
+            with tracer.span('search.route'):
+                with tracer.span('search.encode'):
+                    query_embeddings = self._encode_queries([f"query: {q}" for q in semantic_texts])
+                sections = self.summary_index.route(query_embeddings, self.route_documents,
+                                                    self.route_sections, department_scope)
+                # 選べるセクションがないクエリ（部署の対象外など）は絞り込まずに検索する
+                wheres = [self._and_where(where, self.summary_index.where(s)) for s in sections]
+                # キーワード検索は全クエリのセクションをまとめて1回で取得し、クエリごとに絞り込む
+                if all(len(s) for s in sections):
+                    keyword_where = self._and_where(where, self.summary_index.where(
+                        np.unique(np.concatenate(sections))))
+                keyword_ids = [self.summary_index.chunk_ids_in(s) if len(s) else None for s in sections]
+                bm25_sections = self._bm25_chunk_sections()
+                bm25_masks = [(np.isin(bm25_sections, s) & (bm25_mask if bm25_mask is not None else True))
+                              if len(s) else bm25_mask
+                              for s in sections]
+            self._local.last_routed_sections = [[self.summary_index.describe(i) for i in s] for s in sections]
+            route_ms = (time.perf_counter() - route_start) * 1000
+        else:
+            self._local.last_routed_sections = None
+
+        # 1〜2. ベクトル検索・キーワード検索・BM25検索は互いに独立しているため並列に実行
+        legs = {
+            # リランキング用に多めに取得
+            'vector': lambda: self._vector_search_many(semantic_texts, n_results * 3, wheres, query_embeddings),
+            'keyword': lambda: self._keyword_search_many(keyword_texts, n_results * 2, where=keyword_where,
+                                                         allowed_ids=keyword_ids),
+            'bm25': lambda: self._bm25_search_many(keyword_texts, n_results * 2, masks=bm25_masks),
+        }
+        leg_results, timings = self._run_legs(legs)
+        if route_ms is not None:
+            timings['route'] = route_ms
+
+        # 3〜4. クエリごとに結果を統合して閾値でフィルタリング
+        per_query_results = [
+            self._fuse_results(leg_results['vector'][i], leg_results['keyword'][i],
+                               leg_results['bm25'][i], distance_threshold)
+            for i in range(len(queries))
+        ]
+
+        # 同じファイルの連続したチャンクを結合し、重なった部分を除く（プロンプトの重複を減らす）
+        if self.merge_adjacent_chunks:
+            with tracer.span('search.merge'):
+                merged_results = [merge_adjacent_results(results, self.merge_max_chars)
+                                  for results in per_query_results]
+            metrics.MERGED_CHUNKS.inc(sum(len(before) - len(after)
+                                          for before, after in zip(per_query_results, merged_results)))
+            per_query_results = merged_results
+
+        # 5. リランキング（Cross-Encoderで精度向上）。全クエリのペアを1回の推論にまとめる
+        # 結合した結果はモデルの入力長に収まるよう結合前のチャンクごとに採点し、最大値を使う
+        if use_reranking:
+            rerank_start = time.perf_counter()
+            pairs = [(query, content)
+                     for query, results in zip(semantic_texts, per_query_results)
+                     for result in results.values()
+                     for content in result.get('member_contents') or [result['content']]]
+            metrics.RERANK_PAIRS.inc(len(pairs))
+            with tracer.span('search.rerank'):
+                rerank_scores = self._rerank(pairs, rerank_batch_size) if pairs else []
+            timings['rerank'] = (time.perf_counter() - rerank_start) * 1000
+
+        all_formatted = []
+        offset = 0
+        for filtered_results in per_query_results:
+            if use_reranking and filtered_results:
+                for result in filtered_results.values():
+                    count = len(result.pop('member_contents', None) or [result['content']])
+                    result['rerank_score'] = float(max(rerank_scores[offset:offset + count]))
+                    offset += count
+                    # キーワードスコアが高い場合はリランクスコアにボーナスを追加
+                    if result['keyword_score'] >= 50:
+                        result['rerank_score'] += 10  # 勤務時間表チャンクを優先
+                    if result['keyword_score'] >= 100:
+                        result['rerank_score'] += 20  # 該当部署の勤務時間表を最優先
+
+                # リランキングスコアでソート
+                formatted_results = list(filtered_results.values())
+                formatted_results.sort(key=lambda x: x['rerank_score'], reverse=True)
+            else:
+                # リランキングなしの場合は複合スコアでソート（BM25は最大値で0〜1に正規化）
+                max_bm25 = max((r['bm25_score'] for r in filtered_results.values()), default=0) or 1
+                formatted_results = []
+                for doc_id, result in filtered_results.items():
+                    result.pop('member_contents', None)
+                    combined_score = (-result['distance'] + (result['keyword_score'] * 3)
+                                      + result['bm25_score'] / max_bm25)
+                    result['combined_score'] = combined_score
+                    result['rerank_score'] = 0
+                    formatted_results.append(result)
+                formatted_results.sort(key=lambda x: x['combined_score'], reverse=True)
+
+            all_formatted.append(self._take_chunks(formatted_results, n_results))
+
+        timings['total'] = (time.perf_counter() - search_start) * 1000
+        self._local.last_search_timings = timings
+
+        metrics.RETRIEVAL_LATENCY.observe(timings['total'] / 1000)
+        if 'rerank' in timings:
+            metrics.RERANK_LATENCY.observe(timings['rerank'] / 1000)
+        for formatted_results in all_formatted:
+            metrics.RETRIEVED_CHUNKS.observe(len(formatted_results))
+        return all_formatted
+
+    @staticmethod
+    def _take_chunks(results: List[Dict], n_results: int) -> List[Dict]:
+        """
+        上位から n_results チャンク分の結果を取る（結合した結果は結合したチャンク数で数える）
+        結合しても回答のプロンプトに入る本文が結合前より増えないようにする
+        """
+        taken = []
+        chunk_count = 0
+        for result in results:
+            chunk_count += result['metadata'].get('merged_chunks', 1)
+            if chunk_count > n_results and taken:
+                break
+            taken.append(result)
+        return taken
+
+    @staticmethod
+    def _fuse_results(vector_results: Dict, keyword_matches: List[Dict], bm25_matches: List[Dict],
+                      distance_threshold: float,
+                      bm25_min_relative_score: float = BM25_MIN_RELATIVE_SCORE) -> Dict[str, Dict]:
+        """
+        1クエリ分のベクトル・キーワード・BM25の結果を統合し、距離の閾値でフィルタリング
 
-        # 3. 結果を統合
+        キーワード検索のヒットと、BM25の最高スコアの bm25_min_relative_score 倍以上のヒットは閾値を免除する
+        """
         all_results = {}
 
         # ベクトル検索結果を追加
-        if vector_results['documents'] and len(vector_results['documents']) > 0:
-            for i in range(len(vector_results['documents'][0])):
-                doc_id = vector_results['ids'][0][i]
-                distance = vector_results['distances'][0][i] if 'distances' in vector_results else 10
-                all_results[doc_id] = {
-                    'content': vector_results['documents'][0][i],
-                    'metadata': vector_results['metadatas'][0][i],
-                    'distance': distance,
-                    'keyword_score': 0
-                }
-
-        # キーワード検索結果を追加/更新
-        for match in keyword_matches:
+        for i in range(len(vector_results['ids'])):
+            all_results[vector_results['ids'][i]] = {
+                'content': vector_results['documents'][i],
+                'metadata': vector_results['metadatas'][i],
+                'distance': vector_results['distances'][i],
+                'keyword_score': 0,
+                'bm25_score': 0
+            }
+
+        # キーワード検索結果・BM25検索結果を追加/更新
+        for match, score_key in ([(m, 'keyword_score') for m in keyword_matches] +
+                                 [(m, 'bm25_score') for m in bm25_matches]):
             doc_id = match['id']
-            if doc_id in all_results:
-                all_results[doc_id]['keyword_score'] = match['score']
-            else:
+            if doc_id not in all_results:
                 all_results[doc_id] = {
                     'content': match['content'],
                     'metadata': match['metadata'],
-                    'distance': 10,  # キーワードのみの場合は高い距離
-                    'keyword_score': match['score']
+                    'distance': 10,  # キーワード・BM25のみの場合は高い距離
+                    'keyword_score': 0,
+                    'bm25_score': 0
                 }
+            all_results[doc_id][score_key] = match['score']
 
-        # 4. 距離による閾値フィルタリング（キーワードスコアがある場合は緩める）
+        # 距離による閾値フィルタリング（キーワード・上位のBM25ヒットは免除）
+        max_bm25 = max((match['score'] for match in bm25_matches), default=0)
+        bm25_cutoff = max_bm25 * bm25_min_relative_score
         filtered_results = {}
         for doc_id, result in all_results.items():
-            # キーワードマッチがある場合は閾値を大幅に緩める
             if result['keyword_score'] > 0:
-                # キーワードマッチがあれば基本的に含める
+                # キーワードでヒットしていれば基本的に含める
+                filtered_results[doc_id] = result
+            elif max_bm25 > 0 and result['bm25_score'] >= bm25_cutoff:
+                # BM25は最高スコアに近いヒットだけを含める
                 filtered_results[doc_id] = result
             elif result['distance'] <= distance_threshold:
                 # ベクトル検索のみでも閾値以内なら含める
                 filtered_results[doc_id] = result
+        return filtered_results
+
+    @property
+    def last_search_timings(self) -> Dict[str, float]:
+        """
+        このスレッドで直前に実行したsearch()/search_many()の段階別所要時間(ms)
+
+        vector / keyword / bm25 は各レッグ単体の時間、legs は並列実行全体の待ち時間
+        """
+        return getattr(self._local, 'last_search_timings', {})
+
+    @property
+    def last_routed_sections(self) -> Optional[List[List[str]]]:
+        """このスレッドで直前に実行した階層検索で、クエリごとに選んだセクション（階層検索でなければNone）"""
+        return getattr(self._local, 'last_routed_sections', None)
+
+    @staticmethod
+    def _and_where(*conditions: Optional[Dict]) -> Optional[Dict]:
+        """ChromaDBの where 条件をANDで結合（Noneは除く）"""
+        conditions = [c for c in conditions if c]
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+    def _bm25_chunk_sections(self) -> np.ndarray:
+        """BM25インデックスの各チャンクのセクションの添字（インデックスを作り直すまで使い回す）"""
+        if self._bm25_sections is None:
+            self._bm25_sections = self.summary_index.sections_of(self.bm25_index.ids)
+        return self._bm25_sections
+
+    def _run_legs(self, legs: Dict[str, Callable]) -> Tuple[Dict[str, object], Dict[str, float]]:
+        """
+        検索レッグを実行し、結果とレッグごとの所要時間(ms)を返す
 
-        # 5. リランキング（Cross-Encoderで精度向上）
-        if use_reranking and filtered_results:
-            pairs = [(query, result['content']) for result in filtered_results.values()]
-            rerank_scores = self.reranker.predict(pairs)
-
-            for idx, (doc_id, result) in enumerate(filtered_results.items()):
-                result['rerank_score'] = float(rerank_scores[idx])
-                # キーワードスコアが高い場合はリランクスコアにボーナスを追加
-                if result['keyword_score'] >= 50:
-                    result['rerank_score'] += 10  # 勤務時間表チャンクを優先
-                if result['keyword_score'] >= 100:
-                    result['rerank_score'] += 20  # 該当部署の勤務時間表を最優先
-
-            # リランキングスコアでソート
-            formatted_results = list(filtered_results.values())
-            formatted_results.sort(key=lambda x: x['rerank_score'], reverse=True)
+        parallel_search が有効なら、先頭のレッグ（ベクトル検索）は呼び出し元のスレッドで、
+        残りのレッグはスレッドプールで並列に実行する。クエリ埋め込みの推論（マイクロバッチングのスケジューラ）を
+        プールのワーカー数で待たせず、同時に検索しているセッションの数だけスケジューラに届くようにする
+        """
+        def timed(fn):
+            start = time.perf_counter()
+            result = fn()
+            return result, (time.perf_counter() - start) * 1000
+
+        legs_start = time.perf_counter()
+        if self.parallel_search:
+            (first_name, first_fn), *rest = legs.items()
+            # トレースIDなどのコンテキストをワーカースレッドに引き継ぐ
+            futures = {
+                name: self._search_executor.submit(contextvars.copy_context().run, timed, fn)
+                for name, fn in rest
+            }
+            outputs = {first_name: timed(first_fn)}
+            outputs.update({name: future.result() for name, future in futures.items()})
         else:
-            # リランキングなしの場合は複合スコアでソート
-            formatted_results = []
-            for doc_id, result in filtered_results.items():
-                combined_score = -result['distance'] + (result['keyword_score'] * 3)
-                result['combined_score'] = combined_score
-                result['rerank_score'] = 0
-                formatted_results.append(result)
-            formatted_results.sort(key=lambda x: x['combined_score'], reverse=True)
-
-        return formatted_results[:n_results]
-
-    def _keyword_search(self, query: str, max_results: int) -> List[Dict]:
-        """キーワード部分一致検索"""
-        import re
-
-        # 部署名のパターンリスト（スペース有無両対応）
-        dept_patterns = [
-            '診療部', '看護部門', '放射線科', 'リハビリテーション科', 'リハビリ',
-            '栄養科', '検査科', '薬局', '薬　局', '地域連携室', '事務部門', '事務',
-            '訪問看護ステーション', '訪問看護', 'パートタイマー'
+            outputs = {name: timed(fn) for name, fn in legs.items()}
+
+        results = {name: output[0] for name, output in outputs.items()}
+        timings = {name: output[1] for name, output in outputs.items()}
+        timings['legs'] = (time.perf_counter() - legs_start) * 1000
+        return results, timings
+
+    def _vector_search_many(self, queries: List[str], n_results: int,
+                            wheres: Optional[List[Optional[Dict]]] = None,
+                            query_embeddings=None) -> List[Dict[str, list]]:
+        """
+        ベクトル検索（E5モデル用にquery:プレフィックスを追加）
+
+        Args:
+            wheres: クエリごとの絞り込み条件。同じ条件のクエリは1回の collection.query にまとめる
+            query_embeddings: 計算済みのクエリ埋め込み（階層検索で先に推論した場合）
+
+        Returns:
+            クエリごとの {'ids', 'documents', 'metadatas', 'distances'}
+        """
+        if query_embeddings is None:
+            with tracer.span('search.encode'):
+                query_embeddings = self._encode_queries([f"query: {q}" for q in queries])
+        wheres = wheres or [None] * len(queries)
+
+        groups: Dict[str, List[int]] = {}
+        for i, where in enumerate(wheres):
+            groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+
+        formatted: List[Optional[Dict[str, list]]] = [None] * len(queries)
+        with tracer.span('search.vector_query'):
+            for indices in groups.values():
+                results = self.collection.query(
+                    query_embeddings=[query_embeddings[i].tolist() for i in indices],
+                    n_results=n_results,
+                    where=wheres[indices[0]]
+                )
+                for row, i in enumerate(indices):
+                    formatted[i] = {
+                        'ids': results['ids'][row],
+                        'documents': results['documents'][row],
+                        'metadatas': results['metadatas'][row],
+                        'distances': results['distances'][row],
+                    }
+        return formatted
+
+    def _encode_queries(self, texts: List[str]):
+        """クエリの埋め込み（LRUキャッシュを確認し、未計算の分だけ推論）"""
+        if self.embedding_cache_size <= 0:
+            return self._encode_uncached(texts)
+
+        with self._embedding_cache_lock:
+            cached = {}
+            for text in texts:
+                if text in self._embedding_cache:
+                    self._embedding_cache.move_to_end(text)
+                    cached[text] = self._embedding_cache[text]
+        for text in texts:
+            metrics.record_cache("embedding", hit=text in cached)
+
+        missing = [text for text in dict.fromkeys(texts) if text not in cached]
+        if missing:
+            embeddings = self._encode_uncached(missing)
+            with self._embedding_cache_lock:
+                for text, embedding in zip(missing, embeddings):
+                    # バッチ全体の配列を保持し続けないよう行をコピーしてから格納
+                    embedding = embedding.copy()
+                    cached[text] = embedding
+                    self._embedding_cache[text] = embedding
+                    self._embedding_cache.move_to_end(text)
+                while len(self._embedding_cache) > self.embedding_cache_size:
+                    self._embedding_cache.popitem(last=False)
+        return [cached[text] for text in texts]
+
+    def _encode_uncached(self, texts: List[str]):
+        """クエリの埋め込み（マイクロバッチング有効時はスケジューラ経由）"""
+        if self.scheduler is not None:
+            return self.scheduler.encode(texts)
+        return self.encode_texts(texts)
+
+    def score_passages(self, query: str, passages: List[str]):
+        """
+        クエリと文章の類似度（埋め込みのコサイン類似度）。回答の参照情報の圧縮で文・表を採点する
+
+        Args:
+            query: クエリ（検索時と同じ文字列ならLRUキャッシュの埋め込みを使う）
+            passages: 文章のリスト（まとめて1回で推論）
+
+        Returns:
+            類似度の配列
+        """
+        if not passages:
+            return np.zeros(0)
+        query_embedding = np.asarray(self._encode_queries([f"query: {query}"])[0], dtype=np.float32)
+        with tracer.span('compress.encode'):
+            passage_embeddings = np.asarray(self._encode_uncached([f"passage: {p}" for p in passages]),
+                                            dtype=np.float32)
+        norms = np.linalg.norm(passage_embeddings, axis=1) * (np.linalg.norm(query_embedding) or 1.0)
+        return passage_embeddings @ query_embedding / np.maximum(norms, 1e-12)
+
+    def _rerank(self, pairs: List[Tuple[str, str]], batch_size: int):
+        """リランキングスコアの計算（マイクロバッチング有効時はスケジューラ経由）"""
+        if self.scheduler is not None:
+            return self.scheduler.rerank(pairs)
+        return self.rerank_pairs(pairs, batch_size)
+
+    def encode_texts(self, texts: List[str], batch_size: int = 32):
+        """埋め込みモデルで直接推論（プレフィックスは呼び出し側で付与済みとする）"""
+        return self.model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
+
+    def rerank_pairs(self, pairs: List[Tuple[str, str]], batch_size: int = 32):
+        """リランキングモデルで直接推論"""
+        return self.reranker.predict(pairs, batch_size=batch_size)
+
+    def _bm25_search_many(self, queries: List[str], max_results: int, mask=None,
+                          masks: Optional[List] = None) -> List[List[Dict]]:
+        """
+        BM25検索（文字n-gramの転置インデックス）。ヒットしたチャンクの本文は全クエリ分まとめて取得
+
+        Args:
+            mask: 全クエリ共通の検索対象のマスク
+            masks: クエリごとの検索対象のマスク（指定すると mask より優先）
+        """
+        masks = masks or [mask] * len(queries)
+        with tracer.span('search.bm25'):
+            all_matches = [self.bm25_index.search(q, max_results, mask=m) for q, m in zip(queries, masks)]
+        hit_ids = list(dict.fromkeys(m['id'] for matches in all_matches for m in matches))
+        if not hit_ids:
+            return [[] for _ in queries]
+
+        with tracer.span('search.bm25_fetch'):
+            fetched = self.collection.get(ids=hit_ids, include=['documents', 'metadatas'])
+        chunks = {
+            doc_id: (fetched['documents'][i], fetched['metadatas'][i])
+            for i, doc_id in enumerate(fetched['ids'])
+        }
+        return [
+            [
+                {'id': m['id'], 'content': chunks[m['id']][0], 'metadata': chunks[m['id']][1], 'score': m['score']}
+                for m in matches if m['id'] in chunks
+            ]
+            for matches in all_matches
         ]
 
-        # クエリから部署名を抽出
-        keywords = []
-        for dept in dept_patterns:
-            if dept in query:
-                keywords.append(dept)
-
-        # 重要キーワードも追加
-        important_keywords = ['勤務時間', '始業', '終業', 'シフト', '休暇', '休業', '給与', '手当',
-                             '有給', '年次有給', '特別休暇', '付与', '日数', '届出', '手続き']
-        for kw in important_keywords:
-            if kw in query:
-                keywords.append(kw)
-
-        # 勤務時間に関するクエリかどうかを判定
-        is_work_time_query = any(kw in query for kw in ['勤務時間', '始業', '終業', 'シフト', '勤務'])
-
-        # 休暇に関するクエリかどうかを判定
-        is_leave_query = any(kw in query for kw in ['休暇', '有給', '特別休暇', '付与', '日数'])
-
-        # 全ドキュメントを取得してキーワードマッチ
-        all_data = self.collection.get(include=['documents', 'metadatas'])
-        matches = []
-
-        for i, doc in enumerate(all_data['documents']):
-            score = 0
-
-            # 勤務時間表チャンクに大幅ボーナス
-            if is_work_time_query and '勤務時間】' in doc:
-                score += 50  # 勤務時間表チャンクを大幅に優先
-
-            # 休暇関連チャンクにボーナス
-            if is_leave_query:
-                if '年次有給休暇' in doc:
-                    score += 50
-                if '特別休暇' in doc:
-                    score += 50
-                if '付与日数' in doc:
-                    score += 100  # 付与日数の表を最優先
-                # 日数の表（10日、11日など）を含むチャンクに大幅ボーナス
-                if '10日' in doc and '11日' in doc and '12日' in doc:
-                    score += 80  # 付与日数テーブルを優先
-
-            for kw in keywords:
-                if kw in doc:
-                    # キーワードの出現回数に応じてスコア付け
-                    score += doc.count(kw) * 2
-                    # タイトル部分（【】内）にある場合はボーナス
-                    if f'【{kw}' in doc or f'{kw}】' in doc:
-                        score += 20  # ボーナスを増加
-                    # 勤務時間表のヘッダーに部署名がある場合は大幅ボーナス
-                    if f'【{kw}' in doc and '勤務時間】' in doc:
-                        score += 100  # 該当部署の勤務時間表を最優先
-
-            if score > 0:
-                matches.append({
-                    'id': all_data['ids'][i],
-                    'content': doc,
-                    'metadata': all_data['metadatas'][i],
-                    'score': score
-                })
+    def _keyword_search(self, query: str, max_results: int, where: Optional[Dict] = None) -> List[Dict]:
+        """
+        キーワード部分一致検索（候補の絞り込みはChromaDB側で実行）
+
+        Args:
+            query: 検索クエリ
+            max_results: 返す結果の最大数
+            where: メタデータによる絞り込み条件（部署など）
+        """
+        return self._keyword_search_many([query], max_results, where=where)[0]
+
+    def _keyword_search_many(self, queries: List[str], max_results: int,
+                             where: Optional[Dict] = None,
+                             allowed_ids: Optional[List[set]] = None) -> List[List[Dict]]:
+        """
+        複数クエリのキーワード検索（全クエリの候補を1回の取得でまとめて絞り込む）
 
-        # スコア順にソート
-        matches.sort(key=lambda x: x['score'], reverse=True)
-        return matches[:max_results]
+        Args:
+            allowed_ids: クエリごとの検索対象のチャンクID（階層検索で選んだセクション。Noneなら where の範囲すべて）
+        """
+        analyses = [extract_keywords(q) for q in queries]
+
+        # スコアに寄与し得る語を1つも含まないチャンクは取得しない
+        terms = [term for analysis in analyses for term in keyword_filter_terms(*analysis)]
+        document_filter = build_keyword_filter(list(dict.fromkeys(terms)))
+        if document_filter is None:
+            return [[] for _ in queries]
+
+        with tracer.span('search.keyword_fetch'):
+            candidates = get_in_batches(
+                self.collection,
+                where=where,
+                where_document=document_filter,
+                include=['documents', 'metadatas']
+            )
+
+        all_matches = []
+        with tracer.span('search.keyword_score'):
+            for query_index, (keywords, is_work_time_query, is_leave_query) in enumerate(analyses):
+                allowed = allowed_ids[query_index] if allowed_ids else None
+                matches = []
+                for i, doc in enumerate(candidates['documents']):
+                    if allowed is not None and candidates['ids'][i] not in allowed:
+                        continue
+                    score = self._keyword_score(doc, keywords, is_work_time_query, is_leave_query)
+                    if score > 0:
+                        matches.append({
+                            'id': candidates['ids'][i],
+                            'content': doc,
+                            'metadata': candidates['metadatas'][i],
+                            'score': score
+                        })
+
+                # スコア順にソート
+                matches.sort(key=lambda x: x['score'], reverse=True)
+                all_matches.append(matches[:max_results])
+        return all_matches
+
+    @staticmethod
+    def _keyword_score(doc: str, keywords: List[str], is_work_time_query: bool, is_leave_query: bool) -> int:
+        """チャンク1件のキーワードスコアを計算"""
+        score = 0
+
+        # 勤務時間表チャンクに大幅ボーナス
+        if is_work_time_query and '勤務時間】' in doc:
+            score += 50  # 勤務時間表チャンクを大幅に優先
+
+        # 休暇関連チャンクにボーナス
+        if is_leave_query:
+            if '年次有給休暇' in doc:
+                score += 50
+            if '特別休暇' in doc:
+                score += 50
+            if '付与日数' in doc:
+                score += 100  # 付与日数の表を最優先
+            # 日数の表（10日、11日など）を含むチャンクに大幅ボーナス
+            if '10日' in doc and '11日' in doc and '12日' in doc:
+                score += 80  # 付与日数テーブルを優先
+
+        for kw in keywords:
+            if kw in doc:
+                # キーワードの出現回数に応じてスコア付け
+                score += doc.count(kw) * 2
+                # タイトル部分（【】内）にある場合はボーナス
+                if f'【{kw}' in doc or f'{kw}】' in doc:
+                    score += 20  # ボーナスを増加
+                # 勤務時間表のヘッダーに部署名がある場合は大幅ボーナス
+                if f'【{kw}' in doc and '勤務時間】' in doc:
+                    score += 100  # 該当部署の勤務時間表を最優先
+        return score
 
     def clear_collection(self):
         """コレクション内の全データを削除"""
         self.client.delete_collection(name=self.collection.name)
         self.collection = self.client.create_collection(name=self.collection.name)
+        self.bm25_index = BM25Index()
+        if os.path.exists(self.bm25_path):
+            os.remove(self.bm25_path)
+        self.summary_index = None
+        self._bm25_sections = None
+        if os.path.exists(self.summary_path):
+            os.remove(self.summary_path)
+        self.manifest = self._write_manifest({'ids': [], 'documents': [], 'metadatas': []})
         print("コレクションをクリアしました")
 
     def get_collection_count(self) -> int: